@@ -0,0 +1,56 @@
+from typing import Optional, Tuple
+
+from base_agent import BaseAgent
+from llm_backends import LLMBackend
+
+
+class AnalyzeFixAgent(BaseAgent):
+    """
+    Analyzer and fixer in one structured call: the code is sent once and the
+    answer carries both the bug analysis and the fixed code.
+    """
+
+    json_output = True
+
+    def __init__(self, backend: Optional[LLMBackend] = None):
+        system_prompt = (
+            "You are an expert Python debugger.\n"
+            "Respond ONLY with valid JSON:\n\n"
+            "{\n"
+            "  \"analysis\": \"BUG ANALYSIS:\\nSyntax Issues:\\n- ...\\nLogic Issues:\\n- ...\\n"
+            "Runtime Issues:\\n- ...\\nSeverity: High/Medium/Low\",\n"
+            "  \"fixed_code\": \"the complete fixed Python program\"\n"
+            "}\n\n"
+            "RULES FOR fixed_code:\n"
+            "• Complete, runnable Python; no markdown backticks.\n"
+            "• Explanations only as comments at the top.\n"
+            "• Maintain original intent of the code.\n"
+        )
+        super().__init__("Expert Code Debugger", system_prompt, backend)
+
+    async def analyze_and_fix_async(self, code: str, context: Optional[str] = None,
+                                    use_cache: bool = True) -> str:
+        return await self.think_async(
+            self._task(code), context=context, use_cache=use_cache
+        )
+
+    def _task(self, code: str) -> str:
+        return (
+            "Describe ALL bugs in the following Python code, then fix them.\n"
+            "Return ONLY JSON.\n\n"
+            f"CODE:\n{code}"
+        )
+
+    def parse(self, response: str) -> Optional[Tuple[str, str]]:
+        """
+        (analysis, fixed code), or None when the answer is malformed.
+        """
+        data = self.parse_json(response)
+        if not isinstance(data, dict):
+            return None
+        analysis, fixed_code = data.get("analysis"), data.get("fixed_code")
+        if not isinstance(analysis, str) or not isinstance(fixed_code, str):
+            return None
+        if not analysis.strip() or not fixed_code.strip():
+            return None
+        return analysis.strip(), fixed_code
@@ -1,8 +1,11 @@
+from typing import AsyncIterator, Optional
+
 from base_agent import BaseAgent
+from llm_backends import LLMBackend
 
 
 class AnalyzerAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, backend: Optional[LLMBackend] = None):
         system_prompt = (
             "You are an expert Python code analyzer.\n\n"
             "CRITICAL RULES:\n"
@@ -20,12 +23,24 @@ class AnalyzerAgent(BaseAgent):
             "- [issue or 'None']\n"
             "Severity: [High/Medium/Low]\n"
         )
-        super().__init__("Expert Code Analyzer", system_prompt)
+        super().__init__("Expert Code Analyzer", system_prompt, backend)
+
+    def analyze(self, code: str, context: Optional[str] = None, use_cache: bool = True) -> str:
+        return self.think(self._analyze_task(code), context=context, use_cache=use_cache)
+
+    async def analyze_async(self, code: str, context: Optional[str] = None,
+                            use_cache: bool = True) -> str:
+        return await self.think_async(
+            self._analyze_task(code), context=context, use_cache=use_cache
+        )
+
+    def analyze_stream(self, code: str, context: Optional[str] = None,
+                       use_cache: bool = True) -> AsyncIterator[str]:
+        return self.think_stream(self._analyze_task(code), context=context, use_cache=use_cache)
 
-    def analyze(self, code: str) -> str:
-        task = (
+    def _analyze_task(self, code: str) -> str:
+        return (
             "Analyze the following Python code and describe ALL bugs.\n"
             "Follow the required format strictly.\n\n"
             f"Code to analyze:\n{code}"
         )
-        return self.think(task)
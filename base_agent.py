@@ -1,34 +1,167 @@
-import os
-from typing import Optional, List
+import collections
+import contextvars
+import json
+from typing import AsyncIterator, Optional, List
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from llm_backends import LLMBackend, LLMResponse, get_backend
+from prompt_budget import CHARS_PER_TOKEN, estimate_tokens, truncate_middle
+from rate_limit import TransportError
+from retry_policy import charge_tokens
+from response_cache import ResponseCache
+from telemetry import span
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Agent memories of the job running in the current task, by agent (None
+# outside a job, where each agent keeps its own)
+_job_memory: contextvars.ContextVar = contextvars.ContextVar("agent_memory", default=None)
+
+
+def start_job_memory() -> None:
+    # Task-local: concurrent jobs sharing agents never see each other's responses
+    _job_memory.set({})
+
 
 class BaseAgent:
-    def __init__(self, role: str, system_prompt: str):
+    # Only the most recent responses are fed back into prompts, so keep no more
+    memory_size = 3
+    # Ask the backend for structured JSON output (agents whose answers are parsed)
+    json_output = False
+
+    def __init__(self, role: str, system_prompt: str, backend: Optional[LLMBackend] = None):
         self.role = role
         self.system_prompt = system_prompt
-        self.memory: List[dict] = []
+        self._memory: "collections.deque[dict]" = collections.deque(maxlen=self.memory_size)
+
+        # Optional response cache, shared between agents by the Coordinator
+        self.cache: Optional[ResponseCache] = None
 
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("❌ GEMINI_API_KEY not found in environment variables or .env!")
+        # Gemini unless told otherwise (see llm_backends.create_backend);
+        # the default backend (GEMINI_MODEL) comes from the shared registry
+        self.backend = backend if backend is not None else get_backend()
+        self.model_name = self.backend.model_name
 
-        # Configure Gemini API
-        genai.configure(api_key=api_key)
+        # Max prompt size in (estimated) tokens; None = unlimited.
+        # Context, memory and execution output are trimmed to fit, never the code.
+        self.prompt_budget_tokens: Optional[int] = None
 
-        # Stable, non-live model (your logs already show quota for this)
-        self.model = genai.GenerativeModel("gemini-2.5-flash-lite")
+    @property
+    def memory(self) -> "collections.deque[dict]":
+        scope = _job_memory.get()
+        if scope is None:
+            return self._memory
+        memory = scope.get(id(self))
+        if memory is None:
+            memory = scope[id(self)] = collections.deque(maxlen=self.memory_size)
+        return memory
 
-    def think(self, user_input: str, context: Optional[str] = None) -> str:
+    def think(self, user_input: str, context: Optional[str] = None,
+              use_cache: bool = True, temperature: Optional[float] = None) -> str:
         """
-        Build a single text prompt and call Gemini safely.
+        Build a single text prompt and call the model backend safely.
+        Pass use_cache=False to force a fresh answer (e.g. on retries).
+        Model failures come back as "AGENT ERROR: ..." text; TransportError
+        (quota/network, after retries) is raised.
+        """
+        full_prompt = self._build_prompt(user_input, context)
+        cache_key = self._cache_key(user_input, context)
+        cache_model = self._cache_model(temperature)
+
+        with span("llm", role=self.role, model=self.model_name) as sp:
+            cached = self._cache_lookup(cache_model, cache_key, use_cache)
+            if cached is not None:
+                sp.set(outcome="cache_hit")
+                return cached
+
+            try:
+                response = self.backend.generate(
+                    full_prompt, temperature=temperature, json_output=self.json_output
+                )
+            except TransportError:
+                # Quota/network failures are not model output; let the caller decide
+                raise
+            except Exception as e:
+                sp.set(outcome="error")
+                return f"AGENT ERROR: {e}"
+
+            self._trace_response(sp, full_prompt, response)
+            return self._handle_response(response, cache_model, cache_key)
+
+    async def think_async(self, user_input: str, context: Optional[str] = None,
+                          use_cache: bool = True, temperature: Optional[float] = None) -> str:
         """
+        Same as think(), but awaits the backend instead of blocking the caller,
+        so many pipelines can share one event loop.
+        """
+        full_prompt = self._build_prompt(user_input, context)
+        cache_key = self._cache_key(user_input, context)
+        cache_model = self._cache_model(temperature)
+
+        with span("llm", role=self.role, model=self.model_name) as sp:
+            cached = self._cache_lookup(cache_model, cache_key, use_cache)
+            if cached is not None:
+                sp.set(outcome="cache_hit")
+                return cached
+
+            try:
+                response = await self.backend.generate_async(
+                    full_prompt, temperature=temperature, json_output=self.json_output
+                )
+            except TransportError:
+                # Quota/network failures are not model output; let the caller decide
+                raise
+            except Exception as e:
+                sp.set(outcome="error")
+                return f"AGENT ERROR: {e}"
+
+            self._trace_response(sp, full_prompt, response)
+            return self._handle_response(response, cache_model, cache_key)
+
+    async def think_stream(self, user_input: str, context: Optional[str] = None,
+                           use_cache: bool = True,
+                           temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Streaming think(): yields text chunks as the model produces them.
+        The joined, stripped chunks equal what think() would have returned.
+        """
+        full_prompt = self._build_prompt(user_input, context)
+        cache_key = self._cache_key(user_input, context)
+        cache_model = self._cache_model(temperature)
+
+        with span("llm", role=self.role, model=self.model_name, streamed=True) as sp:
+            cached = self._cache_lookup(cache_model, cache_key, use_cache)
+            if cached is not None:
+                sp.set(outcome="cache_hit")
+                yield cached
+                return
+
+            parts: List[str] = []
+            try:
+                async for chunk in self.backend.generate_stream_async(
+                    full_prompt, temperature=temperature, json_output=self.json_output
+                ):
+                    if chunk:
+                        parts.append(chunk)
+                        yield chunk
+
+            except TransportError:
+                raise
+            except Exception as e:
+                sp.set(outcome="error")
+                yield ("\n" if parts else "") + f"AGENT ERROR: {e}"
+                return
 
+            response = LLMResponse("".join(parts))
+            self._trace_response(sp, full_prompt, response)
+            result = self._handle_response(response, cache_model, cache_key)
+            if not parts:
+                yield result
+
+    def _build_prompt(self, user_input: str, context: Optional[str] = None,
+                      with_memory: bool = True) -> str:
         prompt_parts = [
             f"You are a {self.role}.",
             "",
@@ -36,47 +169,122 @@ class BaseAgent:
             self.system_prompt.strip(),
             "",
         ]
+        task_parts = [
+            "TASK:",
+            user_input.strip()
+        ]
+
+        room = self._room_for(user_input)
 
         if context:
-            prompt_parts.extend([
-                "CONTEXT:",
-                context.strip(),
-                "",
-            ])
-
-        if self.memory:
-            prompt_parts.append("RECENT MEMORY:")
-            for i, item in enumerate(self.memory[-3:], start=1):
+            context = context.strip()
+            if room is not None:
+                context = truncate_middle(context, room)
+                room -= len(context)
+            if context:
+                prompt_parts.extend([
+                    "CONTEXT:",
+                    context,
+                    "",
+                ])
+
+        if with_memory and self.memory:
+            memory_parts = ["RECENT MEMORY:"]
+            for i, item in enumerate(self.memory, start=1):
                 content = item.get("content", "")
-                prompt_parts.append(f"- [{i}] {content[:200]}")
-            prompt_parts.append("")
+                memory_parts.append(f"- [{i}] {content[:200]}")
+            memory_parts.append("")
 
-        prompt_parts.extend([
-            "TASK:",
-            user_input.strip()
-        ])
+            # Memory is the first thing to go when over budget
+            if room is None or sum(len(part) + 1 for part in memory_parts) <= room:
+                prompt_parts.extend(memory_parts)
+
+        prompt_parts.extend(task_parts)
+
+        return "\n".join(prompt_parts)
 
-        full_prompt = "\n".join(prompt_parts)
+    def _room_for(self, *fixed_parts: str) -> Optional[int]:
+        """
+        Characters left in the prompt budget after the system prompt and
+        `fixed_parts`, or None when there is no budget.
+        """
+        if self.prompt_budget_tokens is None:
+            return None
+        used = len(self.role) + len(self.system_prompt) + sum(len(part) for part in fixed_parts)
+        # ~200 chars for section headers and instructions around the parts
+        return max(0, self.prompt_budget_tokens * CHARS_PER_TOKEN - used - 200)
+
+    @staticmethod
+    def parse_json(response: str):
+        """
+        JSON object of a structured answer, tolerating code fences and prose
+        around it. None if there is none.
+        """
+        cleaned = response.replace("```json", "").replace("```", "").strip()
+        try:
+            return json.loads(cleaned)
+        except Exception:
+            pass
 
+        # Prose around the object (older models / no JSON mode): take the outermost braces
+        start, end = cleaned.find("{"), cleaned.rfind("}")
+        if start == -1 or end <= start:
+            return None
         try:
-            response = self.model.generate_content(full_prompt)
+            return json.loads(cleaned[start:end + 1])
+        except Exception:
+            return None
+
+    def _fit(self, text: str, *fixed_parts: str) -> str:
+        # Trim `text` so it fits next to `fixed_parts` within the prompt budget
+        room = self._room_for(*fixed_parts)
+        return text if room is None else truncate_middle(text, room)
+
+    def _cache_model(self, temperature: Optional[float]) -> str:
+        # Sampling settings are part of the cache key
+        model = f"{self.model_name}+json" if self.json_output else self.model_name
+        if temperature is None:
+            return model
+        return f"{model}@t={temperature}"
+
+    def _cache_key(self, user_input: str, context: Optional[str]) -> str:
+        # The prompt without RECENT MEMORY: memory changes after every call,
+        # so keying on it would make a resubmitted input miss the cache
+        return self._build_prompt(user_input, context, with_memory=False)
+
+    def _cache_lookup(self, cache_model: str, cache_key: str,
+                      use_cache: bool) -> Optional[str]:
+        if self.cache is None or not use_cache:
+            return None
 
-            result = ""
-            if hasattr(response, "candidates") and response.candidates:
-                first = response.candidates[0]
-                if hasattr(first, "content") and hasattr(first.content, "parts"):
-                    for part in first.content.parts:
-                        if hasattr(part, "text") and part.text:
-                            result += part.text
+        cached = self.cache.get(cache_model, cache_key)
+        if cached is not None:
+            self.memory.append({"content": cached})
+        return cached
 
-            result = result.strip()
-            if result:
-                self.memory.append({"content": result})
+    @staticmethod
+    def _trace_response(sp, full_prompt: str, response: LLMResponse) -> None:
+        # Charged to the running job's token budget (cache hits are free)
+        charge_tokens(
+            response.usage.get("total_tokens")
+            or estimate_tokens(full_prompt) + estimate_tokens(response.text)
+        )
+        # Backend-reported token counts where available, sizes always
+        sp.set(
+            prompt_chars=len(full_prompt),
+            response_chars=len(response.text),
+            outcome="ok" if response.text.strip() else "empty",
+            **response.usage,
+        )
 
-            return result or "AGENT ERROR: Empty response"
+    def _handle_response(self, response: LLMResponse, cache_model: str, cache_key: str) -> str:
+        result = response.text.strip()
+        if result:
+            self.memory.append({"content": result})
+            if self.cache is not None:
+                self.cache.put(cache_model, cache_key, result)
 
-        except Exception as e:
-            return f"AGENT ERROR: {e}"
+        return result or "AGENT ERROR: Empty response"
 
     def reset_memory(self):
         self.memory.clear()
@@ -0,0 +1,313 @@
+"""
+Debug many programs from the command line, fanned out over worker processes.
+
+    python batch.py submissions/ --workers 8 --llm-concurrency 16 -o results.jsonl
+    python batch.py "ci/**/*.py" --limit 100
+    python batch.py snippets.jsonl --checkpoint-db batch.db
+
+One JSON line per item ({"id", "success", ..., "history"}) is written as
+soon as it finishes, in completion order; progress and a final summary go
+to stderr. Only a bounded window of items is read ahead, so inputs of any
+size run in constant memory.
+"""
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from coordinator import Coordinator
+from event_loop import run_sync
+from llm_backends import LLMBackend, LLMResponse, get_backend
+from memory import HistoryView
+from model_routing import ModelRouter
+from response_cache import cache_from_env
+
+
+def iter_items(source: str) -> Iterator[Tuple[str, str]]:
+    """
+    (item id, code) pairs from a directory of .py files (id = relative path),
+    a glob pattern (id = path), or a JSONL file of {"id": ..., "code": ...}
+    lines (id defaults to the line number). Lazy: one file at a time.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    with open(path, encoding="utf-8") as f:
+                        yield os.path.relpath(path, source), f.read()
+        return
+
+    if source.endswith((".jsonl", ".ndjson")) and os.path.isfile(source):
+        with open(source, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                yield str(record.get("id", line_number)), record["code"]
+        return
+
+    for path in glob.iglob(source, recursive=True):
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                yield path, f.read()
+
+
+def debug_source(coordinator: Coordinator, source: str,
+                 limit: Optional[int] = None) -> List[Tuple[str, dict]]:
+    """
+    Debug every item of `source`. With a checkpointing Coordinator, items
+    finished by an earlier run come straight from the store (their result
+    has "from_checkpoint": True) and interrupted ones resume mid-pipeline.
+    """
+    items = list(itertools.islice(iter_items(source), limit))
+    results = coordinator.debug_many(
+        [code for _, code in items], job_ids=[item_id for item_id, _ in items]
+    )
+    return [(item_id, result) for (item_id, _), result in zip(items, results)]
+
+
+class CappedBackend(LLMBackend):
+    """
+    Passes calls through, each holding a slot of a semaphore shared by every
+    batch worker: a global cap on in-flight model calls.
+    """
+
+    def __init__(self, inner: LLMBackend, slots: Any):
+        self.inner = inner
+        self.model_name = inner.model_name
+        self.slots = slots
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 json_output: bool = False) -> LLMResponse:
+        with self.slots:
+            return self.inner.generate(prompt, temperature=temperature, json_output=json_output)
+
+    async def generate_async(self, prompt: str,
+                             temperature: Optional[float] = None,
+                             json_output: bool = False) -> LLMResponse:
+        await self._acquire()
+        try:
+            return await self.inner.generate_async(
+                prompt, temperature=temperature, json_output=json_output
+            )
+        finally:
+            self.slots.release()
+
+    async def generate_stream_async(self, prompt: str, temperature: Optional[float] = None,
+                                    json_output: bool = False):
+        await self._acquire()
+        try:
+            async for chunk in self.inner.generate_stream_async(
+                prompt, temperature=temperature, json_output=json_output
+            ):
+                yield chunk
+        finally:
+            self.slots.release()
+
+    async def _acquire(self) -> None:
+        # A blocking acquire would stall the worker's event loop (and a
+        # cancelled waiter in a thread could leak a slot), so poll
+        delay = 0.005
+        while not self.slots.acquire(block=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+# Per worker process, built by _init_worker
+_coordinator: Optional[Coordinator] = None
+
+
+def _init_worker(options: Dict[str, Any], slots: Any, workers: int) -> None:
+    global _coordinator
+    # LLM_RPM / LLM_TPM configure a per-process limiter: give each worker its share
+    for name in ("LLM_RPM", "LLM_TPM"):
+        limit = float(os.getenv(name) or 0)
+        if limit:
+            os.environ[name] = str(limit / workers)
+    router = ModelRouter(backend_factory=lambda model: CappedBackend(get_backend(model), slots))
+    # With LLM_CACHE set to a SQLite path, the workers share one disk cache
+    _coordinator = Coordinator(router=router, cache=cache_from_env(), **options)
+
+
+def _debug_item(item_id: str, code: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        result = run_sync(_coordinator.debug_code_async(code, job_id=item_id))
+    except Exception as e:
+        return {"id": item_id, "success": False, "error": f"{type(e).__name__}: {e}",
+                "wall_time": round(time.perf_counter() - started, 3)}
+    return result_line(item_id, result, time.perf_counter() - started)
+
+
+def result_line(item_id: str, result: Dict[str, Any], wall_time: float) -> Dict[str, Any]:
+    execution = result.get("execution_result") or {}
+    # Plain dicts for the JSONL file (results from a checkpoint already are)
+    history = result.get("history")
+    if isinstance(history, HistoryView):
+        history = history.to_list()
+    line = {
+        "id": item_id,
+        "success": result["success"],
+        "attempts": result["attempts"],
+        "error_type": execution.get("error_type"),
+        "analysis": result["analysis"],
+        "fixed_code": result["fixed_code"],
+        "validation": result["validation"],
+        "wall_time": round(wall_time, 3),
+        "history": history,
+    }
+    for key in ("stop_reason", "budget", "error", "from_checkpoint"):
+        if result.get(key):
+            line[key] = result[key]
+    return line
+
+
+class BatchProgress:
+    """
+    Counts finished items; prints a progress line at most every `interval` seconds.
+    """
+
+    def __init__(self, stream: TextIO, interval: float = 5.0):
+        self.stream = stream
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self.done = self.succeeded = self.failed = self.errors = self.checkpointed = 0
+
+    def add(self, line: Dict[str, Any]) -> None:
+        self.done += 1
+        if line.get("error"):
+            self.errors += 1
+        elif line["success"]:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.checkpointed += int(bool(line.get("from_checkpoint")))
+
+        now = time.perf_counter()
+        if self.interval and now - self._last_report >= self.interval:
+            self._last_report = now
+            print(self.line(), file=self.stream, flush=True)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "done": self.done,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "errors": self.errors,
+            "from_checkpoint": self.checkpointed,
+            "seconds": round(elapsed, 3),
+            "jobs_per_s": round(self.done / elapsed, 3) if elapsed else 0.0,
+        }
+
+    def line(self) -> str:
+        s = self.summary()
+        return (
+            f"{s['done']} done ({s['succeeded']} fixed, {s['failed']} not fixed, "
+            f"{s['errors']} errors) in {s['seconds']:.1f}s, {s['jobs_per_s']:.2f} jobs/s"
+        )
+
+
+def run_batch(items: Iterator[Tuple[str, str]], out: TextIO, workers: int,
+              llm_concurrency: int, options: Optional[Dict[str, Any]] = None,
+              progress: Optional[BatchProgress] = None,
+              read_ahead: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Debug `items` on `workers` processes (one Coordinator each), writing a
+    JSON line per item to `out` as it completes. At most `read_ahead`
+    items (default 2 per worker) are submitted and not yet finished.
+    """
+    progress = progress or BatchProgress(sys.stderr)
+    read_ahead = read_ahead or 2 * workers
+    # spawn: workers start clean, without this process's threads or loop
+    context = multiprocessing.get_context("spawn")
+    slots = context.BoundedSemaphore(llm_concurrency)
+    pending: Dict[Future, str] = {}
+
+    def drain(return_when: str) -> None:
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            item_id = pending.pop(future)
+            try:
+                line = future.result()
+            except Exception as e:
+                # The worker process died (or the result didn't pickle)
+                line = {"id": item_id, "success": False, "error": f"{type(e).__name__}: {e}"}
+            out.write(json.dumps(line, default=str) + "\n")
+            out.flush()
+            progress.add(line)
+
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(options or {}, slots, workers)) as pool:
+        try:
+            for item_id, code in items:
+                pending[pool.submit(_debug_item, item_id, code)] = item_id
+                if len(pending) >= read_ahead:
+                    drain(FIRST_COMPLETED)
+            while pending:
+                drain(FIRST_COMPLETED)
+        except KeyboardInterrupt:
+            for future in pending:
+                future.cancel()
+            print("interrupted; finishing running items", file=sys.stderr, flush=True)
+    return progress.summary()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Debug a directory, glob or JSONL of programs.")
+    parser.add_argument("source", help="directory of .py files, glob pattern, or .jsonl file")
+    parser.add_argument("-o", "--output", help="JSONL results file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes; jobs mostly wait on the model, so more "
+                             "than the CPU count can pay off")
+    parser.add_argument("--llm-concurrency", type=int, default=16,
+                        help="model calls in flight across all workers")
+    parser.add_argument("--limit", type=int, help="stop after this many items")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--deadline", type=float, help="seconds allowed per item")
+    parser.add_argument("--token-budget", type=int, help="model tokens allowed per item")
+    parser.add_argument("--fused", action="store_true",
+                        help="single-call analyze + fix (see AnalyzeFixAgent)")
+    parser.add_argument("--checkpoint-db",
+                        help="SQLite checkpoints: a rerun skips finished items")
+    parser.add_argument("--progress", type=float, default=5.0,
+                        help="seconds between progress lines (0 = only the summary)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    options = {
+        "max_retries": args.max_retries,
+        "job_deadline": args.deadline,
+        "job_token_budget": args.token_budget,
+        "fused": args.fused,
+        "checkpoint_db": args.checkpoint_db,
+    }
+    items = itertools.islice(iter_items(args.source), args.limit)
+    progress = BatchProgress(sys.stderr, args.progress)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        summary = run_batch(
+            items, out, max(1, args.workers), max(1, args.llm_concurrency), options, progress
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(progress.line(), file=sys.stderr)
+    print(json.dumps(summary), file=sys.stderr)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
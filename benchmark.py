@@ -0,0 +1,477 @@
+"""
+Benchmark / load-test harness for the debugging pipeline.
+
+Examples:
+    python benchmark.py --jobs 200 --users 20 --latency 0.3 --output bench.json
+    python benchmark.py --corpus ./snippets --backend env --users 1
+    python benchmark.py --jobs 50 --metrics metrics.prom
+    python benchmark.py --jobs 10 --exec-runs 200
+    python benchmark.py --jobs 100 --similar-fixes
+"""
+import argparse
+import asyncio
+import contextvars
+import glob
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from code_executor import (
+    DEFAULT_MAX_OUTPUT_CHARS, DEFAULT_OUTPUT_LIMIT, SandboxPool, ZygotePool,
+)
+from coordinator import Coordinator
+from event_loop import run_sync
+from examples import build_corpus
+from llm_backends import (
+    FakeBackend, LLMBackend, LLMResponse, RateLimitedBackend, create_backend,
+)
+from model_routing import ModelRouter
+from rate_limit import RateLimiter, get_shared_limiter
+from response_cache import cache_from_env
+import telemetry
+
+PHASES = ("Preflight", "Analysis", "Fix", "Execution", "Validation")
+
+# Per-job list of (prompt_chars, response_chars); set inside each job's task
+_job_calls: contextvars.ContextVar = contextvars.ContextVar("job_calls")
+
+
+class MeteredBackend(LLMBackend):
+    """
+    Passes calls through and records prompt/response sizes for the current job.
+    """
+
+    def __init__(self, inner: LLMBackend):
+        self.inner = inner
+        self.model_name = inner.model_name
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 json_output: bool = False) -> LLMResponse:
+        response = self.inner.generate(prompt, temperature=temperature, json_output=json_output)
+        return self._record(prompt, response)
+
+    async def generate_async(self, prompt: str,
+                             temperature: Optional[float] = None,
+                             json_output: bool = False) -> LLMResponse:
+        response = await self.inner.generate_async(
+            prompt, temperature=temperature, json_output=json_output
+        )
+        return self._record(prompt, response)
+
+    async def generate_stream_async(self, prompt: str, temperature: Optional[float] = None,
+                                    json_output: bool = False):
+        parts = []
+        async for chunk in self.inner.generate_stream_async(
+            prompt, temperature=temperature, json_output=json_output
+        ):
+            parts.append(chunk)
+            yield chunk
+        self._record(prompt, LLMResponse("".join(parts)))
+
+    @staticmethod
+    def _record(prompt: str, response: LLMResponse) -> LLMResponse:
+        calls = _job_calls.get(None)
+        if calls is not None:
+            calls.append((len(prompt), len(response.text)))
+        return response
+
+
+def percentile(values: List[float], pct: float) -> float:
+    # Nearest-rank percentile; good enough for run-to-run comparisons
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def phase_durations(trace: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Seconds per phase kind, summed over the job's "phase" spans. Each span
+    is timed from its own start to end, so phases that overlap (parallel
+    candidates, concurrent jobs) are not credited with each other's time.
+    """
+    totals = {phase: 0.0 for phase in PHASES}
+    for s in (trace or {}).get("spans", ()):
+        if s["name"] == "phase" and s.get("phase") in totals:
+            totals[s["phase"]] += s["duration"]
+    return totals
+
+
+def reused_similar_fix(result: Dict[str, Any]) -> bool:
+    # Answered by the FixIndex shortcut: its stored fix is the one returned
+    if not result["success"]:
+        return False
+    return any(
+        entry["phase"] == "Similar Fix"
+        and (entry.get("extra") or {}).get("fixed_code") == result.get("fixed_code")
+        for entry in result.get("history", ())
+    )
+
+
+def load_corpus(path: Optional[str], size: int) -> List[Tuple[str, str]]:
+    if not path:
+        return build_corpus(size)
+
+    files = sorted(glob.glob(os.path.join(path, "**", "*.py"), recursive=True))
+    corpus = []
+    for file_path in files[:size]:
+        with open(file_path, encoding="utf-8") as f:
+            corpus.append((os.path.relpath(file_path, path), f.read()))
+    return corpus
+
+
+async def run_job(coordinator: Coordinator, category: str, code: str) -> Dict[str, Any]:
+    calls: List[Tuple[int, int]] = []
+    _job_calls.set(calls)
+
+    start = time.perf_counter()
+    result = await coordinator.debug_code_async(code)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "category": category,
+        "success": result["success"],
+        "attempts": result["attempts"],
+        "reused": reused_similar_fix(result),
+        "wall_time": elapsed,
+        "phases": phase_durations(result.get("trace")),
+        "llm_calls": len(calls),
+        "prompt_chars": sum(p for p, _ in calls),
+        "response_chars": sum(r for _, r in calls),
+    }
+
+
+async def run_load(coordinator: Coordinator, corpus: List[Tuple[str, str]],
+                   users: int) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Simulate `users` clients, each submitting the next corpus item as soon
+    as its previous job finishes.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in corpus:
+        queue.put_nowait(item)
+
+    jobs: List[Dict[str, Any]] = []
+
+    async def user():
+        while True:
+            try:
+                category, code = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            # Run each job in its own task so it gets a fresh contextvar scope
+            jobs.append(await asyncio.create_task(run_job(coordinator, category, code)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    return jobs, time.perf_counter() - start
+
+
+# Run in a fresh interpreter: import the app and build a Coordinator, no LLM call
+_COLD_START_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from coordinator import Coordinator
+Coordinator()
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "heavy_modules": sorted(m for m in ("google.generativeai", "streamlit") if m in sys.modules),
+}))
+"""
+
+
+def measure_cold_start(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Time from process start to a ready Coordinator, against args.cold_start_target.
+    """
+    env = dict(os.environ)
+    if args.backend == "fake":
+        env["LLM_BACKEND"] = "fake"
+
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _COLD_START_SCRIPT],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, timeout=120,
+    )
+    process_seconds = time.perf_counter() - started
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1:], "target": args.cold_start_target}
+
+    measured = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        "import_and_init_seconds": measured["seconds"],
+        "process_seconds": process_seconds,
+        "heavy_modules_loaded": measured["heavy_modules"],
+        "target": args.cold_start_target,
+        "met": measured["seconds"] <= args.cold_start_target,
+    }
+
+
+# A typical small snippet: an import the sandbox already has warm, some output
+_EXEC_PROBE = "import json\nprint(json.dumps({'ok': [1, 2, 3]}))"
+
+
+def measure_exec_overhead(runs: int) -> Dict[str, Any]:
+    """
+    Per-execution overhead of each sandbox kind for a trivial snippet, plus
+    the time until its first run completes (process start + preloads).
+    """
+    kinds: Dict[str, Any] = {"pool": lambda: SandboxPool(size=1)}
+    if hasattr(os, "fork"):
+        kinds["zygote"] = lambda: ZygotePool(size=1)
+
+    report: Dict[str, Any] = {}
+    for name, factory in kinds.items():
+        def run_once() -> None:
+            pool.run(_EXEC_PROBE, timeout=10, cpu_seconds=10,
+                     max_output_chars=DEFAULT_MAX_OUTPUT_CHARS,
+                     output_limit=DEFAULT_OUTPUT_LIMIT)
+
+        started = time.perf_counter()
+        pool = factory()
+        try:
+            run_once()
+            startup = time.perf_counter() - started
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                run_once()
+                timings.append(time.perf_counter() - started)
+        finally:
+            pool.close()
+        report[name] = {"startup_seconds": startup, "per_exec": summarize(timings)}
+    return report
+
+
+def build_report(jobs: List[Dict[str, Any]], total_time: float,
+                 args: argparse.Namespace, model_name: str) -> Dict[str, Any]:
+    attempts: Dict[str, int] = {}
+    for job in jobs:
+        key = str(job["attempts"])
+        attempts[key] = attempts.get(key, 0) + 1
+
+    reused = [job for job in jobs if job["reused"]]
+    fresh = [job for job in jobs if not job["reused"]]
+
+    by_category: Dict[str, Dict[str, Any]] = {}
+    for category in sorted({job["category"] for job in jobs}):
+        subset = [job for job in jobs if job["category"] == category]
+        by_category[category] = {
+            "jobs": len(subset),
+            "success_rate": sum(job["success"] for job in subset) / len(subset),
+            "wall_time": summarize([job["wall_time"] for job in subset]),
+        }
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "model": model_name,
+            "backend": args.backend,
+            "latency": args.latency,
+            "jobs": len(jobs),
+            "users": args.users,
+            "max_retries": args.max_retries,
+            "candidates": args.candidates,
+            "rpm": args.rpm,
+            "tpm": args.tpm,
+            "fused": args.fused,
+            "similar_fixes": args.similar_fixes,
+        },
+        "throughput_jobs_per_s": len(jobs) / total_time if total_time else 0.0,
+        "total_time": total_time,
+        "success_rate": sum(job["success"] for job in jobs) / len(jobs) if jobs else 0.0,
+        "end_to_end": summarize([job["wall_time"] for job in fresh]),
+        # Jobs answered from the FixIndex skip the model; keep them out of the above
+        "reused_jobs": sum(job["reused"] for job in jobs),
+        "end_to_end_reused": summarize([job["wall_time"] for job in reused]),
+        "phases": {
+            phase: summarize([job["phases"][phase] for job in jobs]) for phase in PHASES
+        },
+        "attempts": {
+            "distribution": attempts,
+            "mean": sum(job["attempts"] for job in jobs) / len(jobs) if jobs else 0.0,
+        },
+        "llm_calls": summarize([job["llm_calls"] for job in jobs]),
+        "prompt_chars": summarize([job["prompt_chars"] for job in jobs]),
+        "response_chars": summarize([job["response_chars"] for job in jobs]),
+        "by_category": by_category,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the multi-agent debugger.")
+    parser.add_argument("--jobs", type=int, default=30, help="number of programs to run")
+    parser.add_argument("--users", type=int, default=1, help="concurrent simulated users")
+    parser.add_argument("--corpus", help="directory of .py files (default: built-in corpus)")
+    parser.add_argument("--backend", default="fake", choices=["fake", "env"],
+                        help="fake = offline FakeBackend, env = LLM_BACKEND from environment")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="mean fake model latency in seconds (lognormal)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="speculative fix candidates per attempt")
+    parser.add_argument("--rpm", type=float, default=0,
+                        help="shared requests-per-minute limit (0 = none)")
+    parser.add_argument("--tpm", type=float, default=0,
+                        help="shared tokens-per-minute limit (0 = none)")
+    parser.add_argument("--cold-start-target", type=float, default=0.5,
+                        help="seconds allowed from import to a ready Coordinator")
+    parser.add_argument("--exec-runs", type=int, default=30,
+                        help="executions per sandbox kind for the overhead probe (0 = skip)")
+    parser.add_argument("--fused", default="off", choices=["off", "on", "compare"],
+                        help="single-call analyze + fix; compare runs the load both ways")
+    parser.add_argument("--cache", action="store_true",
+                        help="use the LLM_CACHE response cache (off by default: "
+                             "repeated corpus items would be answered from it)")
+    parser.add_argument("--similar-fixes", action="store_true",
+                        help="reuse fixes of near-duplicate bugs (off by default: the "
+                             "templated corpus would mostly take that shortcut)")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--metrics",
+                        help="write Prometheus text metrics to this file")
+    return parser.parse_args(argv)
+
+
+def make_backend(args: argparse.Namespace, limiter: RateLimiter) -> LLMBackend:
+    if args.backend == "env":
+        # Gemini is already behind the shared limiter (LLM_RPM / LLM_TPM)
+        return create_backend()
+    if args.latency <= 0:
+        backend = FakeBackend(seed=args.seed)
+    else:
+        # Lognormal with sigma 0.5 has mean exp(mu + 0.125)
+        mu = math.log(args.latency) - 0.125
+        backend = FakeBackend(latency=("lognormal", mu, 0.5), seed=args.seed)
+    if limiter.enabled:
+        backend = RateLimitedBackend(backend, limiter)
+    return backend
+
+
+def make_router(args: argparse.Namespace, limiter: RateLimiter) -> ModelRouter:
+    if args.backend == "env":
+        # Role models and GEMINI_CASCADE tiers from the environment, each one metered
+        return ModelRouter(backend_factory=lambda model: MeteredBackend(create_backend(model)))
+    return ModelRouter.single(MeteredBackend(make_backend(args, limiter)))
+
+
+def run_mode(args: argparse.Namespace, limiter: RateLimiter, corpus: List[Tuple[str, str]],
+             fused: bool) -> Tuple[Coordinator, List[Dict[str, Any]], float]:
+    # Fresh router and coordinator, so neither mode warms the other's caches
+    coordinator = Coordinator(
+        max_retries=args.max_retries,
+        max_concurrency=max(1, args.users),
+        router=make_router(args, limiter),
+        speculative_candidates=args.candidates,
+        cache=cache_from_env() if args.cache else None,
+        similar_fixes=args.similar_fixes,
+        # Per-phase times come from the trace spans
+        tracing=True,
+        fused=fused,
+    )
+    jobs, total_time = run_sync(run_load(coordinator, corpus, max(1, args.users)))
+    return coordinator, jobs, total_time
+
+
+def mode_summary(report: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: report[key]
+        for key in ("success_rate", "throughput_jobs_per_s", "end_to_end",
+                    "llm_calls", "prompt_chars", "response_chars")
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+
+    if args.backend == "env":
+        limiter = get_shared_limiter()
+    else:
+        limiter = RateLimiter(args.rpm or None, args.tpm or None)
+    corpus = load_corpus(args.corpus, args.jobs)
+
+    coordinator, jobs, total_time = run_mode(args, limiter, corpus, args.fused == "on")
+    router = coordinator.router
+    report = build_report(jobs, total_time, args, router.signature())
+    if args.fused == "compare":
+        _, fused_jobs, fused_time = run_mode(args, limiter, corpus, True)
+        report["modes"] = {
+            "two_call": mode_summary(report),
+            "fused": mode_summary(build_report(fused_jobs, fused_time, args, "")),
+        }
+    # Latency, cost and fix success rate per model, for tuning the cascade
+    report["models"] = coordinator.model_stats()
+    if coordinator.cache is not None:
+        report["cache"] = coordinator.cache.stats()
+    # Queue wait at the limiter, for sizing RPM/TPM quota against load
+    report["rate_limit"] = limiter.stats()
+    report["cold_start"] = measure_cold_start(args)
+    if args.exec_runs > 0:
+        report["sandbox_overhead"] = measure_exec_overhead(args.exec_runs)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.metrics:
+        telemetry.REGISTRY.write_prometheus(args.metrics)
+
+    e2e = report["end_to_end"]
+    print(
+        f"{len(jobs)} jobs, {args.users} user(s): "
+        f"p50={e2e['p50']:.3f}s p95={e2e['p95']:.3f}s p99={e2e['p99']:.3f}s "
+        f"throughput={report['throughput_jobs_per_s']:.2f} jobs/s "
+        f"success={report['success_rate']:.0%} -> {args.output}"
+    )
+    if report["reused_jobs"]:
+        reused = report["end_to_end_reused"]
+        print(f"{report['reused_jobs']} job(s) reused a similar fix "
+              f"(excluded above): p50={reused['p50']:.3f}s")
+    cold = report["cold_start"]
+    if "met" in cold:
+        print(
+            f"cold start {cold['import_and_init_seconds']:.3f}s "
+            f"(target {cold['target']:.3f}s: {'met' if cold['met'] else 'MISSED'})"
+        )
+    for model, stats in report["models"].items():
+        print(
+            f"model {model}: {stats['calls']} calls, {stats['latency_mean']:.3f}s mean, "
+            f"${stats['cost_usd']:.4f}, fix rate {stats['fix_success_rate']}"
+        )
+    for mode, summary in report.get("modes", {}).items():
+        print(
+            f"{mode}: {summary['llm_calls']['mean']:.2f} calls/job, "
+            f"{summary['prompt_chars']['mean']:.0f} prompt chars/job, "
+            f"p50={summary['end_to_end']['p50']:.3f}s success={summary['success_rate']:.0%}"
+        )
+    for kind, overhead in report.get("sandbox_overhead", {}).items():
+        print(
+            f"sandbox {kind}: {overhead['per_exec']['p50'] * 1000:.2f}ms/exec p50, "
+            f"{overhead['per_exec']['p95'] * 1000:.2f}ms p95, "
+            f"first run after {overhead['startup_seconds']:.3f}s"
+        )
+    return report
+
+
+if __name__ == "__main__":
+    main()
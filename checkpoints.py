@@ -0,0 +1,122 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+def input_hash(code: str, config: str = "") -> str:
+    # Config that changes what the pipeline does (retries, candidates, ...) is
+    # part of the hash, so a rerun with different settings doesn't reuse old steps
+    return hashlib.sha256(f"{config}\0{code}".encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    SQLite record of completed pipeline steps (one row per job + step) and of
+    finished jobs, so a restarted job resumes at its first incomplete step
+    and a rerun batch skips what is already done.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, input_hash TEXT NOT NULL, status TEXT NOT NULL, "
+            "updated REAL NOT NULL, result TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS steps ("
+            "job_id TEXT NOT NULL, step TEXT NOT NULL, created REAL NOT NULL, "
+            "payload TEXT NOT NULL, PRIMARY KEY (job_id, step))"
+        )
+        self._db.commit()
+
+    def begin(self, job_id: str, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        Register a job run. Returns the stored result if this exact input
+        already finished; steps saved for a different input are discarded.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT input_hash, status, result FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is not None and row[0] == digest:
+                if row[1] == "done" and row[2] is not None:
+                    return json.loads(row[2])
+                return None
+
+            if row is not None:
+                self._db.execute("DELETE FROM steps WHERE job_id = ?", (job_id,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, input_hash, status, updated, result) "
+                "VALUES (?, ?, 'running', ?, NULL)",
+                (job_id, digest, time.time()),
+            )
+            self._db.commit()
+            return None
+
+    def load(self, job_id: str, step: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload FROM steps WHERE job_id = ? AND step = ?", (job_id, step)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def save(self, job_id: str, step: str, payload: Any) -> None:
+        data = json.dumps(payload, default=str)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO steps (job_id, step, created, payload) VALUES (?, ?, ?, ?)",
+                (job_id, step, time.time(), data),
+            )
+            self._db.commit()
+
+    def finish(self, job_id: str, result: Dict[str, Any]) -> None:
+        """
+        Mark a job done and keep its result; its step rows are no longer needed.
+        """
+        data = json.dumps(result, default=_plain)
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'done', updated = ?, result = ? WHERE job_id = ?",
+                (time.time(), data, job_id),
+            )
+            self._db.execute("DELETE FROM steps WHERE job_id = ?", (job_id,))
+            self._db.commit()
+
+    def is_finished(self, job_id: str, digest: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM jobs WHERE job_id = ? AND input_hash = ? AND status = 'done'",
+                (job_id, digest),
+            ).fetchone()
+        return row is not None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall())
+            (steps,) = self._db.execute("SELECT COUNT(*) FROM steps").fetchone()
+        return {"done": counts.get("done", 0), "running": counts.get("running", 0),
+                "steps": steps}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _plain(value: Any) -> Any:
+    # HistoryView / MemoryEvent and anything else JSON doesn't know
+    to_list = getattr(value, "to_list", None)
+    if to_list is not None:
+        return to_list()
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    return str(value)
@@ -0,0 +1,202 @@
+import ast
+import collections
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+TRACEBACK_FRAME = re.compile(r"^\s*line (\d+), in (.+)$", re.M)
+
+
+class CodeUnit:
+    """
+    One top-level function or class of a module, with its 1-based line range
+    (decorators included).
+    """
+
+    __slots__ = ("name", "kind", "start", "end", "source", "fingerprint")
+
+    def __init__(self, name: str, kind: str, start: int, end: int, source: str,
+                 fingerprint: str = ""):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.source = source
+        self.fingerprint = fingerprint
+
+    def __repr__(self) -> str:
+        return f"CodeUnit({self.kind} {self.name}, lines {self.start}-{self.end})"
+
+
+def split_units(code: str) -> Optional[List[CodeUnit]]:
+    """
+    Top-level defs and classes in source order, or None if the code doesn't parse.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+
+    lines = code.splitlines()
+    units = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            kind = "function"
+        elif isinstance(node, ast.ClassDef):
+            kind = "class"
+        else:
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        end = node.end_lineno
+        units.append(CodeUnit(
+            node.name, kind, start, end, "\n".join(lines[start - 1:end]), fingerprint(node),
+        ))
+    return units
+
+
+def fingerprint(node: ast.AST) -> str:
+    """
+    Hash of a definition's normalized AST: comments, blank lines, formatting
+    and its position in the file don't change it.
+    """
+    dumped = ast.dump(node, annotate_fields=False, include_attributes=False)
+    return hashlib.sha256(dumped.encode("utf-8")).hexdigest()[:24]
+
+
+def failing_units(units: List[CodeUnit], traceback_text: Optional[str]) -> List[CodeUnit]:
+    """
+    Units whose line range contains a frame of the traceback, innermost last.
+    """
+    if not traceback_text:
+        return []
+
+    hit = []
+    for match in TRACEBACK_FRAME.finditer(traceback_text):
+        lineno = int(match.group(1))
+        for unit in units:
+            if unit.start <= lineno <= unit.end and unit not in hit:
+                hit.append(unit)
+    return hit
+
+
+def signature_summary(code: str, exclude: List[str]) -> str:
+    """
+    One line per top-level def/class (methods indented below classes), so the
+    model knows what else exists without seeing its bodies.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return ""
+
+    lines = []
+    for node in tree.body:
+        if getattr(node, "name", None) in exclude:
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            lines.append(_signature(node))
+        elif isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(base) for base in node.bases)
+            lines.append(f"class {node.name}({bases}):" if bases else f"class {node.name}:")
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    lines.append(f"    {_signature(item)}")
+        elif isinstance(node, (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign)):
+            lines.append(ast.unparse(node)[:120])
+    return "\n".join(lines)
+
+
+def _signature(node) -> str:
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    doc = ast.get_docstring(node)
+    hint = f"  # {doc.strip().splitlines()[0][:80]}" if doc else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}: ...{hint}"
+
+
+def stitch(code: str, units: List[CodeUnit], replacements: Dict[str, str]) -> str:
+    """
+    Replace the source of each named unit with its new text.
+    """
+    lines = code.splitlines()
+    for unit in sorted(units, key=lambda u: u.start, reverse=True):
+        if unit.name in replacements:
+            lines[unit.start - 1:unit.end] = replacements[unit.name].splitlines()
+
+    stitched = "\n".join(lines)
+    if code.endswith("\n"):
+        stitched += "\n"
+    return stitched
+
+
+def extract_unit(code: str, name: str) -> Optional[str]:
+    """
+    Source of the top-level def/class called `name` in `code` (the fixer may
+    return helpers or comments around it), or None if it isn't there.
+    """
+    units = split_units(code)
+    if not units:
+        return None
+    for unit in units:
+        if unit.name == name:
+            return unit.source
+    return None
+
+
+class UnitMemo:
+    """
+    Findings per unit fingerprint from earlier runs: verified fixes, and
+    analyses per (fingerprint, error). Lets a resubmitted file reuse them for
+    the definitions that didn't change. Bounded; least recently used go first.
+    """
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._fixes: "collections.OrderedDict[str, str]" = collections.OrderedDict()
+        self._analyses: "collections.OrderedDict[Tuple[str, str], str]" = collections.OrderedDict()
+
+    def fix_for(self, unit: CodeUnit) -> Optional[str]:
+        fixed = self._fixes.get(unit.fingerprint)
+        if fixed is not None:
+            self._fixes.move_to_end(unit.fingerprint)
+        return fixed
+
+    def known_fixes(self, units: List[CodeUnit]) -> Dict[str, str]:
+        known = {}
+        for unit in units:
+            fixed = self.fix_for(unit)
+            if fixed is not None:
+                known[unit.name] = fixed
+        return known
+
+    def analysis_for(self, unit: CodeUnit, error: str) -> Optional[str]:
+        key = (unit.fingerprint, error)
+        analysis = self._analyses.get(key)
+        if analysis is not None:
+            self._analyses.move_to_end(key)
+        return analysis
+
+    def add_analysis(self, unit: CodeUnit, error: str, analysis: str) -> None:
+        self._put(self._analyses, (unit.fingerprint, error), analysis)
+
+    def learn(self, original: str, fixed: str) -> int:
+        """
+        Remember, for every unit of `original` that the (verified) `fixed`
+        code changed, its fixed source. Returns the number of units learned.
+        """
+        learned = 0
+        for unit in split_units(original) or []:
+            new_source = extract_unit(fixed, unit.name)
+            if new_source is None:
+                continue
+            new_units = split_units(new_source)
+            if new_units and new_units[0].fingerprint != unit.fingerprint:
+                self._put(self._fixes, unit.fingerprint, new_source)
+                learned += 1
+        return learned
+
+    def _put(self, table: collections.OrderedDict, key, value: str) -> None:
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_entries:
+            table.popitem(last=False)
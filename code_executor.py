@@ -1,66 +1,710 @@
+import asyncio
+import atexit
+import collections
 import io
 import contextlib
-from typing import Dict, Any
+import importlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import selectors
+import signal
+import sys
+import threading
+import time
+import traceback
+import types
+from typing import Callable, Dict, Any, Iterable, Optional, Union
 
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, wall-clock timeout still applies
+    resource = None
 
-class CodeExecutor:
-    def __init__(self, timeout: int = 5):
-        self.timeout = timeout
-        # Persistent execution environment so imports + functions survive between calls
-        self.env: Dict[str, Any] = {
-    "__builtins__": __builtins__,
-    "__name__": "__main__",   # ← NEW
-}
+from telemetry import span
 
+# Captured stdout/stderr keeps this many chars from the start and from the end
+DEFAULT_MAX_OUTPUT_CHARS = 10_000
+# Execution is aborted once the program has printed more than this in total
+DEFAULT_OUTPUT_LIMIT = 1_000_000
+# Modules the zygote imports once so every forked run starts warm (missing ones are skipped)
+DEFAULT_PRELOAD = (
+    "json", "math", "re", "collections", "itertools", "functools", "datetime",
+    "numpy", "pandas",
+)
+# The zygote enforces timeouts itself; the parent only gives up on a hung zygote after this
+ZYGOTE_GRACE_SECONDS = 2.0
+# How often a waiting run checks whether it was cancelled
+CANCEL_POLL_SECONDS = 0.05
 
-    def execute(self, code: str) -> Dict[str, Any]:
-        stdout_buffer = io.StringIO()
-        stderr_buffer = io.StringIO()
 
-        result = {
-            "success": False,
-            "output": "",
-            "error": None,
-            "error_type": None,
-        }
+class OutputLimitExceeded(Exception):
+    pass
 
-        try:
-            with contextlib.redirect_stdout(stdout_buffer):
-                with contextlib.redirect_stderr(stderr_buffer):
-                    exec(code, self.env, self.env)
 
+class BoundedStream(io.TextIOBase):
+    """
+    Text sink that keeps only the head and tail of what is written,
+    and aborts the writer once the total goes past `limit`.
+    """
+
+    def __init__(self, keep: int = DEFAULT_MAX_OUTPUT_CHARS, limit: int = DEFAULT_OUTPUT_LIMIT):
+        self.keep = keep
+        self.limit = limit
+        self.total = 0
+        self._head = io.StringIO()
+        self._head_size = 0
+        self._tail: collections.deque = collections.deque()
+        self._tail_size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        written = len(text)
+        self.total += written
+
+        room = self.keep - self._head_size
+        if room > 0:
+            self._head.write(text[:room])
+            self._head_size += min(room, len(text))
+            text = text[room:]
+
+        if text:
+            self._tail.append(text)
+            self._tail_size += len(text)
+            while self._tail_size - len(self._tail[0]) >= self.keep:
+                self._tail_size -= len(self._tail.popleft())
+
+        if self.total > self.limit:
+            raise OutputLimitExceeded(f"Program printed more than {self.limit} characters")
+        return written
+
+    def getvalue(self) -> str:
+        head = self._head.getvalue()
+        tail = "".join(self._tail)[-self.keep:] if self._tail else ""
+        dropped = self.total - len(head) - len(tail)
+        if dropped > 0:
+            return f"{head}\n... [{dropped} characters truncated] ...\n{tail}"
+        return head + tail
+
+
+def _run_code(code: str, env: Dict[str, Any], max_output_chars: int,
+              output_limit: int) -> Dict[str, Any]:
+    stdout_buffer = BoundedStream(max_output_chars, output_limit)
+    stderr_buffer = BoundedStream(max_output_chars, output_limit)
+
+    result = {
+        "success": False,
+        "output": "",
+        "error": None,
+        "error_type": None,
+        "traceback": None,
+    }
+
+    try:
+        with contextlib.redirect_stdout(stdout_buffer):
+            with contextlib.redirect_stderr(stderr_buffer):
+                exec(code, env, env)
+
+        result["success"] = True
+        # Combine stdout + stderr
+        out = stdout_buffer.getvalue()
+        err = stderr_buffer.getvalue()
+        result["output"] = (out + ("\n" + err if err else "")).strip()
+
+    except SyntaxError as e:
+        result["error"] = f"Syntax Error: {str(e)}"
+        result["error_type"] = "SyntaxError"
+        result["output"] = stdout_buffer.getvalue()
+        result["traceback"] = _snippet_traceback(e, code)
+
+    except NameError as e:
+        result["error"] = f"Name Error: {str(e)}"
+        result["error_type"] = "NameError"
+        result["output"] = stdout_buffer.getvalue()
+        result["traceback"] = _snippet_traceback(e, code)
+
+    except TypeError as e:
+        result["error"] = f"Type Error: {str(e)}"
+        result["error_type"] = "TypeError"
+        result["output"] = stdout_buffer.getvalue()
+        result["traceback"] = _snippet_traceback(e, code)
+
+    except ZeroDivisionError as e:
+        result["error"] = f"Zero Division Error: {str(e)}"
+        result["error_type"] = "ZeroDivisionError"
+        result["output"] = stdout_buffer.getvalue()
+        result["traceback"] = _snippet_traceback(e, code)
+
+    except OutputLimitExceeded as e:
+        result["error"] = f"Output Limit: {str(e)}"
+        result["error_type"] = "OutputLimit"
+        result["output"] = stdout_buffer.getvalue()
+        result["traceback"] = _snippet_traceback(e, code)
+
+    except SystemExit as e:
+        # sys.exit(0) / sys.exit() is a normal end of a script
+        if e.code in (None, 0):
             result["success"] = True
-            # Combine stdout + stderr
-            out = stdout_buffer.getvalue()
-            err = stderr_buffer.getvalue()
-            result["output"] = (out + ("\n" + err if err else "")).strip()
-
-        except SyntaxError as e:
-            result["error"] = f"Syntax Error: {str(e)}"
-            result["error_type"] = "SyntaxError"
+            result["output"] = stdout_buffer.getvalue().strip()
+        else:
+            result["error"] = f"SystemExit: {e.code}"
+            result["error_type"] = "SystemExit"
             result["output"] = stdout_buffer.getvalue()
+            result["traceback"] = _snippet_traceback(e, code)
 
-        except NameError as e:
-            result["error"] = f"Name Error: {str(e)}"
-            result["error_type"] = "NameError"
-            result["output"] = stdout_buffer.getvalue()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+        result["error_type"] = type(e).__name__
+        result["output"] = stdout_buffer.getvalue()
+        result["traceback"] = _snippet_traceback(e, code)
 
-        except TypeError as e:
-            result["error"] = f"Type Error: {str(e)}"
-            result["error_type"] = "TypeError"
-            result["output"] = stdout_buffer.getvalue()
+    return result
 
-        except ZeroDivisionError as e:
-            result["error"] = f"Zero Division Error: {str(e)}"
-            result["error_type"] = "ZeroDivisionError"
-            result["output"] = stdout_buffer.getvalue()
 
-        except Exception as e:
-            result["error"] = f"{type(e).__name__}: {str(e)}"
-            result["error_type"] = type(e).__name__
-            result["output"] = stdout_buffer.getvalue()
+def _snippet_traceback(error: BaseException, code: str) -> str:
+    """
+    Traceback limited to frames inside the snippet, with the offending source lines.
+    """
+    source = code.splitlines()
+    lines = ["Traceback (most recent call last):"]
+
+    if isinstance(error, SyntaxError):
+        frames = [(error.lineno, "<module>")] if error.lineno else []
+    else:
+        frames = [
+            (frame.lineno, frame.name)
+            for frame in traceback.extract_tb(error.__traceback__)
+            if frame.filename == "<string>"
+        ]
+
+    for lineno, name in frames[-10:]:
+        lines.append(f"  line {lineno}, in {name}")
+        if lineno and 0 < lineno <= len(source):
+            lines.append(f"    {source[lineno - 1].strip()}")
+
+    lines.append(f"{type(error).__name__}: {error}")
+    return "\n".join(lines)
+
+
+def _fresh_env() -> Dict[str, Any]:
+    return {
+        "__builtins__": __builtins__,
+        "__name__": "__main__",
+    }
+
+
+def _worker_main(conn, memory_limit_mb: Optional[int]) -> None:
+    """
+    Entry point of a sandbox worker process: run one snippet per message,
+    each in a fresh globals dict. Already-imported modules stay warm.
+    """
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+
+        code, cpu_seconds, max_output_chars, output_limit = message
+
+        if resource is not None and cpu_seconds:
+            # RLIMIT_CPU is cumulative, so allow `cpu_seconds` on top of what we've used
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (used + int(cpu_seconds) + 1, hard))
+
+        conn.send(_run_code(code, _fresh_env(), max_output_chars, output_limit))
+
+
+# Serializes the __main__ swap in _Worker
+_start_lock = threading.Lock()
+
+
+class _Worker:
+    def __init__(self, context, target=_worker_main, args: tuple = ()):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=target,
+            args=(child_conn, *args),
+            daemon=True,
+        )
+        # A spawned child re-runs the parent's __main__ script before `target`.
+        # Sandbox processes need none of it, and under `streamlit run` that
+        # script is the page itself (Streamlit installs it as __main__).
+        with _start_lock:
+            main = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                self.process.start()
+            finally:
+                sys.modules["__main__"] = main
+        child_conn.close()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pre-warmed pool of worker processes that run untrusted snippets.
+    A worker that times out or dies is killed and replaced.
+    """
+
+    def __init__(self, size: Optional[int] = None, memory_limit_mb: Optional[int] = 512):
+        self.size = size or min(8, os.cpu_count() or 2)
+        self.memory_limit_mb = memory_limit_mb
+        # spawn: the parent runs an event loop thread, so fork() is not safe here
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def run(self, code: str, timeout: float, cpu_seconds: Optional[float],
+            max_output_chars: int, output_limit: int,
+            cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        worker = self._idle.get()
+        try:
+            worker.conn.send((code, cpu_seconds, max_output_chars, output_limit))
+            if _wait(worker.conn.poll, timeout, cancel):
+                result = worker.conn.recv()
+                self._idle.put(worker)
+                return result
+            crashed = False
+        except (EOFError, OSError, BrokenPipeError):
+            # Worker died mid-run (CPU rlimit, hard crash, OOM kill)
+            crashed = True
+
+        # Reap the worker first: its exit code is only final after join()
+        worker.kill()
+        self._idle.put(self._spawn())
+        exitcode = worker.process.exitcode
+        if cancel is not None and cancel.is_set():
+            return _cancelled()
+        if exitcode == -getattr(signal, "SIGXCPU", -1):
+            return _failure(
+                "Timeout", f"Timeout: CPU time limit of {cpu_seconds}s exceeded"
+            )
+        if not crashed:
+            return _failure(
+                "Timeout", f"Timeout: execution exceeded {timeout} seconds and was killed"
+            )
+        return _failure("WorkerCrashed", f"Worker crashed (exit code {exitcode})")
+
+    def close(self) -> None:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                worker.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            worker.kill()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, _worker_main, (self.memory_limit_mb,))
+
+
+def _failure(error_type: str, error: str) -> Dict[str, Any]:
+    return {
+        "success": False,
+        "output": "",
+        "error": error,
+        "error_type": error_type,
+        "traceback": None,
+    }
+
+
+def _cancelled() -> Dict[str, Any]:
+    return _failure("Cancelled", "Cancelled: the run was no longer needed and was killed")
+
+
+def _wait(ready: Callable[[float], bool], timeout: float,
+          cancel: Optional[threading.Event]) -> bool:
+    """
+    ready(seconds) blocks up to `seconds` for the answer. True once it is
+    there; False on timeout, or soon after `cancel` is set.
+    """
+    if cancel is None:
+        return ready(timeout)
+    deadline = time.monotonic() + timeout
+    while not cancel.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        if ready(min(remaining, CANCEL_POLL_SECONDS)):
+            return True
+    return False
+
+
+def _address_space() -> int:
+    # Current virtual memory size on Linux; 0 where /proc isn't available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _zygote_child(write_fd: int, code: str, cpu_seconds: Optional[float],
+                  max_output_chars: int, output_limit: int,
+                  memory_limit_mb: Optional[int]) -> None:
+    # Runs in the forked child: one snippet, result pickled to write_fd, then exit
+    try:
+        if resource is not None and memory_limit_mb:
+            # Headroom on top of the inherited preloads rather than an absolute cap
+            limit = _address_space() + memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        if resource is not None and cpu_seconds:
+            # A forked child starts with zero CPU time used
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_seconds) + 1, hard))
+
+        result = _run_code(code, _fresh_env(), max_output_chars, output_limit)
+        view = memoryview(pickle.dumps(result))
+        while view:
+            view = view[os.write(write_fd, view):]
+    finally:
+        os._exit(0)
+
+
+class _Child:
+    __slots__ = ("request_id", "pid", "timeout", "deadline", "cpu_seconds", "data")
+
+    def __init__(self, request_id: int, pid: int, timeout: float,
+                 cpu_seconds: Optional[float]):
+        self.request_id = request_id
+        self.pid = pid
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.cpu_seconds = cpu_seconds
+        self.data = bytearray()
+
+    def result(self, status: int) -> Dict[str, Any]:
+        if self.data:
+            try:
+                return pickle.loads(bytes(self.data))
+            except Exception:
+                pass
+        if os.WIFSIGNALED(status):
+            if os.WTERMSIG(status) == getattr(signal, "SIGXCPU", None):
+                return _failure(
+                    "Timeout", f"Timeout: CPU time limit of {self.cpu_seconds}s exceeded"
+                )
+            exitcode = -os.WTERMSIG(status)
+        else:
+            exitcode = os.WEXITSTATUS(status)
+        return _failure("WorkerCrashed", f"Worker crashed (exit code {exitcode})")
+
+
+def _zygote_main(conn, memory_limit_mb: Optional[int], preload: Iterable[str]) -> None:
+    """
+    Entry point of the zygote: import `preload` once, then fork a copy-on-write
+    child per request, so every run starts from the same clean but warm state.
+    Requests overlap; each answer goes back tagged with its request id.
+    """
+    # Native thread pools don't survive fork(); keep numeric libraries single-threaded
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # Not installed or broken: snippets importing it just pay the cost themselves
+            pass
+
+    selector = selectors.DefaultSelector()
+    selector.register(conn, selectors.EVENT_READ)
+    running: Dict[int, _Child] = {}
+
+    def reap(fd: int) -> _Child:
+        child = running.pop(fd)
+        selector.unregister(fd)
+        os.close(fd)
+        return child
+
+    while True:
+        deadline = min((child.deadline for child in running.values()), default=None)
+        wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        for key, _ in selector.select(wait):
+            if key.fileobj is conn:
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    message = None
+                if message is None:
+                    for child in running.values():
+                        os.kill(child.pid, signal.SIGKILL)
+                    return
+                if isinstance(message, int):
+                    # Cancelled by the parent: kill that run, nobody waits for its answer
+                    for fd in [fd for fd, child in running.items() if child.request_id == message]:
+                        child = reap(fd)
+                        os.kill(child.pid, signal.SIGKILL)
+                        os.waitpid(child.pid, 0)
+                    continue
+
+                request_id, code, timeout, cpu_seconds, max_output_chars, output_limit = message
+                read_fd, write_fd = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(read_fd)
+                    conn.close()
+                    _zygote_child(write_fd, code, cpu_seconds, max_output_chars,
+                                  output_limit, memory_limit_mb)
+                os.close(write_fd)
+                running[read_fd] = _Child(request_id, pid, timeout, cpu_seconds)
+                selector.register(read_fd, selectors.EVENT_READ)
+                continue
+
+            fd = key.fd
+            if fd not in running:
+                # Cancelled earlier in this batch of events
+                continue
+            chunk = os.read(fd, 65536)
+            if chunk:
+                running[fd].data += chunk
+                continue
+            child = reap(fd)
+            _, status = os.waitpid(child.pid, 0)
+            conn.send((child.request_id, child.result(status)))
+
+        now = time.monotonic()
+        for fd in [fd for fd, child in running.items() if child.deadline <= now]:
+            child = reap(fd)
+            os.kill(child.pid, signal.SIGKILL)
+            os.waitpid(child.pid, 0)
+            conn.send((child.request_id, _failure(
+                "Timeout", f"Timeout: execution exceeded {child.timeout} seconds and was killed"
+            )))
+
+
+class ZygotePool:
+    """
+    Sandbox backed by one zygote process that pre-imports `preload` and forks
+    a child per execution: runs can't see each other's globals, imports or
+    monkey-patching, yet don't pay for importing heavy libraries again.
+    Same run()/close() interface as SandboxPool; up to `size` runs at once.
+    """
+
+    def __init__(self, size: Optional[int] = None, memory_limit_mb: Optional[int] = 512,
+                 preload: Optional[Iterable[str]] = None):
+        self.size = size or min(8, os.cpu_count() or 2)
+        self.memory_limit_mb = memory_limit_mb
+        self.preload = tuple(DEFAULT_PRELOAD if preload is None else preload)
+        # The zygote itself is spawned (the parent has threads); it forks its children
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._ids = itertools.count()
+        self._zygote: Optional[_Worker] = None
+        self._zygote = self._start()
+
+    def run(self, code: str, timeout: float, cpu_seconds: Optional[float],
+            max_output_chars: int, output_limit: int,
+            cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        with self._slots:
+            waiter: Dict[str, Any] = {"event": threading.Event(), "result": None}
+            with self._lock:
+                if self._zygote is None:
+                    # Respawn after a crash
+                    self._zygote = self._start()
+                zygote = waiter["zygote"] = self._zygote
+                request_id = next(self._ids)
+                self._pending[request_id] = waiter
+
+            try:
+                with self._send_lock:
+                    zygote.conn.send(
+                        (request_id, code, timeout, cpu_seconds, max_output_chars, output_limit)
+                    )
+            except (OSError, BrokenPipeError):
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                return _failure("WorkerCrashed", "Sandbox zygote is not running")
+
+            if _wait(waiter["event"].wait, timeout + ZYGOTE_GRACE_SECONDS, cancel):
+                return waiter["result"]
+
+            with self._lock:
+                self._pending.pop(request_id, None)
+            if cancel is not None and cancel.is_set():
+                # Have the zygote kill the child, so the slot is free right away
+                try:
+                    with self._send_lock:
+                        zygote.conn.send(request_id)
+                except (OSError, BrokenPipeError):
+                    pass
+                return _cancelled()
+
+            # The zygote stopped answering: replace it (its pending runs fail)
+            zygote.kill()
+            return _failure(
+                "Timeout", f"Timeout: execution exceeded {timeout} seconds and was killed"
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            zygote, self._zygote = self._zygote, None
+        if zygote is None:
+            return
+        try:
+            with self._send_lock:
+                zygote.conn.send(None)
+            zygote.process.join(1)
+        except (OSError, BrokenPipeError):
+            pass
+        zygote.kill()
+
+    def _start(self) -> _Worker:
+        zygote = _Worker(self._context, _zygote_main, (self.memory_limit_mb, self.preload))
+        threading.Thread(target=self._read, args=(zygote,), daemon=True).start()
+        return zygote
+
+    def _read(self, zygote: _Worker) -> None:
+        # Hand each answer to the run() waiting for it
+        while True:
+            try:
+                request_id, result = zygote.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                waiter = self._pending.pop(request_id, None)
+            if waiter is not None:
+                waiter["result"] = result
+                waiter["event"].set()
+
+        # Zygote gone: fail whatever it was still running, start over on next run
+        with self._lock:
+            if self._zygote is zygote:
+                self._zygote = None
+            orphans = [
+                request_id for request_id, waiter in self._pending.items()
+                if waiter["zygote"] is zygote
+            ]
+            waiters = [self._pending.pop(request_id) for request_id in orphans]
+        exitcode = zygote.process.exitcode
+        for waiter in waiters:
+            waiter["result"] = _failure(
+                "WorkerCrashed", f"Sandbox zygote crashed (exit code {exitcode})"
+            )
+            waiter["event"].set()
+
+
+Sandbox = Union[SandboxPool, ZygotePool]
+
+_default_pool: Optional[Sandbox] = None
+_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> Sandbox:
+    """
+    Process-wide sandbox, created on first use and shared by every executor.
+    SANDBOX_MODE=zygote (default where fork() exists) forks each run from a
+    warm zygote pre-importing SANDBOX_PRELOAD; SANDBOX_MODE=pool reuses
+    long-lived workers.
+    """
+    global _default_pool
+    with _pool_lock:
+        if _default_pool is None:
+            size = int(os.getenv("SANDBOX_WORKERS", "0")) or None
+            memory_mb = int(os.getenv("SANDBOX_MEMORY_MB", "512")) or None
+            mode = os.getenv("SANDBOX_MODE", "zygote" if hasattr(os, "fork") else "pool")
+            if mode == "zygote":
+                preload = os.getenv("SANDBOX_PRELOAD")
+                _default_pool = ZygotePool(
+                    size=size, memory_limit_mb=memory_mb,
+                    preload=[name.strip() for name in preload.split(",")] if preload else None,
+                )
+            else:
+                _default_pool = SandboxPool(size=size, memory_limit_mb=memory_mb)
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+class CodeExecutor:
+    def __init__(self, timeout: int = 5, sandbox: bool = True,
+                 pool: Optional[Sandbox] = None,
+                 max_output_chars: int = DEFAULT_MAX_OUTPUT_CHARS,
+                 output_limit: int = DEFAULT_OUTPUT_LIMIT):
+        self.timeout = timeout
+        self.max_output_chars = max_output_chars
+        self.output_limit = output_limit
+
+        # sandbox=True runs each call in a pooled worker process with a hard
+        # timeout; sandbox=False keeps the old in-process exec (no timeout).
+        self.sandbox = sandbox
+        self._pool = pool
+
+        # Globals of the last in-process run, for inspection. Every call starts
+        # from a fresh env so attempts and jobs don't leak state into each other
+        self.env: Dict[str, Any] = _fresh_env()
+
+    @property
+    def pool(self) -> Sandbox:
+        if self._pool is None:
+            self._pool = get_default_pool()
+        return self._pool
+
+    def execute(self, code: str) -> Dict[str, Any]:
+        with span("execute", sandbox=self.sandbox) as sp:
+            result = self._execute(code)
+            sp.set(outcome=result.get("error_type") or "ok")
+            return result
+
+    async def execute_async(self, code: str) -> Dict[str, Any]:
+        """
+        Run execute() off the event loop so concurrent pipelines keep going
+        while a snippet runs.
+        """
+        # The span lives on the loop side: executor threads don't inherit the job's trace
+        with span("execute", sandbox=self.sandbox) as sp:
+            if not self.sandbox:
+                # In-process exec redirects the global stdout; keep it on the loop thread
+                result = self._execute(code)
+            else:
+                cancel = threading.Event()
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        None, self._execute, code, cancel
+                    )
+                except asyncio.CancelledError:
+                    # Kill the run now rather than let it hold a sandbox slot until it ends
+                    cancel.set()
+                    raise
+            sp.set(outcome=result.get("error_type") or "ok")
+            return result
+
+    def _execute(self, code: str, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        if not self.sandbox:
+            self.env = _fresh_env()
+            return _run_code(code, self.env, self.max_output_chars, self.output_limit)
 
-        return result
+        return self.pool.run(
+            code,
+            timeout=self.timeout,
+            cpu_seconds=self.timeout,
+            max_output_chars=self.max_output_chars,
+            output_limit=self.output_limit,
+            cancel=cancel,
+        )
 
 
 def execute_code(code: str, timeout: int = 5) -> Dict[str, Any]:
@@ -1,58 +1,1066 @@
+import asyncio
+import hashlib
 import json
+import queue
 import re
+import uuid
+import weakref
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple,
+)
+
+from analyze_fix_agent import AnalyzeFixAgent
 from analyzer_agent import AnalyzerAgent
-from fixer_agent import FixerAgent
+from base_agent import start_job_memory
+from fixer_agent import FIX_STRATEGIES, FixerAgent
 from validator_agent import ValidatorAgent
+from checkpoints import CheckpointStore, input_hash
 from code_executor import CodeExecutor
-from memory import Memory
+from memory import JsonlSink, Memory
+from model_routing import (
+    FAIL_EXECUTION, FAIL_LOCAL_CHECKS, FAIL_REJECTED, FAIL_VALIDATOR, ModelRouter,
+)
+from event_loop import get_loop, run_sync
+from chunking import (
+    CodeUnit, UnitMemo, extract_unit, failing_units, signature_summary, split_units, stitch,
+)
+from patching import apply_patch
+from prompt_budget import format_execution_result
+from preflight import check_syntax, describe_syntax_error, run_preflight, syntax_analysis
+from llm_backends import LLMBackend
+from local_validation import as_validation_json, validate_locally
+from rate_limit import TransportError, set_deadline
+from retry_policy import (
+    STOP, SWITCH, JobBudget, RetryDecision, RetryScheduler, failure_signature,
+)
+from response_cache import ResponseCache
+from similarity import FixIndex, SimilarFix, adapt_fix, error_signature
+from telemetry import enable as enable_tracing, span, start_trace, summarize_trace
+
+
+class DebugJob:
+    """
+    State of a single debug_code run: the input, its history and executor,
+    and an optional listener that receives progress events as they happen.
+    """
+
+    def __init__(self, code: str, memory: Memory, executor: CodeExecutor,
+                 listener: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 job_id: Optional[str] = None,
+                 checkpoints: Optional[CheckpointStore] = None):
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.code = code
+        self.memory = memory
+        self.executor = executor
+        self.listener = listener
+        self.checkpoints = checkpoints
+        # Masked preflight outcome (see similarity.error_signature); None without preflight
+        self.error_signature: Optional[str] = None
+        # Model the fixer uses for the current attempt (see ModelRouter.fixer_model),
+        # and how many attempts so far failed locally, moving it up the cascade
+        self.fix_model: Optional[str] = None
+        self.escalations = 0
+        # Whether the last validation verdict came from the local checks
+        self.validated_locally = False
+        # First fix from a fused analyze + fix call, used by attempt 1
+        self.fused_fix: Optional[str] = None
+        # Deadline / token allowance, and whether the retry scheduler switched
+        # the fix strategy (full-file fixes with an alternative instruction)
+        self.budget = JobBudget()
+        self.switched = False
+        # Open tracing spans by phase name, closed by record()
+        self._phase_spans: Dict[str, Any] = {}
+
+    @property
+    def streaming(self) -> bool:
+        return self.listener is not None
+
+    def emit(self, event_type: str, **fields: Any) -> None:
+        if self.listener is not None:
+            self.listener({"type": event_type, **fields})
+
+    def start_phase(self, phase: str) -> None:
+        # Metrics are labelled by the phase kind ("Fix"), the trace keeps the full name
+        self._phase_spans[phase] = span("phase", phase=phase.split()[0], step=phase).start()
+        self.emit("phase_start", phase=phase)
+
+    def finish_phase(self, phase: str, outcome: str) -> None:
+        phase_span = self._phase_spans.pop(phase, None)
+        if phase_span is not None:
+            phase_span.finish(outcome=outcome)
+
+    def close_phases(self, outcome: str = "abandoned") -> None:
+        # Phases that never recorded an end (e.g. cancelled candidates)
+        for phase_span in self._phase_spans.values():
+            phase_span.finish(outcome=outcome)
+        self._phase_spans.clear()
+
+    async def checkpointed(self, step: str, compute: Callable[[], Awaitable[Any]],
+                           *inputs: str) -> Any:
+        """
+        Result of compute(), or the value an earlier run of this job saved for
+        the same step and inputs. Agent errors are never saved.
+        """
+        if self.checkpoints is None:
+            return await compute()
+
+        digest = hashlib.sha256("\0".join(inputs).encode("utf-8")).hexdigest()[:16]
+        key = f"{step} {digest}"
+        saved = self.checkpoints.load(self.job_id, key)
+        if saved is not None:
+            self.emit("checkpoint", step=step)
+            return saved
+
+        value = await compute()
+        if not (isinstance(value, str) and value.startswith("AGENT ERROR")):
+            self.checkpoints.save(self.job_id, key, value)
+        return value
+
+    def record(self, agent_name: str, phase: str, status: str,
+               summary: str, extra: Optional[Dict[str, Any]] = None) -> None:
+        self.memory.add(
+            agent_name=agent_name, phase=phase, status=status, summary=summary, extra=extra,
+        )
+        self.finish_phase(phase, status)
+        self.emit(
+            "phase_end", agent=agent_name, phase=phase, status=status,
+            summary=summary, extra=extra or {},
+        )
 
 
 class Coordinator:
-    def __init__(self, max_retries: int = 2):
-        self.analyzer = AnalyzerAgent()
-        self.fixer = FixerAgent()
-        self.validator = ValidatorAgent()
-        self.memory = Memory()
+    def __init__(self, max_retries: int = 2, max_concurrency: int = 16,
+                 cache: Optional[ResponseCache] = None,
+                 backend: Optional[LLMBackend] = None,
+                 preflight: bool = True,
+                 speculative_candidates: int = 1,
+                 fix_mode: str = "full",
+                 patch_min_lines: int = 80,
+                 prompt_budget_tokens: Optional[int] = None,
+                 chunking: bool = True,
+                 chunk_min_lines: int = 150,
+                 history_limit: Optional[int] = None,
+                 history_sink: Optional[str] = None,
+                 tracing: bool = False,
+                 job_deadline: Optional[float] = None,
+                 checkpoint_db: Optional[str] = None,
+                 incremental: bool = True,
+                 local_validation: bool = True,
+                 similar_fixes: bool = True,
+                 reuse_similarity: float = 0.9,
+                 example_similarity: float = 0.5,
+                 router: Optional[ModelRouter] = None,
+                 fused: bool = False,
+                 job_token_budget: Optional[int] = None):
+        # Models per role and the fixer cascade, from the environment unless
+        # given; a single `backend` serves every role and attempt instead
+        if router is None:
+            router = ModelRouter.single(backend) if backend is not None else ModelRouter()
+        self.router = router
+        self.analyzer = AnalyzerAgent(router.backend(router.role_models["analyzer"]))
+        self.validator = ValidatorAgent(router.backend(router.role_models["validator"]))
+        # One fixer per cascade tier, cheapest first
+        self.fixers = {model: FixerAgent(router.backend(model)) for model in router.cascade}
+        self.fixer = self.fixers[router.cascade[0]]
+        self.backend = self.fixer.backend
+
+        # fused=True: one structured call returns the analysis and the first fix
+        # (the code is sent once); malformed answers fall back to two calls
+        self.fused = fused
+        self.fused_agents = {
+            model: AnalyzeFixAgent(router.backend(model)) for model in router.cascade
+        } if fused else {}
+
+        # Shared response cache (None disables caching) and prompt token budget
+        self.cache = cache
+        for agent in (self.analyzer, self.validator, *self.fixers.values(),
+                      *self.fused_agents.values()):
+            agent.cache = cache
+            agent.prompt_budget_tokens = prompt_budget_tokens
+        # Per-job history: optional ring-buffer bound and JSONL file that every
+        # event is streamed to as it happens
+        self.history_limit = history_limit
+        self.history_sink = JsonlSink(history_sink) if history_sink else None
+        self.memory = self._new_memory()
         self.max_retries = max_retries
 
-        # Persistent executor so imports survive across attempts
+        # Local compile + sandbox run of the input before any LLM call
+        self.preflight = preflight
+
+        # >1 = generate that many fixes per attempt in parallel, first passing one wins
+        self.speculative_candidates = speculative_candidates
+
+        # "full" = fixer re-emits the file, "patch" = fixer returns a diff that is
+        # applied locally, "auto" = patch for files of at least patch_min_lines
+        if fix_mode not in ("full", "patch", "auto"):
+            raise ValueError(f"Unknown fix_mode: {fix_mode}")
+        self.fix_mode = fix_mode
+        self.patch_min_lines = patch_min_lines
+
+        # Files of at least chunk_min_lines whose traceback points into top-level
+        # defs/classes are debugged one failing unit at a time (needs preflight)
+        self.chunking = chunking
+        self.chunk_min_lines = chunk_min_lines
+
+        # Fixes/analyses of earlier runs by unit AST fingerprint: a resubmitted
+        # file (any size) reuses them for unchanged defs and only sends the
+        # changed or newly failing ones to the agents
+        self.unit_memo = UnitMemo() if incremental and chunking else None
+
+        # Run the original's asserts/tests/doctests/expected output against the
+        # fix in the sandbox first; the LLM validator only decides when they
+        # are missing or can't be run
+        self.local_validation = local_validation
+
+        # Fixed bugs indexed by normalized-AST similarity (needs preflight): a
+        # near-duplicate with the same error first tries the stored fix, adapted
+        # to its names and literals and checked in the sandbox; a looser match
+        # is shown to the fixer as an example
+        self.fix_index = FixIndex() if similar_fixes and preflight else None
+        self.reuse_similarity = reuse_similarity
+        self.example_similarity = example_similarity
+
+        # Seconds a job may spend in total; rate-limit waits and LLM retries
+        # that would overrun it fail fast with TransportError instead
+        self.job_deadline = job_deadline
+        # Model tokens a job may spend; with the deadline, the retry scheduler
+        # stops before an attempt that wouldn't fit (see RetryScheduler)
+        self.job_token_budget = job_token_budget
+
+        # SQLite file recording each completed LLM step and finished job, so
+        # reruns resume where they stopped and skip finished inputs
+        self.checkpoints = CheckpointStore(checkpoint_db) if checkpoint_db else None
+
+        # Upper bound on debug_code_async pipelines in flight at once
+        self.max_concurrency = max_concurrency
+        # One semaphore per event loop: asyncio primitives are bound to the
+        # loop that first uses them, and callers may use asyncio.run() as well
+        # as the shared loop
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+        # Executor settings; sandboxed runs share the process-wide worker pool
         self.executor = CodeExecutor(timeout=5)
 
+        # Spans + metrics are process-wide; also on with DEBUGGER_TELEMETRY=1.
+        # When on, each result carries a "trace" (see telemetry.summarize_trace).
+        if tracing:
+            enable_tracing()
+
     def debug_code(self, buggy_code: str):
         self.memory.clear()
+        return run_sync(
+            self.debug_code_async(buggy_code, memory=self.memory, executor=self.executor)
+        )
+
+    async def debug_many_async(self, codes: Iterable[str],
+                               job_ids: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        Debug several snippets concurrently. Results come back in input order.
+        With checkpointing, job_ids (e.g. file names) identify items across
+        reruns; finished items are returned from the store without rerunning.
+        """
+        codes = list(codes)
+        ids = list(job_ids) if job_ids is not None else [None] * len(codes)
+        return await asyncio.gather(
+            *(self.debug_code_async(code, job_id=job_id) for code, job_id in zip(codes, ids))
+        )
+
+    def debug_many(self, codes: Iterable[str],
+                   job_ids: Optional[Iterable[str]] = None) -> List[dict]:
+        return run_sync(self.debug_many_async(codes, job_ids))
+
+    async def debug_code_async(self, buggy_code: str,
+                               memory: Optional[Memory] = None,
+                               executor: Optional[CodeExecutor] = None,
+                               listener: Optional[Callable[[Dict[str, Any]], None]] = None,
+                               deadline: Optional[float] = None,
+                               job_id: Optional[str] = None,
+                               token_budget: Optional[int] = None):
+        # Each job gets its own history and execution env unless the caller
+        # passes them in, so concurrent jobs never see each other's state.
+        # deadline (seconds) / token_budget override job_deadline /
+        # job_token_budget for this job.
+        semaphore = self._semaphore()
+        seconds = deadline if deadline is not None else self.job_deadline
+        if token_budget is None:
+            token_budget = self.job_token_budget
+
+        digest = None
+        if self.checkpoints is not None:
+            # Without an explicit id, identical inputs share one checkpoint record
+            digest = input_hash(buggy_code, self._config_signature())
+            job_id = job_id or digest[:16]
+            finished = self.checkpoints.begin(job_id, digest)
+            if finished is not None:
+                finished["from_checkpoint"] = True
+                # Nothing spent by this call
+                finished["budget"] = JobBudget(seconds, token_budget).snapshot()
+                if listener is not None:
+                    listener({"type": "result", "result": finished})
+                return finished
+
+        job_id = job_id or uuid.uuid4().hex[:12]
+        job = DebugJob(
+            buggy_code,
+            memory if memory is not None else self._new_memory(job_id),
+            executor if executor is not None else CodeExecutor(timeout=self.executor.timeout),
+            listener,
+            job_id,
+            self.checkpoints,
+        )
+        trace = start_trace()
+        start_job_memory()
+        async with semaphore:
+            # Deadline and budget start with the run, not while queued for a slot
+            set_deadline(seconds)
+            job.budget = JobBudget(seconds, token_budget)
+            job.budget.activate()
+            with span("job") as job_span:
+                try:
+                    result = await self._run_pipeline(job)
+                except TransportError as e:
+                    result = self._transport_failure(job, e)
+                finally:
+                    job.close_phases()
+                job_span.set(
+                    outcome=("transport_error" if result.get("error") else
+                             "success" if result["success"] else "failure"),
+                    attempts=result["attempts"],
+                )
+        if trace is not None:
+            result["trace"] = summarize_trace(trace)
+        result["budget"] = job.budget.snapshot()
+        if self.unit_memo is not None and result["success"]:
+            self.unit_memo.learn(buggy_code, result["fixed_code"])
+        if self.fix_index is not None and result["success"] and job.error_signature is not None:
+            self.fix_index.add(
+                buggy_code, result["fixed_code"], job.error_signature, result["analysis"]
+            )
+        if self.checkpoints is not None and not result.get("error"):
+            # Transport failures stay resumable
+            self.checkpoints.finish(job_id, result)
+        job.emit("result", result=result)
+        return result
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _config_signature(self) -> str:
+        return (
+            f"{self.router.signature()}|{self.max_retries}|{self.speculative_candidates}|"
+            f"{self.fix_mode}|{self.chunking}|{self.fused}"
+        )
+
+    def _new_memory(self, job_id: Optional[str] = None) -> Memory:
+        return Memory(max_events=self.history_limit, sink=self.history_sink, job_id=job_id)
+
+    async def debug_code_stream_async(self, buggy_code: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async iterator of progress events for one job. Event "type" is one of:
+        phase_start, phase_end, analysis_chunk, fix_chunk, execution, result.
+        The last event is always "result" carrying the usual result dict.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(
+            self.debug_code_async(buggy_code, listener=events.put_nowait)
+        )
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event["type"] == "result":
+                    return
+        finally:
+            task.cancel()
+
+    def debug_code_stream(self, buggy_code: str) -> Iterator[Dict[str, Any]]:
+        """
+        Blocking generator version of debug_code_stream_async, for sync callers
+        such as Streamlit. Closing the generator cancels the job.
+        Each call gets its own history, so one Coordinator can serve many
+        sessions at once (the history is in the "result" event).
+        """
+        events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self.debug_code_async(buggy_code, listener=events.put),
+            get_loop(),
+        )
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=0.1)
+                except queue.Empty:
+                    if future.done():
+                        future.result()  # re-raise pipeline errors
+                        return
+                    continue
+                yield event
+                if event["type"] == "result":
+                    return
+        finally:
+            future.cancel()
+
+    async def _collect_stream(self, job: DebugJob, stream: AsyncIterator[str],
+                              event_type: str, **fields: Any) -> str:
+        parts = []
+        async for chunk in stream:
+            parts.append(chunk)
+            job.emit(event_type, text=chunk, **fields)
+        return "".join(parts).strip()
+
+    async def _run_pipeline(self, job: DebugJob):
+        buggy_code = job.code
+
+        # Phase 0: Pre-flight (local, no LLM)
+        report = None
+        if self.preflight:
+            job.start_phase("Preflight")
+            report = await run_preflight(buggy_code, job.executor)
+            job.record(
+                agent_name="Preflight",
+                phase="Preflight",
+                status="SyntaxError" if report["syntax_error"] else (
+                    "Runs" if report["execution"]["success"] else "Fails"
+                ),
+                summary=report["diagnosis"][:200],
+                extra={
+                    "syntax_error": report["syntax_error"],
+                    "execution": report["execution"],
+                },
+            )
+
+        # Near-duplicate of a bug fixed before: try that fix, or keep it as an example
+        similar = None
+        if report is not None:
+            job.error_signature = error_signature(report)
+        if self.fix_index is not None and report is not None:
+            similar = self.fix_index.nearest(
+                buggy_code, job.error_signature, self.example_similarity
+            )
+            if similar is not None and similar.same_error \
+                    and similar.similarity >= self.reuse_similarity:
+                result = await self._reuse_similar_fix(job, similar)
+                if result is not None:
+                    return result
+
+        # Large file failing inside specific functions: work on those units only
+        if self._use_chunking(buggy_code, report):
+            result = await self._run_chunked(job, report)
+            if result is not None:
+                return result
 
         # Phase 1: Analyze
-        analysis = self.analyzer.analyze(buggy_code)
-        self.memory.add(
+        job.start_phase("Analysis")
+        if report and report["syntax_error"]:
+            # The compiler already pinpointed the bug; no need to ask the model
+            analysis = syntax_analysis(report["syntax_error"])
+            analysis_status = "Local"
+        else:
+            diagnosis = report["diagnosis"] if report else None
+            fused = await self._request_fused(job, diagnosis) if self.fused else None
+            if fused is not None:
+                analysis, job.fused_fix = fused
+                analysis_status = "Fused"
+            else:
+                analysis = await job.checkpointed(
+                    "analysis", lambda: self._request_analysis(job, diagnosis), diagnosis or ""
+                )
+                analysis_status = "Success"
+
+        job.record(
             agent_name="Analyzer",
             phase="Analysis",
-            status="Success",
+            status=analysis_status,
             summary=analysis[:200],
             extra={"code": buggy_code},
         )
 
         current_context = analysis
+        if report and report["execution"] and not report["execution"]["success"]:
+            current_context = f"{analysis}\n\n{report['diagnosis']}"
+        if similar is not None:
+            current_context = f"{current_context}\n\n{similar.as_example()}"
         last_fixed = ""
         exec_result = {
             "success": False,
             "output": "",
             "error": None,
             "error_type": None,
+            "traceback": None,
         }
         validation_raw = ""
 
-        # Phase 2: Fix + (minimal) retry
-        for attempt in range(1, self.max_retries + 1):
-            fixed = self.fixer.fix(current_context, buggy_code)
-            code = self._clean_code(fixed)
+        # Phase 2: Fix + adaptive retry (see RetryScheduler)
+        scheduler = RetryScheduler(self.max_retries, job.budget)
+        attempt = 0
+        while True:
+            attempt += 1
+            job.fix_model = self.router.fixer_model(
+                job.escalations, buggy_code, job.error_signature
+            )
+            scheduler.begin_attempt()
+            candidate = await self._best_candidate(
+                attempt, current_context, analysis, job
+            )
+            code = candidate["code"]
+            exec_result = candidate["exec_result"]
             last_fixed = code
 
-            self.memory.add(
+            if candidate["executed"] and exec_result["success"]:
+                # Validator (single call per attempt)
+                validation_raw, is_valid = await self._validate(
+                    job, attempt, buggy_code, code, exec_result
+                )
+
+                # Success condition: code is structurally OK, runs, and validator agrees
+                fixed = is_valid and self._has_required_structure(buggy_code, code)
+                self.router.stats.record_attempt(job.fix_model, fixed)
+                if fixed:
+                    return self._result(
+                        job, True, analysis, code, attempt, exec_result, validation_raw
+                    )
+                self._note_failure(job, self._validation_failure(job))
+                retry_context = (
+                    f"Previous attempt failed.\n"
+                    f"Execution: {format_execution_result(exec_result)}\n"
+                    f"Validation: {validation_raw}\n"
+                    "Try a better fix.\n"
+                )
+            else:
+                # Rejected before execution (bad structure / doesn't compile) or
+                # doesn't run: not worth a validator call
+                self.router.stats.record_attempt(job.fix_model, False)
+                self._note_failure(
+                    job, FAIL_EXECUTION if candidate["executed"] else FAIL_REJECTED
+                )
+                validation_raw = ""
+                retry_context = candidate["retry_context"]
+
+            decision = self._schedule_retry(
+                job, scheduler, attempt, code, exec_result, validation_raw, retry_context
+            )
+            if decision.action == STOP:
+                break
+            current_context = decision.context
+
+        # Failure result: out of retries, budget, or new ideas
+        result = self._result(
+            job, False, analysis, last_fixed, attempt, exec_result, validation_raw
+        )
+        result["stop_reason"] = decision.reason
+        return result
+
+    def _note_failure(self, job: DebugJob, failure: str) -> None:
+        # Only local failures move the next attempt up the fixer cascade
+        if self.router.escalates(failure):
+            job.escalations += 1
+
+    @staticmethod
+    def _validation_failure(job: DebugJob) -> str:
+        return FAIL_LOCAL_CHECKS if job.validated_locally else FAIL_VALIDATOR
+
+    def _schedule_retry(self, job: DebugJob, scheduler: RetryScheduler, attempt: int,
+                        code: str, exec_result: dict, validation_raw: str,
+                        retry_context: str) -> RetryDecision:
+        decision = scheduler.after_failure(
+            attempt, code, failure_signature(exec_result, validation_raw),
+            exec_result.get("error_type"), retry_context,
+        )
+        job.switched = job.switched or decision.action == SWITCH
+        job.record(
+            agent_name="Scheduler",
+            phase=f"Retry Decision {attempt}",
+            status=decision.action.capitalize(),
+            summary=decision.reason,
+            extra={"budget": job.budget.snapshot()},
+        )
+        return decision
+
+    async def _request_analysis(self, job: DebugJob, diagnosis: Optional[str]) -> str:
+        if job.streaming:
+            return await self._collect_stream(
+                job, self.analyzer.analyze_stream(job.code, context=diagnosis),
+                "analysis_chunk",
+            )
+        return await self.analyzer.analyze_async(job.code, context=diagnosis)
+
+    async def _request_fused(self, job: DebugJob,
+                             diagnosis: Optional[str]) -> Optional[Tuple[str, str]]:
+        # Same model attempt 1 of the fixer would get
+        model = self.router.fixer_model(0, job.code, job.error_signature)
+        agent = self.fused_agents[model]
+        raw = await job.checkpointed(
+            "analysis+fix",
+            lambda: agent.analyze_and_fix_async(job.code, context=diagnosis),
+            diagnosis or "",
+        )
+        parsed = agent.parse(raw)
+        if parsed is None:
+            job.record(
+                agent_name="Analyzer",
+                phase="Analysis (fused)",
+                status="Malformed",
+                summary=raw[:200],
+                extra={"raw": raw},
+            )
+        return parsed
+
+    async def _validate(self, job: DebugJob, attempt: int, original: str, code: str,
+                        exec_result: dict, full_code: Optional[str] = None):
+        """
+        `original`/`code` are what the LLM validator compares (possibly single
+        units); `full_code` is the whole fixed file when that differs from `code`.
+        """
+        job.start_phase(f"Validation Attempt {attempt}")
+        local = None
+        if self.local_validation:
+            local = await validate_locally(
+                job.code, full_code or code, exec_result, job.executor
+            )
+
+        if local is not None and local["verdict"] != "inconclusive":
+            agent_name = "LocalValidator"
+            validation_raw = as_validation_json(local)
+            is_valid = local["verdict"] == "pass"
+        else:
+            agent_name = "Validator"
+            validation_raw = await job.checkpointed(
+                f"validation {attempt}",
+                lambda: self.validator.validate_async(original, code, exec_result),
+                code, json.dumps(exec_result, sort_keys=True, default=str),
+            )
+            is_valid = self.validator.is_valid(validation_raw)
+
+        job.validated_locally = agent_name == "LocalValidator"
+        job.record(
+            agent_name=agent_name,
+            phase=f"Validation Attempt {attempt}",
+            status="Valid" if is_valid else "Invalid",
+            summary=validation_raw[:200],
+            extra={"raw": validation_raw, "local": local},
+        )
+        return validation_raw, is_valid
+
+    def _result(self, job: DebugJob, success: bool, analysis: str, fixed_code: str,
+                attempts: int, exec_result: dict, validation: str) -> dict:
+        return {
+            "success": success,
+            "analysis": analysis,
+            "fixed_code": fixed_code,
+            "attempts": attempts,
+            "execution_result": exec_result,
+            "validation": validation,
+            "history": job.memory.get_full_history(),
+        }
+
+    def _transport_failure(self, job: DebugJob, error: TransportError) -> dict:
+        # The model was unreachable: report that instead of a failed fix
+        job.record(
+            agent_name="Coordinator",
+            phase="Transport",
+            status="Failed",
+            summary=str(error)[:200],
+            extra={"status": error.status, "attempts": error.attempts},
+        )
+        exec_result = {
+            "success": False,
+            "output": "",
+            "error": str(error),
+            "error_type": "TransportError",
+            "traceback": None,
+        }
+        result = self._result(job, False, "", job.code, 0, exec_result, "")
+        result["error"] = str(error)
+        return result
+
+    async def _run_chunked(self, job: DebugJob, report: dict) -> Optional[dict]:
+        """
+        Debug a large file one failing top-level unit at a time: each agent call
+        sees only that unit plus a signature summary of the rest, units are fixed
+        in parallel and stitched back in. Units with a known fix from an earlier
+        run are patched first, without asking the agents. Returns None to fall
+        back to the whole-file pipeline (e.g. when a failure lands outside any unit).
+        """
+        base = job.code
+        units = split_units(base)
+        known = self.unit_memo.known_fixes(units) if self.unit_memo is not None else {}
+        if known:
+            base, report = await self._apply_known_fixes(job, units, known)
+            if report is None:
+                return None
+            units = split_units(base)
+            if report["execution"]["success"]:
+                return await self._validate_known_fixes(job, known, base, report)
+
+        failing = failing_units(units, report["execution"].get("traceback"))
+        if not failing:
+            return None
+        diagnosis = report["diagnosis"]
+        error_key = self._error_key(report["execution"])
+
+        # Phase 1: Analyze each failing unit
+        job.start_phase("Analysis")
+        analyses = await asyncio.gather(
+            *(self._analyze_unit(job, unit, diagnosis, base, error_key) for unit in failing)
+        )
+        # Units record their own "Analysis (name)" entries
+        job.finish_phase("Analysis", "Success")
+        analysis = "\n\n".join(
+            f"[{unit.name}]\n{text}" for unit, text in zip(failing, analyses)
+        )
+        contexts = {
+            unit.name: f"{text}\n\n{diagnosis}" for unit, text in zip(failing, analyses)
+        }
+
+        replacements: Dict[str, str] = {}
+        code = base
+        exec_result = report["execution"]
+        validation_raw = ""
+
+        # Phase 2: Fix failing units in parallel, stitch, run the whole file.
+        # Unit contexts are built here; the scheduler only decides when to stop.
+        scheduler = RetryScheduler(self.max_retries, job.budget)
+        attempt = 0
+        while True:
+            attempt += 1
+            # Routed on the size of what the fixer sees, not the whole file
+            job.fix_model = self.router.fixer_model(
+                job.escalations, "\n".join(unit.source for unit in failing), job.error_signature
+            )
+            scheduler.begin_attempt()
+            fixes = await asyncio.gather(
+                *(self._fix_unit(job, unit, contexts[unit.name], attempt) for unit in failing)
+            )
+            for unit, new_source in zip(failing, fixes):
+                if new_source:
+                    replacements[unit.name] = new_source
+
+            code = stitch(base, units, replacements)
+            syntax_error = check_syntax(code)
+            if syntax_error:
+                exec_result = {
+                    "success": False,
+                    "output": "",
+                    "error": describe_syntax_error(syntax_error),
+                    "error_type": syntax_error["error_type"],
+                    "traceback": None,
+                }
+                job.record(
+                    agent_name="Executor",
+                    phase=f"Execution Attempt {attempt}",
+                    status="Skipped",
+                    summary="Skipped: stitched code does not compile.",
+                    extra={"reason": exec_result["error"]},
+                )
+                for unit in failing:
+                    contexts[unit.name] = (
+                        f"Previous attempt does not compile:\n{exec_result['error']}\n"
+                        "Return the complete, syntactically valid definition."
+                    )
+                self.router.stats.record_attempt(job.fix_model, False)
+                self._note_failure(job, FAIL_REJECTED)
+                validation_raw = ""
+                decision = self._schedule_retry(
+                    job, scheduler, attempt, code, exec_result, "", ""
+                )
+                if decision.action == STOP:
+                    break
+                continue
+
+            job.start_phase(f"Execution Attempt {attempt}")
+            exec_result = await job.executor.execute_async(code)
+            job.emit("execution", attempt=str(attempt), result=exec_result)
+            job.record(
+                agent_name="Executor",
+                phase=f"Execution Attempt {attempt}",
+                status="Success" if exec_result["success"] else "Failed",
+                summary=f"Output: {exec_result.get('output', '')[:100]}",
+                extra={
+                    "error": exec_result.get("error"),
+                    "error_type": exec_result.get("error_type"),
+                },
+            )
+
+            if not exec_result["success"]:
+                names = [u.name for u in failing_units(
+                    split_units(code) or [], exec_result.get("traceback")
+                )]
+                if not names:
+                    return None
+                failing = [unit for unit in units if unit.name in names]
+                for unit in failing:
+                    contexts[unit.name] = (
+                        f"Previous attempt failed at execution.\n"
+                        f"Execution result: {format_execution_result(exec_result)}\n"
+                        "Fix the issues and try again.\n"
+                    )
+                self.router.stats.record_attempt(job.fix_model, False)
+                self._note_failure(job, FAIL_EXECUTION)
+                validation_raw = ""
+                decision = self._schedule_retry(
+                    job, scheduler, attempt, code, exec_result, "", ""
+                )
+                if decision.action == STOP:
+                    break
+                continue
+
+            # Validate only the units that changed
+            changed = [unit for unit in units if unit.name in replacements]
+            validation_raw, is_valid = await self._validate(
+                job, attempt,
+                "\n\n".join(unit.source for unit in changed),
+                "\n\n".join(replacements[unit.name] for unit in changed),
+                exec_result, full_code=code,
+            )
+            self.router.stats.record_attempt(job.fix_model, is_valid and exec_result["success"])
+            if is_valid and exec_result["success"]:
+                return self._result(
+                    job, True, analysis, code, attempt, exec_result, validation_raw
+                )
+            self._note_failure(job, self._validation_failure(job))
+
+            for unit in failing:
+                contexts[unit.name] = (
+                    f"Previous attempt failed.\n"
+                    f"Execution: {format_execution_result(exec_result)}\n"
+                    f"Validation: {validation_raw}\n"
+                    "Try a better fix.\n"
+                )
+            decision = self._schedule_retry(
+                job, scheduler, attempt, code, exec_result, validation_raw, ""
+            )
+            if decision.action == STOP:
+                break
+
+        result = self._result(
+            job, False, analysis, code, attempt, exec_result, validation_raw
+        )
+        result["stop_reason"] = decision.reason
+        return result
+
+    async def _analyze_unit(self, job: DebugJob, unit: CodeUnit, diagnosis: str,
+                            code: str, error_key: str) -> str:
+        status = "Success"
+        analysis = self.unit_memo.analysis_for(unit, error_key) if self.unit_memo else None
+        if analysis is not None:
+            status = "Reused"
+        else:
+            summary = signature_summary(code, exclude=[unit.name])
+            context = (
+                "This is one definition from a larger file. Other top-level "
+                f"definitions (bodies omitted):\n{summary}\n\n{diagnosis}"
+            )
+            analysis = await job.checkpointed(
+                f"analysis {unit.name}",
+                lambda: self.analyzer.analyze_async(unit.source, context=context),
+                unit.source, context,
+            )
+            if self.unit_memo is not None and not analysis.startswith("AGENT ERROR"):
+                self.unit_memo.add_analysis(unit, error_key, analysis)
+
+        job.record(
+            agent_name="Analyzer",
+            phase=f"Analysis ({unit.name})",
+            status=status,
+            summary=analysis[:200],
+            extra={"code": unit.source},
+        )
+        return analysis
+
+    async def _apply_known_fixes(self, job: DebugJob, units: List[CodeUnit],
+                                 known: Dict[str, str]):
+        """
+        Stitch in fixes verified by earlier runs and re-run the preflight on
+        the result. Returns (code, report), or (code, None) if it doesn't run
+        through the unit pipeline (e.g. no longer compiles).
+        """
+        code = stitch(job.code, units, known)
+        job.start_phase("Reuse")
+        report = await run_preflight(code, job.executor)
+        job.record(
+            agent_name="Coordinator",
+            phase="Reuse",
+            status="Reused",
+            summary=f"Applied earlier fixes for unchanged: {', '.join(sorted(known))}",
+            extra={"units": sorted(known), "execution": report["execution"]},
+        )
+        if report["syntax_error"]:
+            return code, None
+        return code, report
+
+    async def _validate_known_fixes(self, job: DebugJob, known: Dict[str, str], code: str,
+                                    report: dict) -> Optional[dict]:
+        # Reused fixes alone make the file run: one validator call and done
+        originals = {unit.name: unit.source for unit in split_units(job.code)}
+        validation_raw, is_valid = await self._validate(
+            job, 1,
+            "\n\n".join(originals[name] for name in sorted(known)),
+            "\n\n".join(known[name] for name in sorted(known)),
+            report["execution"], full_code=code,
+        )
+        if not is_valid:
+            return None
+        analysis = "Reused earlier fixes for unchanged definitions: " + ", ".join(sorted(known))
+        return self._result(job, True, analysis, code, 1, report["execution"], validation_raw)
+
+    async def _reuse_similar_fix(self, job: DebugJob, similar: SimilarFix) -> Optional[dict]:
+        # Stored fix of a near-duplicate, renamed to this code; must run and validate
+        entry = similar.entry
+        code = adapt_fix(entry.original, entry.fixed, job.code)
+        if code is None or not self._has_required_structure(job.code, code):
+            return None
+
+        job.start_phase("Similar Fix")
+        exec_result = await job.executor.execute_async(code)
+        job.record(
+            agent_name="FixIndex",
+            phase="Similar Fix",
+            status="Success" if exec_result["success"] else "Failed",
+            summary=f"Fix of a similar earlier bug (similarity {similar.similarity:.2f})",
+            extra={"fixed_code": code, "execution": exec_result,
+                   "similarity": similar.similarity},
+        )
+        if not exec_result["success"]:
+            return None
+
+        validation_raw, is_valid = await self._validate(job, 1, job.code, code, exec_result)
+        if not is_valid:
+            return None
+        analysis = (
+            f"Matches an earlier fixed bug (similarity {similar.similarity:.2f}); "
+            f"its analysis:\n{entry.analysis}"
+        )
+        return self._result(job, True, analysis, code, 1, exec_result, validation_raw)
+
+    @staticmethod
+    def _error_key(exec_result: dict) -> str:
+        # Error type + message: the same unit failing the same way reuses its analysis
+        return f"{exec_result.get('error_type')}: {exec_result.get('error')}"
+
+    async def _fix_unit(self, job: DebugJob, unit: CodeUnit, context: str,
+                       attempt: int) -> Optional[str]:
+        job.start_phase(f"Fix Attempt {attempt} ({unit.name})")
+        fixer = self._fixer_for(job)
+        fixed = await job.checkpointed(
+            f"fix {attempt} {unit.name}",
+            lambda: fixer.fix_async(context, unit.source, use_cache=attempt == 1),
+            unit.source, context,
+        )
+        new_source = extract_unit(self._clean_code(fixed), unit.name)
+
+        job.record(
+            agent_name="Fixer",
+            phase=f"Fix Attempt {attempt} ({unit.name})",
+            status="Generated" if new_source else "Invalid",
+            summary=fixed[:200],
+            extra={"code": new_source or "", "model": fixer.model_name},
+        )
+        return new_source
+
+    def _use_chunking(self, code: str, report: Optional[dict]) -> bool:
+        if not self.chunking or report is None or not report["execution"]:
+            return False
+        if report["execution"]["success"]:
+            return False
+        units = split_units(code)
+        if not units:
+            return False
+        # Resubmission with definitions we've already fixed: any size qualifies
+        if self.unit_memo is not None and self.unit_memo.known_fixes(units):
+            return True
+        if code.count("\n") + 1 < self.chunk_min_lines:
+            return False
+        return bool(failing_units(units, report["execution"].get("traceback")))
+
+    async def _best_candidate(self, attempt: int, context: str, analysis: str,
+                              job: DebugJob) -> dict:
+        """
+        Generate + execute fix candidates for one attempt.
+
+        With speculative_candidates > 1 the candidates run concurrently and the
+        first one that executes successfully wins; the rest are cancelled.
+        Otherwise the best failure is returned (executed beats rejected).
+        """
+        count = max(1, self.speculative_candidates)
+        if count == 1:
+            return await self._run_candidate(
+                attempt, 0, count, context, analysis, job
+            )
+
+        tasks = [
+            asyncio.ensure_future(self._run_candidate(
+                attempt, index, count, context, analysis, job
+            ))
+            for index in range(count)
+        ]
+        finished = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                candidate = await next_done
+                if candidate["executed"] and candidate["exec_result"]["success"]:
+                    return candidate
+                finished.append(candidate)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let the losers record their cancellation before the history is read
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        finished.sort(key=lambda c: (not c["executed"], c["index"]))
+        return finished[0]
+
+    async def _run_candidate(self, attempt: int, index: int, count: int, context: str,
+                             analysis: str, job: DebugJob) -> dict:
+        buggy_code = job.code
+        label = f"{attempt}" if count == 1 else f"{attempt}.{index + 1}"
+        temperature, strategy = (None, None)
+        if count > 1:
+            temperature, strategy = FIX_STRATEGIES[index % len(FIX_STRATEGIES)]
+        elif job.switched:
+            temperature, strategy = FIX_STRATEGIES[1]
+        code = ""
+
+        try:
+            job.start_phase(f"Fix Attempt {label}")
+            # Retries want a different answer, so only the first attempt may hit the cache
+            fix_options = {
+                "use_cache": attempt == 1 and index == 0,
+                "strategy": strategy,
+                "temperature": temperature,
+            }
+            fixed, code, fix_status = None, None, "Generated"
+            if attempt == 1 and index == 0 and job.fused_fix is not None:
+                fixed, fix_status = job.fused_fix, "Fused"
+                code = self._clean_code(fixed)
+            elif self._use_patch(buggy_code) and not job.switched:
+                patch = await self._request_fix(job, context, label, dict(fix_options, patch=True))
+                patched = apply_patch(buggy_code, patch)
+                if patched is not None:
+                    fixed, code, fix_status = patch, patched.strip(), "Patched"
+                else:
+                    # Patch didn't apply cleanly; ask for the whole file instead
+                    job.record(
+                        agent_name="Fixer",
+                        phase=f"Fix Attempt {label}",
+                        status="PatchFailed",
+                        summary=patch[:200],
+                        extra={"patch": patch},
+                    )
+
+            if code is None:
+                fixed = await self._request_fix(job, context, label, fix_options)
+                code = self._clean_code(fixed)
+
+            job.record(
                 agent_name="Fixer",
-                phase=f"Fix Attempt {attempt}",
-                status="Generated" if code else "Empty",
+                phase=f"Fix Attempt {label}",
+                status=fix_status if code else "Empty",
                 summary=fixed[:200],
-                extra={"code": code},
+                extra={"code": code, "model": self._fixer_for(job).model_name},
             )
 
             # Basic structural sanity check before executing
@@ -62,33 +1070,70 @@ class Coordinator:
                     "output": "",
                     "error": "Invalid structure in fixed code (empty, error text, or missing imports).",
                     "error_type": "InvalidStructure",
+                    "traceback": None,
                 }
 
-                self.memory.add(
+                job.record(
                     agent_name="Executor",
-                    phase=f"Execution Attempt {attempt}",
+                    phase=f"Execution Attempt {label}",
                     status="Skipped",
                     summary="Skipped due to invalid structure.",
                     extra={"reason": exec_result["error"]},
                 )
 
-                if attempt < self.max_retries:
-                    current_context = (
+                return {
+                    "index": index,
+                    "code": code,
+                    "executed": False,
+                    "exec_result": exec_result,
+                    "retry_context": (
                         "Previous attempt produced structurally invalid code "
                         "(e.g., empty code, removed imports, or agent error text). "
                         "Return a complete, runnable Python script that preserves imports."
-                    )
-                    continue
-                else:
-                    break
+                    ),
+                }
+
+            # Reject code that doesn't compile before paying for execution + validation
+            syntax_error = check_syntax(code)
+            if syntax_error:
+                exec_result = {
+                    "success": False,
+                    "output": "",
+                    "error": describe_syntax_error(syntax_error),
+                    "error_type": syntax_error["error_type"],
+                    "traceback": None,
+                }
+
+                job.record(
+                    agent_name="Executor",
+                    phase=f"Execution Attempt {label}",
+                    status="Skipped",
+                    summary="Skipped: fixed code does not compile.",
+                    extra={"reason": exec_result["error"]},
+                )
+
+                return {
+                    "index": index,
+                    "code": code,
+                    "executed": False,
+                    "exec_result": exec_result,
+                    "retry_context": (
+                        f"{analysis}\n\n"
+                        "Previous attempt does not compile:\n"
+                        f"{describe_syntax_error(syntax_error)}\n"
+                        "Return complete, syntactically valid Python."
+                    ),
+                }
 
             # Execute
-            exec_result = self.executor.execute(code)
+            job.start_phase(f"Execution Attempt {label}")
+            exec_result = await job.executor.execute_async(code)
+            job.emit("execution", attempt=label, result=exec_result)
 
             exec_status = "Success" if exec_result["success"] else "Failed"
-            self.memory.add(
+            job.record(
                 agent_name="Executor",
-                phase=f"Execution Attempt {attempt}",
+                phase=f"Execution Attempt {label}",
                 status=exec_status,
                 summary=f"Output: {exec_result.get('output', '')[:100]}",
                 extra={
@@ -97,59 +1142,61 @@ class Coordinator:
                 },
             )
 
-            # If it doesn't run and we still have retries left – try again
-            if not exec_result["success"] and attempt < self.max_retries:
-                current_context = (
+            return {
+                "index": index,
+                "code": code,
+                "executed": True,
+                "exec_result": exec_result,
+                "retry_context": (
                     f"Previous attempt failed at execution.\n"
-                    f"Execution result: {exec_result}\n"
+                    f"Execution result: {format_execution_result(exec_result)}\n"
                     "Fix the issues and try again.\n"
-                )
-                continue
+                ),
+            }
 
-            # Validator (single call per attempt)
-            validation_raw = self.validator.validate(buggy_code, code, exec_result)
-            is_valid = self.validator.is_valid(validation_raw)
-
-            self.memory.add(
-                agent_name="Validator",
-                phase=f"Validation Attempt {attempt}",
-                status="Valid" if is_valid else "Invalid",
-                summary=validation_raw[:200],
-                extra={"raw": validation_raw},
+        except asyncio.CancelledError:
+            # Another speculative candidate already won
+            job.record(
+                agent_name="Coordinator",
+                phase=f"Candidate {label}",
+                status="Cancelled",
+                summary="Cancelled: another candidate passed first.",
+                extra={"code": code},
             )
+            raise
 
-            # Success condition: code is structurally OK, runs, and validator agrees
-            if is_valid and exec_result["success"] and self._has_required_structure(
-                buggy_code, code
-            ):
-                return {
-                    "success": True,
-                    "analysis": analysis,
-                    "fixed_code": code,
-                    "attempts": attempt,
-                    "execution_result": exec_result,
-                    "validation": validation_raw,
-                    "history": self.memory.get_full_history(),
-                }
+    async def _request_fix(self, job: DebugJob, context: str, label: str,
+                           fix_options: Dict[str, Any]) -> str:
+        step = f"fix {label} patch" if fix_options.get("patch") else f"fix {label}"
+        return await job.checkpointed(
+            step, lambda: self._generate_fix(job, context, label, fix_options), context
+        )
 
-            # Prepare context for retry
-            current_context = (
-                f"Previous attempt failed.\n"
-                f"Execution: {exec_result}\n"
-                f"Validation: {validation_raw}\n"
-                "Try a better fix.\n"
+    async def _generate_fix(self, job: DebugJob, context: str, label: str,
+                            fix_options: Dict[str, Any]) -> str:
+        fixer = self._fixer_for(job)
+        if job.streaming:
+            return await self._collect_stream(
+                job, fixer.fix_stream(context, job.code, **fix_options),
+                "fix_chunk", attempt=label,
             )
+        return await fixer.fix_async(context, job.code, **fix_options)
 
-        # Failure result after retries
-        return {
-            "success": False,
-            "analysis": analysis,
-            "fixed_code": last_fixed,
-            "attempts": self.max_retries,
-            "execution_result": exec_result,
-            "validation": validation_raw,
-            "history": self.memory.get_full_history(),
-        }
+    def _fixer_for(self, job: DebugJob) -> FixerAgent:
+        return self.fixers.get(job.fix_model, self.fixer)
+
+    def model_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-model latency, tokens, cost and fix success rate since start-up.
+        """
+        return self.router.stats.snapshot()
+
+    def _use_patch(self, code: str) -> bool:
+        if self.fix_mode == "patch":
+            return True
+        if self.fix_mode == "auto":
+            return code.count("\n") + 1 >= self.patch_min_lines
+        return False
 
     def _clean_code(self, response: str) -> str:
         if not response:
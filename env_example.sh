@@ -8,10 +8,49 @@
 # Default: gemini-1.5-flash (free tier)
 # Alternative: gemini-1.5-pro (more capable, paid)
 GEMINI_MODEL=gemini-2.5-flash-lite
+# Optional: per-role overrides of GEMINI_MODEL
+# GEMINI_MODEL_ANALYZER=gemini-2.5-flash-lite
+# GEMINI_MODEL_FIXER=gemini-2.5-flash-lite
+# GEMINI_MODEL_VALIDATOR=gemini-2.5-flash-lite
+# Optional: fixer cascade, cheapest first. Fix attempts start on the first model and
+# move up one tier per attempt that fails to compile, run or pass its own checks
+# (large inputs / logic bugs start higher).
+# Unset = every attempt uses the fixer model.
+# GEMINI_CASCADE=gemini-2.5-flash-lite,gemini-2.5-flash
+
+# Optional: LLM backend
+# gemini (default) | fake (offline canned replies) | record | replay
+LLM_BACKEND=gemini
+# Where record/replay stores responses
+LLM_RECORDINGS_DIR=recordings
+
+# Optional: shared Gemini rate limits, requests and tokens per minute (0 = none).
+# 429/5xx errors are retried with jittered exponential backoff either way.
+LLM_RPM=0
+LLM_TPM=0
+
+# Optional: model response cache for the app, service and batch runs:
+# memory (default) | off | path of a SQLite file shared across restarts and workers
+LLM_CACHE=memory
+# Seconds a cached answer stays valid (0 = forever)
+LLM_CACHE_TTL=86400
 
 # Optional: Debugging settings
 MAX_RETRIES=3
 CODE_TIMEOUT=5
+# Sandbox worker processes (0 = min(8, CPU count)) and per-worker memory cap in MB (0 = none)
+SANDBOX_WORKERS=0
+SANDBOX_MEMORY_MB=512
+# zygote (default where fork() exists) = fork every run from a process that pre-imports
+# SANDBOX_PRELOAD, so runs are isolated but warm; pool = reuse long-lived workers
+SANDBOX_MODE=zygote
+SANDBOX_PRELOAD=json,math,re,collections,itertools,functools,datetime,numpy,pandas
+# 1 = per-phase tracing + metrics (results get a "trace", see telemetry.py)
+DEBUGGER_TELEMETRY=0
+# Streamlit: jobs from all sessions share one worker pool and queue
+STREAMLIT_WORKERS=4
+STREAMLIT_QUEUE_SIZE=32
+STREAMLIT_JOB_DEADLINE=300
 
 # SETUP INSTRUCTIONS:
 # 1. Copy this file to .env: cp .env.example .env
@@ -0,0 +1,30 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Optional
+
+# One background event loop per process. Sync callers (Streamlit, scripts)
+# submit coroutines here instead of calling asyncio.run(), so async clients
+# that bind to a loop (e.g. Gemini's grpc.aio transport) always see the same one.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever,
+                name="debugger-event-loop",
+                daemon=True,
+            )
+            thread.start()
+        return _loop
+
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """
+    Run a coroutine on the shared loop and block until it finishes.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
@@ -0,0 +1,104 @@
+from typing import Dict, List, Tuple
+
+# Examples shown in the Streamlit sidebar
+EXAMPLES: Dict[str, str] = {
+    "Syntax Error": """def greet(name)
+    print("Hello", name)
+
+greet("Santhosh")""",
+    "Logic Error": """def double(x):
+    return x + x + 1  # incorrect
+
+print(double(5))  # should be 10""",
+    "Runtime Error": """def safe_divide(a, b):
+    return a / b
+
+nums = [10, 5, 0]
+for n in nums:
+    print(safe_divide(10, n))""",
+}
+
+# Extra buggy templates for benchmarks, per category.
+# {name} and {value} are substituted to produce distinct programs.
+TEMPLATES: Dict[str, List[str]] = {
+    "syntax": [
+        """def {name}(items)
+    total = 0
+    for item in items:
+        total += item
+    return total
+
+print({name}([{value}, 2, 3]))""",
+        """def {name}(x):
+    if x > {value}
+        return "big"
+    return "small"
+
+print({name}(5))""",
+        """values = [{value}, 2, 3
+print(sum(values))""",
+    ],
+    "logic": [
+        """def {name}(n):
+    # factorial of n
+    result = 0
+    for i in range(1, n + 1):
+        result *= i
+    return result
+
+print({name}({value}))  # should be non-zero""",
+        """def {name}(nums):
+    # average of nums
+    return sum(nums) / (len(nums) + 1)
+
+print({name}([{value}, {value}, {value}]))  # should equal {value}""",
+        """def {name}(s):
+    # reverse a string
+    return s[1:]
+
+print({name}("abc{value}"))""",
+    ],
+    "runtime": [
+        """def {name}(a, b):
+    return a / b
+
+for n in [{value}, 1, 0]:
+    print({name}(10, n))""",
+        """def {name}(items):
+    return items[len(items)]
+
+print({name}([{value}, 2, 3]))""",
+        """def {name}(d):
+    return d["missing"] + {value}
+
+print({name}({{"present": 1}}))""",
+        """import math
+
+def {name}(x):
+    return math.sqrt(x) + undefined_{value}
+
+print({name}(4))""",
+    ],
+}
+
+
+def build_corpus(size: int) -> List[Tuple[str, str]]:
+    """
+    Return `size` (category, code) pairs: the sidebar examples first,
+    then template variants with different names and literals.
+    """
+    categories = {"Syntax Error": "syntax", "Logic Error": "logic", "Runtime Error": "runtime"}
+    corpus = [(categories[label], code) for label, code in EXAMPLES.items()]
+
+    flat = [(category, template)
+            for category, templates in TEMPLATES.items()
+            for template in templates]
+
+    i = 0
+    while len(corpus) < size:
+        category, template = flat[i % len(flat)]
+        variant = i // len(flat)
+        corpus.append((category, template.format(name=f"func_{variant}", value=variant + 1)))
+        i += 1
+
+    return corpus[:size]
@@ -1,8 +1,20 @@
+from typing import AsyncIterator, Optional
+
 from base_agent import BaseAgent
+from llm_backends import LLMBackend
+from patching import number_lines
+
+# (temperature, extra instruction) pairs used to diversify speculative fix candidates
+FIX_STRATEGIES = [
+    (None, None),
+    (0.4, "Make the smallest possible change that fixes the reported bugs."),
+    (0.8, "Handle edge cases explicitly (empty input, zero, missing keys, bad types)."),
+    (1.0, "Infer the intended behaviour from names and comments, then rewrite the logic to match."),
+]
 
 
 class FixerAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, backend: Optional[LLMBackend] = None):
         system_prompt = (
             "You are an EXPERT Python code fixer.\n\n"
             "CRITICAL RULES:\n"
@@ -13,12 +25,48 @@ class FixerAgent(BaseAgent):
             "• NO markdown backticks in the output.\n"
             "• Maintain original intent of the code.\n"
         )
-        super().__init__("Expert Code Fixer", system_prompt)
+        super().__init__("Expert Code Fixer", system_prompt, backend)
+
+    def fix(self, analysis: str, original_code: str, use_cache: bool = True,
+            strategy: Optional[str] = None, temperature: Optional[float] = None,
+            patch: bool = False) -> str:
+        return self.think(
+            self._fix_task(analysis, original_code, strategy, patch),
+            use_cache=use_cache,
+            temperature=temperature,
+        )
+
+    async def fix_async(self, analysis: str, original_code: str, use_cache: bool = True,
+                        strategy: Optional[str] = None,
+                        temperature: Optional[float] = None,
+                        patch: bool = False) -> str:
+        return await self.think_async(
+            self._fix_task(analysis, original_code, strategy, patch),
+            use_cache=use_cache,
+            temperature=temperature,
+        )
+
+    def fix_stream(self, analysis: str, original_code: str, use_cache: bool = True,
+                   strategy: Optional[str] = None,
+                   temperature: Optional[float] = None,
+                   patch: bool = False) -> AsyncIterator[str]:
+        return self.think_stream(
+            self._fix_task(analysis, original_code, strategy, patch),
+            use_cache=use_cache,
+            temperature=temperature,
+        )
 
-    def fix(self, analysis: str, original_code: str) -> str:
-        task = (
+    def _fix_task(self, analysis: str, original_code: str,
+                  strategy: Optional[str] = None, patch: bool = False) -> str:
+        if patch:
+            return self._patch_task(analysis, original_code, strategy)
+
+        approach = f"APPROACH: {strategy}\n\n" if strategy else ""
+        analysis = self._fit(analysis, original_code)
+        return (
             "Fix the code based on the bug report.\n"
             "Return ONLY clean Python code.\n\n"
+            f"{approach}"
             "BUG ANALYSIS:\n"
             f"{analysis}\n\n"
             "ORIGINAL CODE:\n"
@@ -26,4 +74,23 @@ class FixerAgent(BaseAgent):
             "Start your output with:\n"
             "# Fixed code\n"
         )
-        return self.think(task)
+
+    def _patch_task(self, analysis: str, original_code: str,
+                    strategy: Optional[str] = None) -> str:
+        # Output scales with the size of the bug, not the size of the file
+        approach = f"APPROACH: {strategy}\n\n" if strategy else ""
+        numbered = number_lines(original_code)
+        analysis = self._fit(analysis, numbered)
+        return (
+            "Fix the code based on the bug report.\n"
+            "Do NOT return the whole file. Return ONLY a unified diff against the\n"
+            "ORIGINAL CODE (hunk headers like @@ -12,3 +12,4 @@, context lines\n"
+            "starting with a space, removed lines with -, added lines with +).\n"
+            "The line numbers and '| ' prefixes are for reference only; they are\n"
+            "not part of the code.\n\n"
+            f"{approach}"
+            "BUG ANALYSIS:\n"
+            f"{analysis}\n\n"
+            "ORIGINAL CODE:\n"
+            f"{numbered}\n"
+        )
@@ -0,0 +1,553 @@
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Union
+
+from prompt_budget import CHARS_PER_TOKEN, estimate_tokens
+from rate_limit import (
+    Backoff, RateLimiter, TransportError, error_status, get_shared_limiter,
+    is_retryable, is_transport_error, remaining_time,
+)
+
+# Stable, non-live model (your logs already show quota for this)
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+
+
+def default_model() -> str:
+    # GEMINI_MODEL from the environment / .env, else DEFAULT_MODEL
+    return os.getenv("GEMINI_MODEL") or DEFAULT_MODEL
+
+
+class LLMResponse:
+    """
+    Text returned by a backend plus whatever usage info it reported.
+    """
+
+    __slots__ = ("text", "usage")
+
+    def __init__(self, text: str, usage: Optional[Dict[str, int]] = None):
+        self.text = text
+        self.usage = usage or {}
+
+
+class LLMBackend:
+    """
+    Interface every agent talks to. Subclasses implement generate() and,
+    where the transport allows it, a non-blocking generate_async().
+    """
+
+    model_name = "unknown"
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 json_output: bool = False) -> LLMResponse:
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str,
+                             temperature: Optional[float] = None,
+                             json_output: bool = False) -> LLMResponse:
+        # Fallback for backends without native async support
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(
+                self.generate, prompt, temperature=temperature, json_output=json_output
+            )
+        )
+
+    async def generate_stream_async(self, prompt: str,
+                                    temperature: Optional[float] = None,
+                                    json_output: bool = False) -> AsyncIterator[str]:
+        # Fallback for backends without streaming: one chunk with the whole answer
+        response = await self.generate_async(
+            prompt, temperature=temperature, json_output=json_output
+        )
+        yield response.text
+
+
+# API key genai.configure() was last called with; configure is process-global
+_configured_key: Optional[str] = None
+_genai_lock = threading.Lock()
+
+
+def _genai_model(model_name: str, api_key: str):
+    # google.generativeai takes ~1s to import, so only pay for it on the first call
+    global _configured_key
+    with _genai_lock:
+        import google.generativeai as genai
+
+        if _configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+        return genai.GenerativeModel(model_name)
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, model_name: str = DEFAULT_MODEL, api_key: Optional[str] = None):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("❌ GEMINI_API_KEY not found in environment variables or .env!")
+
+        self.model_name = model_name
+        self._api_key = api_key
+        self._model = None
+        # Cleared when the installed SDK rejects response_mime_type (older
+        # google-generativeai); JSON answers are then parsed from plain text
+        self.json_mode = True
+
+    @property
+    def model(self):
+        # Created (and the SDK imported) on first use, then reused for every call
+        if self._model is None:
+            self._model = _genai_model(self.model_name, self._api_key)
+        return self._model
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 json_output: bool = False) -> LLMResponse:
+        try:
+            response = self.model.generate_content(
+                prompt, **self._options(temperature, json_output)
+            )
+        except Exception as e:
+            if not self._json_mode_rejected(e, json_output):
+                raise
+            response = self.model.generate_content(
+                prompt, **self._options(temperature, json_output)
+            )
+        return self._to_response(response)
+
+    async def generate_async(self, prompt: str,
+                             temperature: Optional[float] = None,
+                             json_output: bool = False) -> LLMResponse:
+        try:
+            response = await self.model.generate_content_async(
+                prompt, **self._options(temperature, json_output)
+            )
+        except Exception as e:
+            if not self._json_mode_rejected(e, json_output):
+                raise
+            response = await self.model.generate_content_async(
+                prompt, **self._options(temperature, json_output)
+            )
+        return self._to_response(response)
+
+    async def generate_stream_async(self, prompt: str,
+                                    temperature: Optional[float] = None,
+                                    json_output: bool = False) -> AsyncIterator[str]:
+        try:
+            response = await self.model.generate_content_async(
+                prompt, stream=True, **self._options(temperature, json_output)
+            )
+        except Exception as e:
+            if not self._json_mode_rejected(e, json_output):
+                raise
+            response = await self.model.generate_content_async(
+                prompt, stream=True, **self._options(temperature, json_output)
+            )
+        async for chunk in response:
+            yield self._to_response(chunk).text
+
+    def _options(self, temperature: Optional[float],
+                 json_output: bool = False) -> Dict[str, Any]:
+        config: Dict[str, Any] = {}
+        if temperature is not None:
+            config["temperature"] = temperature
+        if json_output and self.json_mode:
+            # Structured output: the model is constrained to emit valid JSON
+            config["response_mime_type"] = "application/json"
+        return {"generation_config": config} if config else {}
+
+    def _json_mode_rejected(self, error: Exception, json_output: bool) -> bool:
+        # The SDK predates JSON mode: stop asking for it and retry the call once
+        if json_output and self.json_mode and "response_mime_type" in str(error):
+            self.json_mode = False
+            return True
+        return False
+
+    @staticmethod
+    def _to_response(response) -> LLMResponse:
+        text = ""
+        if hasattr(response, "candidates") and response.candidates:
+            first = response.candidates[0]
+            if hasattr(first, "content") and hasattr(first.content, "parts"):
+                for part in first.content.parts:
+                    if hasattr(part, "text") and part.text:
+                        text += part.text
+
+        usage = {}
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is not None:
+            usage = {
+                "prompt_tokens": getattr(metadata, "prompt_token_count", 0) or 0,
+                "response_tokens": getattr(metadata, "candidates_token_count", 0) or 0,
+                "total_tokens": getattr(metadata, "total_token_count", 0) or 0,
+            }
+
+        return LLMResponse(text, usage)
+
+
+# Latency spec accepted by FakeBackend:
+#   0.2                        -> constant seconds
+#   ("uniform", lo, hi)
+#   ("normal", mean, stddev)   -> clipped at 0
+#   ("lognormal", mu, sigma)
+LatencySpec = Union[float, Sequence[Any]]
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic local stand-in for Gemini, for offline profiling and load tests.
+
+    responses can be:
+    - None: answer each agent role with a canned, well-formed reply
+    - a list of strings: returned in order, cycling
+    - a callable(prompt) -> str
+    """
+
+    def __init__(self, responses: Union[None, List[str], Callable[[str], str]] = None,
+                 latency: LatencySpec = 0.0, seed: int = 0, model_name: str = "fake",
+                 chunk_size: int = 40, chunk_delay: float = 0.0):
+        self.model_name = model_name
+        self.responses = responses
+        self.latency = latency
+        # Streaming: characters per chunk and delay between chunks
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 json_output: bool = False) -> LLMResponse:
+        time.sleep(self._next_latency())
+        return self._respond(prompt)
+
+    async def generate_async(self, prompt: str,
+                             temperature: Optional[float] = None,
+                             json_output: bool = False) -> LLMResponse:
+        await asyncio.sleep(self._next_latency())
+        return self._respond(prompt)
+
+    async def generate_stream_async(self, prompt: str,
+                                    temperature: Optional[float] = None,
+                                    json_output: bool = False) -> AsyncIterator[str]:
+        # Latency is time-to-first-token; the rest trickles out in small chunks
+        await asyncio.sleep(self._next_latency())
+        text = self._respond(prompt).text
+        for start in range(0, len(text), self.chunk_size):
+            if start:
+                await asyncio.sleep(self.chunk_delay)
+            yield text[start:start + self.chunk_size]
+
+    def _respond(self, prompt: str) -> LLMResponse:
+        index = self.calls
+        self.calls += 1
+
+        if callable(self.responses):
+            text = self.responses(prompt)
+        elif self.responses:
+            text = self.responses[index % len(self.responses)]
+        else:
+            text = self._canned_reply(prompt)
+
+        # Rough token estimate (~4 chars per token) so accounting has numbers to show
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "response_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        }
+        return LLMResponse(text, usage)
+
+    def _next_latency(self) -> float:
+        spec = self.latency
+        if isinstance(spec, (int, float)):
+            return float(spec)
+
+        kind, a, b = spec
+        if kind == "uniform":
+            return self._rng.uniform(a, b)
+        if kind == "normal":
+            return max(0.0, self._rng.gauss(a, b))
+        if kind == "lognormal":
+            return self._rng.lognormvariate(a, b)
+        raise ValueError(f"Unknown latency distribution: {kind}")
+
+    @staticmethod
+    def _canned_reply(prompt: str) -> str:
+        if "Code Validator" in prompt:
+            return json.dumps({
+                "validation": "VALID",
+                "reason": "Fake backend always accepts.",
+                "remaining_issues": [],
+                "confidence": "Low",
+            })
+
+        if "Code Fixer" in prompt:
+            # Echo the original code back so the pipeline has something to execute
+            match = re.search(r"ORIGINAL CODE:\n(.*?)\n\nStart your output with:", prompt, re.S)
+            original = match.group(1) if match else "pass"
+            return f"# Fixed code\n{original}"
+
+        analysis = (
+            "BUG ANALYSIS:\n"
+            "Syntax Issues:\n- None\n"
+            "Logic Issues:\n- None\n"
+            "Runtime Issues:\n- None\n"
+            "Severity: Low"
+        )
+        if "Code Debugger" in prompt:
+            # Fused analyze + fix: the code is the last thing in the prompt
+            original = prompt.rsplit("CODE:\n", 1)[-1]
+            return json.dumps({"analysis": analysis, "fixed_code": f"# Fixed code\n{original}"})
+        return analysis
+
+
+class RecordReplayBackend(LLMBackend):
+    """
+    Wraps a real backend and stores every response on disk (mode="record"),
+    or serves stored responses without touching the network (mode="replay").
+    mode="auto" replays when a recording exists and records otherwise.
+    """
+
+    def __init__(self, directory: str, inner: Optional[LLMBackend] = None,
+                 mode: str = "replay", model_name: Optional[str] = None):
+        if mode not in ("record", "replay", "auto"):
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode != "replay" and inner is None:
+            raise ValueError(f"mode={mode!r} needs an inner backend to record from")
+
+        self.directory = directory
+        self.inner = inner
+        self.mode = mode
+        self.model_name = model_name or (inner.model_name if inner else DEFAULT_MODEL)
+        os.makedirs(directory, exist_ok=True)
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 json_output: bool = False) -> LLMResponse:
+        settings = self._settings(temperature, json_output)
+        stored = self._load(prompt, settings)
+        if stored is not None:
+            return stored
+        response = self.inner.generate(prompt, temperature=temperature, json_output=json_output)
+        return self._save(prompt, settings, response)
+
+    async def generate_async(self, prompt: str,
+                             temperature: Optional[float] = None,
+                             json_output: bool = False) -> LLMResponse:
+        settings = self._settings(temperature, json_output)
+        stored = self._load(prompt, settings)
+        if stored is not None:
+            return stored
+        response = await self.inner.generate_async(
+            prompt, temperature=temperature, json_output=json_output
+        )
+        return self._save(prompt, settings, response)
+
+    async def generate_stream_async(self, prompt: str,
+                                    temperature: Optional[float] = None,
+                                    json_output: bool = False) -> AsyncIterator[str]:
+        settings = self._settings(temperature, json_output)
+        stored = self._load(prompt, settings)
+        if stored is not None:
+            yield stored.text
+            return
+
+        parts = []
+        async for chunk in self.inner.generate_stream_async(
+            prompt, temperature=temperature, json_output=json_output
+        ):
+            parts.append(chunk)
+            yield chunk
+        self._save(prompt, settings, LLMResponse("".join(parts)))
+
+    @staticmethod
+    def _settings(temperature: Optional[float], json_output: bool) -> str:
+        # Plain-text calls keep the original key so existing recordings still match
+        return f"{temperature}\0json" if json_output else f"{temperature}"
+
+    def _path(self, prompt: str, settings: str) -> str:
+        key = f"{self.model_name}\0{settings}\0{prompt}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _load(self, prompt: str, settings: str) -> Optional[LLMResponse]:
+        if self.mode == "record":
+            return None
+
+        path = self._path(prompt, settings)
+        if not os.path.exists(path):
+            if self.mode == "replay":
+                raise LookupError(f"No recorded response for prompt ({os.path.basename(path)})")
+            return None
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return LLMResponse(data["text"], data.get("usage"))
+
+    def _save(self, prompt: str, settings: str, response: LLMResponse) -> LLMResponse:
+        path = self._path(prompt, settings)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"model": self.model_name, "prompt": prompt,
+                 "text": response.text, "usage": response.usage},
+                f,
+            )
+        os.replace(tmp_path, path)
+        return response
+
+
+class RateLimitedBackend(LLMBackend):
+    """
+    Wraps a backend with the shared RPM/TPM limiter and retries quota (429),
+    server (5xx) and network errors with jittered exponential backoff.
+    Transport failures that survive the retries are raised as TransportError.
+    """
+
+    def __init__(self, inner: LLMBackend, limiter: Optional[RateLimiter] = None,
+                 backoff: Optional[Backoff] = None, call_timeout: Optional[float] = None):
+        self.inner = inner
+        self.model_name = inner.model_name
+        self.limiter = limiter if limiter is not None else get_shared_limiter()
+        self.backoff = backoff if backoff is not None else Backoff()
+        # Per-call cap on waiting + retrying, on top of any job deadline
+        self.call_timeout = call_timeout
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 json_output: bool = False) -> LLMResponse:
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            self.limiter.acquire(estimate_tokens(prompt))
+            try:
+                response = self.inner.generate(
+                    prompt, temperature=temperature, json_output=json_output
+                )
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt, started))
+                attempt += 1
+                continue
+            self._charge(response)
+            return response
+
+    async def generate_async(self, prompt: str,
+                             temperature: Optional[float] = None,
+                             json_output: bool = False) -> LLMResponse:
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            await self.limiter.acquire_async(estimate_tokens(prompt))
+            try:
+                response = await self.inner.generate_async(
+                    prompt, temperature=temperature, json_output=json_output
+                )
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(e, attempt, started))
+                attempt += 1
+                continue
+            self._charge(response)
+            return response
+
+    async def generate_stream_async(self, prompt: str,
+                                    temperature: Optional[float] = None,
+                                    json_output: bool = False) -> AsyncIterator[str]:
+        # Only retried until the first chunk arrives; after that a failure is final
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            await self.limiter.acquire_async(estimate_tokens(prompt))
+            received = 0
+            try:
+                async for chunk in self.inner.generate_stream_async(
+                    prompt, temperature=temperature, json_output=json_output
+                ):
+                    received += len(chunk)
+                    yield chunk
+            except Exception as e:
+                if received:
+                    self._fail(e, attempt + 1)
+                await asyncio.sleep(self._retry_delay(e, attempt, started))
+                attempt += 1
+                continue
+            self.limiter.charge(received // CHARS_PER_TOKEN)
+            return
+
+    def _retry_delay(self, exc: Exception, attempt: int, started: float) -> float:
+        """
+        Seconds to sleep before retrying `exc`, or raise if it isn't worth it.
+        """
+        if not is_retryable(exc) or attempt + 1 >= self.backoff.max_attempts:
+            self._fail(exc, attempt + 1)
+
+        delay = self.backoff.delay(attempt, exc)
+        budgets = [remaining_time()]
+        if self.call_timeout is not None:
+            budgets.append(self.call_timeout - (time.monotonic() - started))
+        if any(left is not None and delay >= left for left in budgets):
+            self._fail(exc, attempt + 1, note="deadline exceeded")
+
+        self.limiter.retries += 1
+        return delay
+
+    def _fail(self, exc: Exception, attempts: int, note: Optional[str] = None):
+        if not is_transport_error(exc):
+            # e.g. a bug or a blocked prompt: not ours to classify
+            raise exc
+        self.limiter.failures += 1
+        message = f"{type(exc).__name__}: {exc}"
+        if note:
+            message = f"{message} ({note})"
+        raise TransportError(
+            f"{message} after {attempts} attempt(s)",
+            status=error_status(exc), retryable=is_retryable(exc), attempts=attempts,
+        ) from exc
+
+    def _charge(self, response: LLMResponse) -> None:
+        self.limiter.charge(
+            response.usage.get("response_tokens") or estimate_tokens(response.text)
+        )
+
+
+_backends: Dict[Any, LLMBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(model_name: Optional[str] = None) -> LLMBackend:
+    """
+    Process-wide registry over create_backend(): one backend (and so one
+    model client, transport and rate limiter) per backend kind and model,
+    shared by every agent and Coordinator. Default model: default_model().
+    """
+    model_name = model_name or default_model()
+    key = (os.getenv("LLM_BACKEND", "gemini").lower(), model_name)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = _backends[key] = create_backend(model_name)
+        return backend
+
+
+def create_backend(model_name: Optional[str] = None) -> LLMBackend:
+    """
+    Pick a backend from the environment:
+    LLM_BACKEND=gemini (default) | fake | record | replay
+    LLM_RECORDINGS_DIR=directory used by record/replay (default: recordings)
+    LLM_RPM / LLM_TPM=shared requests/tokens per minute limits for Gemini (0 = none)
+    """
+    model_name = model_name or default_model()
+    kind = os.getenv("LLM_BACKEND", "gemini").lower()
+    recordings = os.getenv("LLM_RECORDINGS_DIR", "recordings")
+
+    if kind == "gemini":
+        return RateLimitedBackend(GeminiBackend(model_name))
+    if kind == "fake":
+        return FakeBackend()
+    if kind == "record":
+        return RecordReplayBackend(
+            recordings, RateLimitedBackend(GeminiBackend(model_name)), mode="record"
+        )
+    if kind == "replay":
+        return RecordReplayBackend(recordings, mode="replay", model_name=model_name)
+    raise ValueError(f"Unknown LLM_BACKEND: {kind}")
@@ -0,0 +1,220 @@
+import ast
+import io
+import json
+import re
+import tokenize
+from typing import Any, Dict, List, Optional, Tuple
+
+from code_executor import CodeExecutor
+
+# "print(f(2))  # expected: 4", "# should print: 4", "# => 4", "# Output: 4";
+# only Python literals count, since they are compared against printed text
+EXPECT_COMMENT = re.compile(
+    r"#\s*(?:expected(?:\s+output)?|should\s+(?:print|be|return|output)|output|=>|->)"
+    r"\s*:?\s*(.+?)\s*$",
+    re.IGNORECASE,
+)
+
+RESULT_MARKER = "__LOCAL_VALIDATION__"
+
+
+def gather_checks(original: str) -> Optional[Dict[str, Any]]:
+    """
+    Checks the original author left in the code: module-level asserts,
+    test_* functions, doctest examples and print lines annotated with their
+    expected output. None if the original doesn't parse.
+    """
+    try:
+        tree = ast.parse(original)
+    except (SyntaxError, ValueError):
+        return None
+
+    asserts: List[Tuple[str, str]] = []
+    tests: List[Tuple[str, str]] = []
+    doctests: List[Tuple[str, str]] = []
+
+    for node in tree.body:
+        for stmt in _main_block(node) or [node]:
+            if isinstance(stmt, ast.Assert):
+                asserts.append((f"assert on line {stmt.lineno}", ast.unparse(stmt)))
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) \
+                and node.name.startswith("test") and not node.args.args:
+            tests.append((node.name, ast.get_source_segment(original, node) or ast.unparse(node)))
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            doc = ast.get_docstring(node, clean=False)
+            if doc and ">>>" in doc:
+                doctests.append((getattr(node, "name", "module"), doc))
+
+    return {
+        "asserts": asserts,
+        "tests": tests,
+        "doctests": doctests,
+        "expected_output": _expected_output(original),
+    }
+
+
+def _main_block(node: ast.stmt) -> Optional[List[ast.stmt]]:
+    # Body of `if __name__ == "__main__":`
+    if isinstance(node, ast.If) and "__main__" in ast.unparse(node.test):
+        return node.body
+    return None
+
+
+def _expected_output(original: str) -> List[str]:
+    expected = []
+    lines = original.splitlines()
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO(original).readline))
+    except (tokenize.TokenError, IndentationError):
+        return expected
+
+    for token in tokens:
+        if token.type != tokenize.COMMENT:
+            continue
+        row, col = token.start
+        code = lines[row - 1][:col].strip()
+        match = EXPECT_COMMENT.match(token.string)
+        if match and code.startswith("print(") and _is_literal(match.group(1)):
+            expected.append(match.group(1))
+    return expected
+
+
+def _is_literal(text: str) -> bool:
+    # "# should be 10" is checkable, "# should be non-zero" is prose
+    try:
+        ast.literal_eval(text)
+    except (SyntaxError, ValueError, TypeError, MemoryError, RecursionError):
+        return False
+    return True
+
+
+def count_checks(checks: Dict[str, Any]) -> int:
+    return sum(len(checks[key]) for key in ("asserts", "tests", "doctests", "expected_output"))
+
+
+def build_harness(fixed: str, checks: Dict[str, Any]) -> str:
+    """
+    The fixed code followed by the original's checks, each run in isolation;
+    the last output line is a JSON summary after RESULT_MARKER.
+    """
+    calls = []
+    for name, source in checks["asserts"]:
+        calls.append(f"__lv_check({name!r}, lambda: exec({source!r}, globals()))")
+    for name, source in checks["tests"]:
+        calls.append(
+            f"__lv_check({name!r}, lambda: (exec({source!r}, globals()), globals()[{name!r}]()))"
+        )
+    for name, doc in checks["doctests"]:
+        calls.append(f"__lv_check('doctest ' + {name!r}, lambda: __lv_doctest({name!r}, {doc!r}))")
+
+    return "\n".join([
+        fixed,
+        "",
+        "# --- local validation harness ---",
+        "import doctest as __lv_doctest_mod",
+        "import json as __lv_json",
+        "__lv = {'passed': 0, 'failed': []}",
+        "def __lv_check(name, check):",
+        "    try:",
+        "        check()",
+        "        __lv['passed'] += 1",
+        "    except BaseException as e:",
+        "        __lv['failed'].append(f'{name}: {type(e).__name__}: {e}'[:300])",
+        "def __lv_doctest(name, doc):",
+        "    test = __lv_doctest_mod.DocTestParser().get_doctest(",
+        "        doc, dict(globals()), name, '<original>', 0)",
+        "    flags = __lv_doctest_mod.ELLIPSIS | __lv_doctest_mod.NORMALIZE_WHITESPACE",
+        "    runner = __lv_doctest_mod.DocTestRunner(verbose=False, optionflags=flags)",
+        "    report = []",
+        "    runner.run(test, out=report.append)",
+        "    if runner.failures:",
+        "        raise AssertionError(''.join(report)[-200:])",
+        *calls,
+        f"print({RESULT_MARKER!r} + __lv_json.dumps(__lv))",
+    ])
+
+
+def check_expected_output(output: str, expected: List[str]) -> List[str]:
+    """
+    Expected values must appear as output lines, in order. Returns failures.
+    """
+    lines = [line.strip() for line in output.splitlines()]
+    failures = []
+    position = 0
+    for value in expected:
+        literal = ast.literal_eval(value)
+        candidates = {value, str(literal), repr(literal)}
+        for index in range(position, len(lines)):
+            if lines[index] in candidates:
+                position = index + 1
+                break
+        else:
+            failures.append(f"expected output {value!r} not printed")
+    return failures
+
+
+async def validate_locally(original: str, fixed: str, exec_result: Dict[str, Any],
+                           executor: CodeExecutor) -> Dict[str, Any]:
+    """
+    Deterministic verdict from the original's own checks, run against the
+    fixed code in the sandbox: "pass", "fail", or "inconclusive" (no checks,
+    or they couldn't be run) when the LLM validator has to decide.
+    """
+    verdict: Dict[str, Any] = {"verdict": "inconclusive", "checks": 0, "passed": 0,
+                               "failures": [], "reason": ""}
+    if not exec_result.get("success"):
+        verdict["reason"] = "fixed code does not run"
+        return verdict
+
+    checks = gather_checks(original)
+    if not checks or not count_checks(checks):
+        verdict["reason"] = "no asserts, tests, doctests or expected output in the original"
+        return verdict
+    verdict["checks"] = count_checks(checks)
+
+    failures = check_expected_output(exec_result.get("output") or "", checks["expected_output"])
+    passed = len(checks["expected_output"]) - len(failures)
+
+    if count_checks(checks) > len(checks["expected_output"]):
+        run = await executor.execute_async(build_harness(fixed, checks))
+        summary = _parse_summary(run.get("output") or "")
+        if summary is None:
+            problem = run.get("error_type") or "no summary"
+            verdict["reason"] = f"check harness did not finish ({problem})"
+            return verdict
+        passed += summary["passed"]
+        failures.extend(summary["failed"])
+
+    verdict["passed"] = passed
+    verdict["failures"] = failures
+    verdict["verdict"] = "fail" if failures else "pass"
+    verdict["reason"] = (
+        f"{len(failures)} of {verdict['checks']} local check(s) failed" if failures
+        else f"all {verdict['checks']} local check(s) passed"
+    )
+    return verdict
+
+
+def _parse_summary(output: str) -> Optional[Dict[str, Any]]:
+    index = output.rfind(RESULT_MARKER)
+    if index == -1:
+        return None
+    line = output[index + len(RESULT_MARKER):].splitlines()[0]
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def as_validation_json(verdict: Dict[str, Any]) -> str:
+    # Same shape as the LLM validator's answer, so callers handle both alike
+    return json.dumps({
+        "validation": "VALID" if verdict["verdict"] == "pass" else "INVALID",
+        "reason": verdict["reason"],
+        "remaining_issues": verdict["failures"],
+        "confidence": "High",
+        "source": "local",
+    })
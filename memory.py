@@ -1,25 +1,147 @@
+import collections
+import itertools
+import json
+import threading
+import time
+from collections.abc import Mapping, Sequence
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
+
+# Wall-clock time of monotonic zero, so events can store a cheap monotonic
+# reading and still be shown as local ISO timestamps
+_WALL_OFFSET = time.time() - time.monotonic()
+
+_FIELDS = ("agent", "phase", "status", "summary", "extra", "timestamp")
+
+
+class MemoryEvent(Mapping):
+    """
+    One history entry. Reads like the old dict (entry["agent"], entry.get(...))
+    but uses __slots__ and formats its timestamp only when asked.
+    """
+
+    __slots__ = ("agent", "phase", "status", "summary", "extra", "monotonic")
+
+    def __init__(self, agent: str, phase: str, status: str, summary: str,
+                 extra: Dict[str, Any], monotonic: float):
+        self.agent = agent
+        self.phase = phase
+        self.status = status
+        self.summary = summary
+        self.extra = extra
+        self.monotonic = monotonic
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(_WALL_OFFSET + self.monotonic).isoformat()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_FIELDS)
+
+    def __len__(self) -> int:
+        return len(_FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in _FIELDS}
+
+    def __repr__(self) -> str:
+        return f"MemoryEvent({self.agent!r}, {self.phase!r}, {self.status!r})"
+
+
+class HistoryView(Sequence):
+    """
+    Read-only view of a Memory's events. Cheap to hand out; Memory.clear()
+    starts a new buffer, so a view taken earlier keeps its events.
+    """
+
+    __slots__ = ("_events",)
+
+    def __init__(self, events: "collections.deque[MemoryEvent]"):
+        self._events = events
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._events))
+            if step == 1:
+                # A page of a long history without copying the whole deque
+                return list(itertools.islice(self._events, start, stop))
+            return list(self._events)[index]
+        return self._events[index]
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __iter__(self) -> Iterator[MemoryEvent]:
+        return iter(self._events)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        # Plain dicts, e.g. for json.dumps
+        return [event.to_dict() for event in self._events]
+
+    def __repr__(self) -> str:
+        return f"HistoryView({len(self)} events)"
+
+
+def json_default(value: Any) -> Any:
+    """
+    json.dumps(..., default=json_default) for results carrying a history.
+    """
+    if isinstance(value, HistoryView):
+        return value.to_list()
+    if isinstance(value, MemoryEvent):
+        return value.to_dict()
+    return str(value)
+
+
+class JsonlSink:
+    """
+    Append-only JSONL file that events are streamed to as they are added.
+    Safe to share between several Memory instances.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
 
 
 class Memory:
-    def __init__(self):
-        self.history: List[Dict[str, Any]] = []
+    def __init__(self, max_events: Optional[int] = None, sink: Optional[JsonlSink] = None,
+                 job_id: Optional[str] = None):
+        # max_events bounds the in-memory history (oldest dropped first);
+        # the sink, if any, still receives every event
+        self.max_events = max_events
+        self.sink = sink
+        self.job_id = job_id
+        self.history: "collections.deque[MemoryEvent]" = collections.deque(maxlen=max_events)
 
     def add(self, agent_name: str, phase: str, status: str,
             summary: str, extra: Optional[Dict[str, Any]] = None) -> None:
-        entry = {
-            "agent": agent_name,
-            "phase": phase,
-            "status": status,
-            "summary": summary,
-            "extra": extra or {},
-            "timestamp": datetime.now().isoformat(),
-        }
-        self.history.append(entry)
-
-    def get_full_history(self) -> List[Dict[str, Any]]:
-        return self.history.copy()
+        event = MemoryEvent(agent_name, phase, status, summary, extra or {}, time.monotonic())
+        self.history.append(event)
+
+        if self.sink is not None:
+            record = event.to_dict()
+            if self.job_id is not None:
+                record["job"] = self.job_id
+            self.sink.write(record)
+
+    def get_full_history(self) -> HistoryView:
+        return HistoryView(self.history)
 
     def clear(self) -> None:
-        self.history = []
+        self.history = collections.deque(maxlen=self.max_events)
@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from llm_backends import LLMBackend, LLMResponse, default_model, get_backend
+from prompt_budget import CHARS_PER_TOKEN, estimate_tokens
+
+ROLES = ("analyzer", "fixer", "validator")
+
+# USD per 1M tokens (input, output), list prices; models not listed count as free
+MODEL_PRICES = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+# Preflight error classes the cheapest model rarely fixes first time: the code
+# runs but is wrong ("ok"), or hangs / recurses
+HARD_ERRORS = frozenset({"ok", "Timeout", "RecursionError"})
+
+# Why a fix attempt failed
+FAIL_REJECTED = "rejected"          # not run: bad structure or doesn't compile
+FAIL_EXECUTION = "execution"        # ran and raised / timed out
+FAIL_LOCAL_CHECKS = "local_checks"  # ran, but the original's own tests/asserts fail
+FAIL_VALIDATOR = "validator"        # passed every local step, the LLM validator said no
+
+# Failures that move the next attempt up a cascade tier: only what local
+# compile/run/check steps show the model got wrong
+ESCALATING_FAILURES = frozenset({FAIL_REJECTED, FAIL_EXECUTION, FAIL_LOCAL_CHECKS})
+
+
+def call_cost(model: str, prompt_tokens: int, response_tokens: int) -> float:
+    prompt_price, response_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + response_tokens * response_price) / 1_000_000
+
+
+class ModelStats:
+    """
+    Per-model call latency, tokens, cost and errors, plus the outcome of the
+    fix attempts each model made, for tuning the cascade.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, model: str) -> Dict[str, Any]:
+        entry = self._models.get(model)
+        if entry is None:
+            entry = self._models[model] = {
+                "calls": 0, "errors": 0, "latency_total": 0.0, "latency_max": 0.0,
+                "prompt_tokens": 0, "response_tokens": 0, "cost_usd": 0.0,
+                "attempts": 0, "fixed": 0,
+            }
+        return entry
+
+    def record_call(self, model: str, seconds: float, prompt_tokens: int = 0,
+                    response_tokens: int = 0, error: bool = False) -> None:
+        with self._lock:
+            entry = self._entry(model)
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["latency_total"] += seconds
+            entry["latency_max"] = max(entry["latency_max"], seconds)
+            entry["prompt_tokens"] += prompt_tokens
+            entry["response_tokens"] += response_tokens
+            entry["cost_usd"] += call_cost(model, prompt_tokens, response_tokens)
+
+    def record_attempt(self, model: str, fixed: bool) -> None:
+        with self._lock:
+            entry = self._entry(model)
+            entry["attempts"] += 1
+            entry["fixed"] += int(fixed)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            report = {}
+            for model, entry in self._models.items():
+                calls, attempts = entry["calls"], entry["attempts"]
+                report[model] = {
+                    "calls": calls,
+                    "errors": entry["errors"],
+                    "latency_mean": round(entry["latency_total"] / calls, 4) if calls else 0.0,
+                    "latency_max": round(entry["latency_max"], 4),
+                    "prompt_tokens": entry["prompt_tokens"],
+                    "response_tokens": entry["response_tokens"],
+                    "cost_usd": round(entry["cost_usd"], 6),
+                    "fix_attempts": attempts,
+                    "fix_success_rate": round(entry["fixed"] / attempts, 4) if attempts else None,
+                }
+            return report
+
+
+class TrackedBackend(LLMBackend):
+    """
+    Passes calls through to `inner`, recording each one in `stats` under `model`.
+    """
+
+    def __init__(self, inner: LLMBackend, model: str, stats: ModelStats):
+        self.inner = inner
+        self.model_name = model
+        self.stats = stats
+
+    def generate(self, prompt: str, temperature: Optional[float] = None,
+                 json_output: bool = False) -> LLMResponse:
+        started = time.perf_counter()
+        try:
+            response = self.inner.generate(
+                prompt, temperature=temperature, json_output=json_output
+            )
+        except Exception:
+            self.stats.record_call(self.model_name, time.perf_counter() - started, error=True)
+            raise
+        self._record(prompt, response, started)
+        return response
+
+    async def generate_async(self, prompt: str,
+                             temperature: Optional[float] = None,
+                             json_output: bool = False) -> LLMResponse:
+        started = time.perf_counter()
+        try:
+            response = await self.inner.generate_async(
+                prompt, temperature=temperature, json_output=json_output
+            )
+        except Exception:
+            self.stats.record_call(self.model_name, time.perf_counter() - started, error=True)
+            raise
+        self._record(prompt, response, started)
+        return response
+
+    async def generate_stream_async(self, prompt: str,
+                                    temperature: Optional[float] = None,
+                                    json_output: bool = False) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        received = 0
+        try:
+            async for chunk in self.inner.generate_stream_async(
+                prompt, temperature=temperature, json_output=json_output
+            ):
+                received += len(chunk)
+                yield chunk
+        except Exception:
+            self.stats.record_call(self.model_name, time.perf_counter() - started, error=True)
+            raise
+        self.stats.record_call(
+            self.model_name, time.perf_counter() - started,
+            estimate_tokens(prompt), received // CHARS_PER_TOKEN,
+        )
+
+    def _record(self, prompt: str, response: LLMResponse, started: float) -> None:
+        self.stats.record_call(
+            self.model_name, time.perf_counter() - started,
+            response.usage.get("prompt_tokens") or estimate_tokens(prompt),
+            response.usage.get("response_tokens") or estimate_tokens(response.text),
+        )
+
+
+class ModelRouter:
+    """
+    Model per agent role, and the fixer cascade: the first fix attempt uses
+    the cheapest tier, each attempt that fails locally (doesn't compile or
+    run, or fails the original's own checks) moves one tier up; a veto of
+    the LLM validator alone does not. Large inputs and hard error classes
+    start one tier higher each.
+
+    From the environment: GEMINI_MODEL (all roles), GEMINI_MODEL_ANALYZER /
+    _FIXER / _VALIDATOR (per role), GEMINI_CASCADE (comma-separated fixer
+    tiers, cheapest first; default: just the fixer model).
+    """
+
+    def __init__(self, role_models: Optional[Dict[str, str]] = None,
+                 cascade: Optional[Iterable[str]] = None,
+                 large_input_lines: int = 300,
+                 hard_errors: Iterable[str] = HARD_ERRORS,
+                 backend_factory: Callable[[str], LLMBackend] = get_backend):
+        default = default_model()
+        self.role_models = {
+            role: os.getenv(f"GEMINI_MODEL_{role.upper()}") or default for role in ROLES
+        }
+        self.role_models.update(role_models or {})
+
+        if cascade is None:
+            tiers = os.getenv("GEMINI_CASCADE", "")
+            cascade = [name.strip() for name in tiers.split(",") if name.strip()]
+        self.cascade: List[str] = list(cascade) or [self.role_models["fixer"]]
+
+        self.large_input_lines = large_input_lines
+        self.hard_errors = frozenset(hard_errors)
+        self.stats = ModelStats()
+        self._factory = backend_factory
+        self._backends: Dict[str, TrackedBackend] = {}
+
+    @classmethod
+    def single(cls, backend: LLMBackend) -> "ModelRouter":
+        # Every role and attempt on one given backend (tests, benchmarks, fakes)
+        model = backend.model_name
+        return cls(
+            role_models={role: model for role in ROLES}, cascade=[model],
+            backend_factory=lambda _: backend,
+        )
+
+    def backend(self, model: str) -> TrackedBackend:
+        tracked = self._backends.get(model)
+        if tracked is None:
+            tracked = self._backends[model] = TrackedBackend(
+                self._factory(model), model, self.stats
+            )
+        return tracked
+
+    @staticmethod
+    def escalates(failure: str) -> bool:
+        return failure in ESCALATING_FAILURES
+
+    def fixer_model(self, escalations: int, code: str, error_signature: Optional[str]) -> str:
+        # escalations: earlier attempts of the job that failed locally (see escalates)
+        tier = escalations
+        if code.count("\n") + 1 >= self.large_input_lines:
+            tier += 1
+        if (error_signature or "").split(":")[0] in self.hard_errors:
+            tier += 1
+        return self.cascade[min(tier, len(self.cascade) - 1)]
+
+    def signature(self) -> str:
+        # For checkpoint keys: a different routing means different answers
+        roles = ",".join(self.role_models[role] for role in ROLES)
+        return f"{roles}>{','.join(self.cascade)}"
@@ -0,0 +1,124 @@
+import re
+from typing import List, Optional, Tuple
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+REPLACE_HEADER = re.compile(r"^@@ REPLACE (\d+)-(\d+)\s*$")
+
+
+def number_lines(code: str) -> str:
+    """
+    Prefix each line with its 1-based number so the model can address lines.
+    """
+    lines = code.splitlines()
+    width = len(str(len(lines))) if lines else 1
+    return "\n".join(f"{i:>{width}}| {line}" for i, line in enumerate(lines, start=1))
+
+
+def extract_patch(response: str) -> str:
+    # Models like to wrap diffs in ```diff fences
+    blocks = re.findall(r"```(?:diff|patch)?\n?(.*?)```", response, re.S | re.IGNORECASE)
+    return blocks[-1] if blocks else response
+
+
+def apply_patch(original: str, patch: str) -> Optional[str]:
+    """
+    Apply a unified diff or "@@ REPLACE a-b" line-range blocks to `original`.
+    Returns the patched code, or None if the patch is empty or doesn't apply.
+    """
+    patch = extract_patch(patch)
+    lines = original.splitlines()
+
+    if re.search(r"^@@ REPLACE ", patch, re.M):
+        edits = _parse_replace_blocks(patch)
+    else:
+        edits = _parse_unified(patch, lines)
+
+    if not edits:
+        return None
+
+    # Apply bottom-up so earlier line numbers stay valid
+    edits.sort(key=lambda edit: edit[0], reverse=True)
+    previous_start = len(lines) + 1
+    for start, end, new_lines in edits:
+        if start < 0 or end > len(lines) or start > end or end > previous_start:
+            return None
+        lines[start:end] = new_lines
+        previous_start = start
+
+    patched = "\n".join(lines)
+    if original.endswith("\n"):
+        patched += "\n"
+    return patched
+
+
+def _parse_replace_blocks(patch: str) -> List[Tuple[int, int, List[str]]]:
+    edits = []
+    current = None
+    for line in patch.splitlines():
+        header = REPLACE_HEADER.match(line)
+        if header:
+            start, end = int(header.group(1)), int(header.group(2))
+            current = (start - 1, end, [])
+            edits.append(current)
+        elif line.strip() == "@@ END":
+            current = None
+        elif current is not None:
+            current[2].append(line)
+    return edits
+
+
+def _parse_unified(patch: str, lines: List[str]) -> Optional[List[Tuple[int, int, List[str]]]]:
+    hunks = []
+    current = None
+    for line in patch.splitlines():
+        if line.startswith(("---", "+++")) and current is None:
+            continue
+        header = HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)), [], [])
+            hunks.append(current)
+            continue
+        if current is None:
+            continue
+        if line.startswith("-"):
+            current[1].append(line[1:])
+        elif line.startswith("+"):
+            current[2].append(line[1:])
+        elif line.startswith(" ") or line == "":
+            current[1].append(line[1:])
+            current[2].append(line[1:])
+        # "\ No newline at end of file" and other noise is ignored
+
+    edits = []
+    for expected, old, new in hunks:
+        # Blank lines after the last hunk are formatting, not context
+        while old and new and old[-1] == "" and new[-1] == "":
+            old.pop()
+            new.pop()
+        start = _locate(lines, old, expected - 1)
+        if start is None:
+            return None
+        edits.append((start, start + len(old), new))
+    return edits
+
+
+def _locate(lines: List[str], block: List[str], expected: int) -> Optional[int]:
+    """
+    Find `block` in `lines`, preferring the position closest to `expected`
+    (model-written line numbers are often slightly off).
+    """
+    if not block:
+        return max(0, min(expected, len(lines)))
+
+    def matches(at: int, strip: bool) -> bool:
+        window = lines[at:at + len(block)]
+        if strip:
+            return [l.rstrip() for l in window] == [l.rstrip() for l in block]
+        return window == block
+
+    candidates = range(len(lines) - len(block) + 1)
+    for strip in (False, True):
+        found = [at for at in candidates if matches(at, strip)]
+        if found:
+            return min(found, key=lambda at: abs(at - expected))
+    return None
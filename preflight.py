@@ -0,0 +1,92 @@
+import ast
+from typing import Any, Dict, Optional
+
+from code_executor import CodeExecutor
+
+
+def check_syntax(code: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse + compile locally. Returns None if the code compiles,
+    otherwise where and why it doesn't.
+    """
+    try:
+        compile(ast.parse(code), "<string>", "exec")
+        return None
+    except SyntaxError as e:
+        return {
+            "line": e.lineno,
+            "column": e.offset,
+            "message": e.msg,
+            "text": (e.text or "").rstrip(),
+            "error_type": type(e).__name__,
+        }
+    except ValueError as e:
+        # e.g. source containing null bytes
+        return {"line": None, "column": None, "message": str(e), "text": "", "error_type": "ValueError"}
+
+
+def describe_syntax_error(error: Dict[str, Any]) -> str:
+    where = f"line {error['line']}" if error["line"] else "unknown line"
+    if error["column"]:
+        where += f", column {error['column']}"
+    text = f"{error['error_type']} at {where}: {error['message']}"
+    if error["text"]:
+        text += f"\n    {error['text'].strip()}"
+    return text
+
+
+def syntax_analysis(error: Dict[str, Any]) -> str:
+    """
+    Analyzer-format report for code that does not compile, so the
+    analyzer LLM call can be skipped.
+    """
+    location = f"Line {error['line']}" if error["line"] else "Unknown line"
+    source = f" ({error['text'].strip()})" if error["text"] else ""
+    return (
+        "BUG ANALYSIS:\n"
+        "Syntax Issues:\n"
+        f"- {location}: {error['message']}{source}\n"
+        "Logic Issues:\n"
+        "- Not analyzed (code does not compile)\n"
+        "Runtime Issues:\n"
+        "- Not analyzed (code does not compile)\n"
+        "Severity: High"
+    )
+
+
+async def run_preflight(code: str, executor: CodeExecutor) -> Dict[str, Any]:
+    """
+    Cheap local diagnosis before any LLM call:
+    - compile the input; if that fails, the syntax error is the diagnosis
+    - otherwise run the original once in the sandbox to capture the real traceback
+    """
+    report: Dict[str, Any] = {
+        "syntax_error": check_syntax(code),
+        "execution": None,
+        "diagnosis": "",
+    }
+
+    if report["syntax_error"]:
+        report["diagnosis"] = (
+            "PRE-FLIGHT DIAGNOSIS:\n" + describe_syntax_error(report["syntax_error"])
+        )
+        return report
+
+    execution = await executor.execute_async(code)
+    report["execution"] = execution
+
+    if execution["success"]:
+        output = execution.get("output", "")
+        report["diagnosis"] = (
+            "PRE-FLIGHT DIAGNOSIS:\n"
+            "Original code runs without raising an exception.\n"
+            f"Observed output:\n{output[:1000] if output else '(no output)'}"
+        )
+    else:
+        report["diagnosis"] = (
+            "PRE-FLIGHT DIAGNOSIS:\n"
+            "Original code fails when executed.\n"
+            f"{execution.get('traceback') or execution.get('error')}"
+        )
+
+    return report
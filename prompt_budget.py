@@ -0,0 +1,44 @@
+from typing import Any, Dict
+
+# Rough size of a token for Gemini-style tokenizers on English + code
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_middle(text: str, max_chars: int) -> str:
+    """
+    Keep the start and end of `text` (where tracebacks and summaries live)
+    and drop the middle.
+    """
+    if max_chars <= 0:
+        return ""
+    if len(text) <= max_chars:
+        return text
+
+    marker = f"\n... [{len(text) - max_chars} characters trimmed] ...\n"
+    if max_chars <= len(marker):
+        return text[:max_chars]
+
+    keep = max_chars - len(marker)
+    head = keep // 2
+    return text[:head] + marker + text[len(text) - (keep - head):]
+
+
+def format_execution_result(result: Dict[str, Any], max_output_chars: int = 1500) -> str:
+    """
+    Compact, bounded text form of a CodeExecutor result for prompts.
+    """
+    lines = [f"success: {result.get('success')}"]
+    if result.get("error_type"):
+        lines.append(f"error_type: {result['error_type']}")
+    if result.get("error"):
+        lines.append(f"error: {truncate_middle(str(result['error']), 500)}")
+    if result.get("traceback"):
+        lines.append(f"traceback:\n{truncate_middle(result['traceback'], max_output_chars)}")
+
+    output = result.get("output") or ""
+    lines.append(f"output:\n{truncate_middle(output, max_output_chars) if output else '(none)'}")
+    return "\n".join(lines)
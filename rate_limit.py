@@ -0,0 +1,229 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from telemetry import span
+
+# Absolute time.monotonic() by which the current job must be done (None = no deadline).
+# Set per task, e.g. by the Coordinator; every rate-limit wait and backoff respects it.
+_deadline: contextvars.ContextVar = contextvars.ContextVar("llm_deadline", default=None)
+
+# HTTP statuses worth retrying: rate limited, or the server side failed
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# google.api_core exception names, for errors that don't carry a numeric code
+RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway",
+}
+
+
+class TransportError(Exception):
+    """
+    The model could not be reached (quota, server error, network, deadline),
+    as opposed to the model answering badly. Raised through the agents so
+    callers don't mistake it for a failed fix.
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retryable: bool = False, attempts: int = 0):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.attempts = attempts
+
+
+def set_deadline(seconds_from_now: Optional[float]) -> None:
+    _deadline.set(None if seconds_from_now is None else time.monotonic() + seconds_from_now)
+
+
+def remaining_time() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+    # google.api_core errors expose .code (int), HTTP clients .status_code / .status
+    for attr in ("code", "status_code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, TransportError):
+        return exc.retryable
+    if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(exc).__name__ in RETRYABLE_NAMES
+
+
+def is_transport_error(exc: BaseException) -> bool:
+    # Anything retryable is a transport problem; so are auth/permission errors
+    return is_retryable(exc) or error_status(exc) in (401, 403)
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` units per minute up to `capacity`. Takes may
+    overdraw (e.g. when the real response size is only known afterwards);
+    later callers then wait for the debt to be repaid.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Take `amount` now and return how long the caller must wait before
+        using it (0 if available). Reservations queue up in call order.
+        """
+        self._refill(now)
+        # A single request bigger than the bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+    def refund(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits shared by every agent
+    (and every job) in the process. None disables the respective limit.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        self.acquired = 0
+        self.throttled = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.retries = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    def _reserve(self, tokens: int) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+
+            remaining = remaining_time()
+            if remaining is not None and wait > remaining:
+                # Give the slot back: we're not going to use it
+                if self._requests is not None:
+                    self._requests.refund(1)
+                if self._tokens is not None:
+                    self._tokens.refund(tokens)
+                raise TransportError(
+                    f"Deadline exceeded waiting {wait:.1f}s for rate limit", status=429
+                )
+
+            self.acquired += 1
+            if wait > 0:
+                self.throttled += 1
+                self.wait_seconds_total += wait
+                self.wait_seconds_max = max(self.wait_seconds_max, wait)
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until a request of ~`tokens` may be sent. Returns the time waited.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            with span("rate_limit_wait"):
+                time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            with span("rate_limit_wait"):
+                await asyncio.sleep(wait)
+        return wait
+
+    def charge(self, tokens: int) -> None:
+        # Account for tokens only known after the call (the response)
+        if self._tokens is not None and tokens > 0:
+            with self._lock:
+                self._tokens.reserve(tokens, time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+                "wait_seconds_max": round(self.wait_seconds_max, 3),
+                "wait_seconds_mean": round(self.wait_seconds_total / self.acquired, 4)
+                if self.acquired else 0.0,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+
+class Backoff:
+    """
+    Full-jitter exponential backoff: attempt n sleeps uniform(0, min(cap, base * 2**n)).
+    """
+
+    def __init__(self, base: float = 1.0, cap: float = 30.0, max_attempts: int = 5,
+                 seed: Optional[int] = None):
+        self.base = base
+        self.cap = cap
+        self.max_attempts = max_attempts
+        self._rng = random.Random(seed)
+
+    def delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        # Honour a server-provided Retry-After when there is one
+        retry_after = getattr(exc, "retry_after", None) if exc is not None else None
+        if isinstance(retry_after, (int, float)) and retry_after > 0:
+            return min(self.cap, float(retry_after))
+        return self._rng.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_limiter() -> RateLimiter:
+    """
+    Process-wide limiter configured from LLM_RPM / LLM_TPM (0 or unset = unlimited).
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            rpm = float(os.getenv("LLM_RPM", "0")) or None
+            tpm = float(os.getenv("LLM_TPM", "0")) or None
+            _shared_limiter = RateLimiter(rpm, tpm)
+        return _shared_limiter
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Two-tier cache for model responses, keyed on model name + prompt hash.
+
+    - Tier 1: in-process LRU (OrderedDict)
+    - Tier 2: optional SQLite file that survives restarts
+    Entries older than ttl_seconds are treated as misses and dropped.
+    The SQLite tier is trimmed every trim_every puts, so it may briefly hold
+    up to trim_every - 1 entries over max_disk_entries.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: Optional[float] = 24 * 3600,
+                 db_path: Optional[str] = None, max_disk_entries: int = 10000,
+                 trim_every: int = 64):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.trim_every = max(1, trim_every)
+        self._puts = 0
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, created REAL NOT NULL, response TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def get(self, model_name: str, prompt: str) -> Optional[str]:
+        key = self.make_key(model_name, prompt)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._expired(entry[0], now):
+                    del self._memory[key]
+                else:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, response FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if self._expired(row[0], now):
+                        self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        self._db.commit()
+                    else:
+                        self._store_memory(key, row[0], row[1])
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return row[1]
+
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, prompt: str, response: str) -> None:
+        key = self.make_key(model_name, prompt)
+        now = time.time()
+
+        with self._lock:
+            self._store_memory(key, now, response)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, created, response) VALUES (?, ?, ?)",
+                    (key, now, response),
+                )
+                # Counting rows scans the table: trim every few puts, not each one
+                self._puts += 1
+                if self._puts % self.trim_every == 0:
+                    self._trim_disk()
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+            }
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def _store_memory(self, key: str, created: float, response: str) -> None:
+        self._memory[key] = (created, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _trim_disk(self) -> None:
+        if self.ttl_seconds is not None:
+            self._db.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,)
+            )
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY created ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """
+    Response cache for the entry points, from LLM_CACHE: "memory" (default),
+    "off", or the path of a SQLite file that keeps answers across restarts.
+    LLM_CACHE_TTL is the entry lifetime in seconds (0 = never expire).
+    """
+    setting = os.getenv("LLM_CACHE", "memory").strip()
+    if setting.lower() in ("", "off", "0", "none"):
+        return None
+    ttl = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600))) or None
+    db_path = None if setting.lower() == "memory" else setting
+    return ResponseCache(ttl_seconds=ttl, db_path=db_path)
@@ -0,0 +1,173 @@
+import ast
+import contextvars
+import time
+from typing import Any, Dict, List, Optional
+
+# Budget of the job running in the current task (None outside a job)
+_job_budget: contextvars.ContextVar = contextvars.ContextVar("job_budget", default=None)
+
+# Next-attempt actions
+RETRY = "retry"    # same strategy, context escalated with the failure history
+SWITCH = "switch"  # different fix strategy (full file, alternative instruction)
+STOP = "stop"
+
+# Failures another attempt with the same strategy tends to reproduce
+SWITCH_ERRORS = frozenset({
+    "InvalidStructure", "Timeout", "MemoryError", "RecursionError", "OutputLimit",
+})
+
+SWITCH_HINTS = {
+    "InvalidStructure": "Return the complete program, with all its imports, as plain Python.",
+    "Timeout": "The previous fix did not finish in time: look for infinite loops, "
+               "unbounded recursion or blocking input() calls.",
+    "MemoryError": "The previous fix ran out of memory: avoid building huge structures.",
+    "RecursionError": "The previous fix recursed without end: check the base case, "
+                      "or rewrite the recursion as a loop.",
+    "OutputLimit": "The previous fix printed far too much: look for runaway loops around print().",
+}
+
+
+class JobBudget:
+    """
+    Wall-clock deadline and model-token allowance of one job. Agents charge
+    the tokens of each model call to the budget of the job they run in.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, tokens: Optional[int] = None):
+        self.started = time.monotonic()
+        self.deadline = None if seconds is None else self.started + seconds
+        self.max_tokens = tokens
+        self.tokens_used = 0
+
+    def activate(self) -> None:
+        # Task-local: concurrent jobs each see their own budget
+        _job_budget.set(self)
+
+    def charge(self, tokens: int) -> None:
+        self.tokens_used += tokens
+
+    def remaining_time(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def remaining_tokens(self) -> Optional[int]:
+        return None if self.max_tokens is None else self.max_tokens - self.tokens_used
+
+    def snapshot(self) -> Dict[str, Any]:
+        remaining_time = self.remaining_time()
+        return {
+            "elapsed_seconds": round(time.monotonic() - self.started, 3),
+            "remaining_seconds": None if remaining_time is None else round(remaining_time, 3),
+            "tokens_used": self.tokens_used,
+            "remaining_tokens": self.remaining_tokens(),
+        }
+
+
+def charge_tokens(tokens: int) -> None:
+    budget = _job_budget.get()
+    if budget is not None:
+        budget.charge(tokens)
+
+
+class RetryDecision:
+    __slots__ = ("action", "reason", "context")
+
+    def __init__(self, action: str, reason: str, context: str = ""):
+        self.action = action
+        self.reason = reason
+        self.context = context
+
+
+class RetryScheduler:
+    """
+    Decides after each failed fix attempt whether, and how, to try again:
+    stop when a fix or failure repeats or the next attempt wouldn't fit the
+    remaining time / tokens (estimated from the attempts so far), switch the
+    fix strategy for error classes a plain retry tends to reproduce, and
+    otherwise retry with the failure history added to the context.
+    """
+
+    def __init__(self, max_attempts: int, budget: Optional[JobBudget] = None):
+        self.max_attempts = max_attempts
+        self.budget = budget
+        self.switched = False
+        self._fixes = set()
+        self._failures: List[str] = []
+        self._attempt_seconds: List[float] = []
+        self._attempt_tokens: List[int] = []
+        self._started = 0.0
+        self._tokens_at_start = 0
+
+    def begin_attempt(self) -> None:
+        self._started = time.monotonic()
+        self._tokens_at_start = self.budget.tokens_used if self.budget else 0
+
+    def after_failure(self, attempt: int, code: str, failure: str,
+                      error_type: Optional[str], retry_context: str) -> RetryDecision:
+        """
+        `failure` identifies how the attempt failed (see failure_signature);
+        `retry_context` is the context the next attempt would get by default.
+        """
+        self._attempt_seconds.append(time.monotonic() - self._started)
+        if self.budget is not None:
+            self._attempt_tokens.append(self.budget.tokens_used - self._tokens_at_start)
+
+        fix = _normalize(code)
+        repeated_fix = fix in self._fixes
+        repeated_failure = failure in self._failures
+        self._fixes.add(fix)
+        self._failures.append(failure)
+
+        if repeated_fix:
+            return RetryDecision(STOP, "repeated identical fix")
+        if repeated_failure:
+            return RetryDecision(STOP, "repeated identical failure")
+        if attempt >= self.max_attempts:
+            return RetryDecision(STOP, "max retries reached")
+        shortfall = self._budget_shortfall()
+        if shortfall:
+            return RetryDecision(STOP, shortfall)
+
+        if len(self._failures) > 1:
+            earlier = "\n".join(f"- {item[:300]}" for item in self._failures[:-1])
+            retry_context = f"{retry_context}\nEarlier attempts failed too:\n{earlier}\n"
+        if error_type in SWITCH_ERRORS and not self.switched:
+            self.switched = True
+            return RetryDecision(
+                SWITCH, f"{error_type}: changing fix strategy",
+                f"{retry_context}\n{SWITCH_HINTS[error_type]}\n",
+            )
+        return RetryDecision(RETRY, f"{error_type or 'invalid'}: retrying", retry_context)
+
+    def _budget_shortfall(self) -> Optional[str]:
+        # The next attempt is assumed to cost as much as the dearest one so far
+        if self.budget is None:
+            return None
+        remaining_time = self.budget.remaining_time()
+        if remaining_time is not None and remaining_time < max(self._attempt_seconds):
+            return "deadline: not enough time left for another attempt"
+        remaining_tokens = self.budget.remaining_tokens()
+        if remaining_tokens is not None and self._attempt_tokens \
+                and remaining_tokens < max(self._attempt_tokens):
+            return "token budget: not enough tokens left for another attempt"
+        return None
+
+
+def failure_signature(exec_result: Dict[str, Any], validation: str = "") -> str:
+    """
+    How an attempt failed: the error and the last traceback line, or the
+    validator's answer when the code ran.
+    """
+    if exec_result.get("success"):
+        return f"invalid: {' '.join(validation.split())}"
+    traceback = (exec_result.get("traceback") or "").strip().splitlines()
+    return f"{exec_result.get('error_type')}: {exec_result.get('error')}" + (
+        f" | {traceback[-1]}" if traceback else ""
+    )
+
+
+def _normalize(code: str) -> str:
+    # Formatting and comments don't make a fix different
+    try:
+        return ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError, RecursionError):
+        return " ".join(code.split())
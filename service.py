@@ -0,0 +1,428 @@
+"""
+Headless HTTP service around the Coordinator (stdlib asyncio, no framework).
+
+    python service.py --port 8080 --workers 4 --queue-size 64
+
+    POST   /jobs               {"code": "...", "deadline": 120}  -> 202 {"job_id": ...}
+                               429 + Retry-After when the queue is full
+    GET    /jobs/<id>          status, and the result once finished
+    GET    /jobs/<id>/events   server-sent events: progress, then the result
+    DELETE /jobs/<id>          cancel (queued or running)
+    GET    /health             queue depth and worker count
+    GET    /metrics            Prometheus text (see telemetry.py)
+    GET    /models             per-model latency, cost and fix success rate
+
+Jobs live in this process only, so scale out by running several instances
+behind a load balancer and pinning a job's requests to the instance that
+accepted it (the job id is returned by that instance).
+"""
+import argparse
+import asyncio
+import collections
+import json
+import time
+import uuid
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from coordinator import Coordinator
+from event_loop import run_sync
+from memory import json_default
+from response_cache import cache_from_env
+import telemetry
+
+MAX_BODY_BYTES = 1_000_000
+# Events kept per job for SSE replay (chunk events dominate)
+MAX_JOB_EVENTS = 5000
+SSE_HEARTBEAT_SECONDS = 15.0
+
+TERMINAL_STATES = ("done", "cancelled", "timeout", "failed")
+
+REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    429: "Too Many Requests", 500: "Internal Server Error",
+}
+
+
+def to_json(value: Any) -> str:
+    return json.dumps(value, default=json_default)
+
+
+class ServiceJob:
+    def __init__(self, code: str, deadline: Optional[float]):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.code = code
+        self.deadline = deadline
+        self.status = "queued"
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.events: Deque[Dict[str, Any]] = collections.deque(maxlen=MAX_JOB_EVENTS)
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def finished_state(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait(event)
+
+    def finish(self, status: str, **fields: Any) -> None:
+        self.status = status
+        self.finished = time.time()
+        # Every stream ends with exactly one of these terminal events
+        if status != "done":
+            self.publish({"type": status, **fields})
+
+    def summary(self) -> Dict[str, Any]:
+        info = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "deadline": self.deadline,
+        }
+        if self.error:
+            info["error"] = self.error
+        if self.result is not None:
+            info["result"] = self.result
+        return info
+
+
+class JobManager:
+    """
+    Bounded queue of jobs served by a fixed number of worker tasks.
+    Finished jobs are kept (for polling) up to max_finished, oldest dropped first.
+    """
+
+    def __init__(self, coordinator: Coordinator, workers: int = 4, queue_size: int = 64,
+                 default_deadline: Optional[float] = 300.0, max_finished: int = 1000):
+        self.coordinator = coordinator
+        self.workers = workers
+        self.default_deadline = default_deadline
+        self.max_finished = max_finished
+        # Backpressure counts live queued jobs only: one cancelled while queued
+        # frees its slot at once, though it stays in the queue until a worker skips it
+        self.queue_size = queue_size
+        self.queue: "asyncio.Queue[ServiceJob]" = asyncio.Queue()
+        self._queued = 0
+        self.jobs: Dict[str, ServiceJob] = {}
+        self._finished: Deque[str] = collections.deque()
+        self._workers: List[asyncio.Task] = []
+        self._running = 0
+
+    def start(self) -> None:
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def submit(self, code: str, deadline: Optional[float] = None) -> Optional[ServiceJob]:
+        """
+        Queue a job, or return None when the queue is full (caller sends 429).
+        """
+        if self._queued >= self.queue_size:
+            return None
+        job = ServiceJob(code, deadline if deadline is not None else self.default_deadline)
+        self.queue.put_nowait(job)
+        self._queued += 1
+        self.jobs[job.job_id] = job
+        job.publish({"type": "queued", "position": self._queued})
+        return job
+
+    def cancel(self, job: ServiceJob) -> bool:
+        if job.finished_state:
+            return False
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Still queued: the worker that picks it up will skip it
+            self._queued -= 1
+            job.finish("cancelled")
+            self._retire(job)
+        return True
+
+    def retry_after(self) -> int:
+        # Rough seconds until a queue slot frees up, for the Retry-After header
+        return max(1, self._queued // max(1, self.workers))
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queued,
+            "queue_size": self.queue_size,
+            "jobs": len(self.jobs),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status == "queued":
+                    self._queued -= 1
+                    self._running += 1
+                    try:
+                        await self._run(job)
+                    finally:
+                        self._running -= 1
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: ServiceJob) -> None:
+        job.status = "running"
+        job.started = time.time()
+        job.publish({"type": "started"})
+        job.task = asyncio.ensure_future(
+            self.coordinator.debug_code_async(
+                job.code, listener=job.publish, deadline=job.deadline
+            )
+        )
+        try:
+            job.result = await asyncio.wait_for(job.task, timeout=job.deadline)
+            job.finish("done")
+        except asyncio.TimeoutError:
+            job.error = f"Deadline of {job.deadline}s exceeded"
+            job.finish("timeout", error=job.error)
+        except asyncio.CancelledError:
+            if not job.task.cancelled():
+                # The worker itself is being stopped
+                job.task.cancel()
+                raise
+            job.finish("cancelled")
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.finish("failed", error=job.error)
+        finally:
+            job.task = None
+            self._retire(job)
+
+    def _retire(self, job: ServiceJob) -> None:
+        self._finished.append(job.job_id)
+        while len(self._finished) > self.max_finished:
+            self.jobs.pop(self._finished.popleft(), None)
+
+
+class DebugService:
+    def __init__(self, manager: JobManager):
+        self.manager = manager
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, path, body = request
+            await self._route(method, path, body, writer)
+        except _HttpError as e:
+            self._send_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+            except ConnectionError:
+                pass
+
+    async def _route(self, method: str, path: str, body: bytes,
+                     writer: asyncio.StreamWriter) -> None:
+        parts = [part for part in path.split("?")[0].split("/") if part]
+
+        if parts == ["health"] and method == "GET":
+            return self._send_json(writer, 200, self.manager.health())
+        if parts == ["metrics"] and method == "GET":
+            text = telemetry.REGISTRY.render_prometheus()
+            return self._send(writer, 200, text.encode(), "text/plain; version=0.0.4")
+        if parts == ["models"] and method == "GET":
+            return self._send_json(writer, 200, self.manager.coordinator.model_stats())
+
+        if parts == ["jobs"]:
+            if method != "POST":
+                raise _HttpError(405, "Use POST to submit a job")
+            return self._submit(body, writer)
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.manager.jobs.get(parts[1])
+            if job is None:
+                raise _HttpError(404, "Unknown job")
+            if len(parts) == 3 and parts[2] == "events" and method == "GET":
+                return await self._stream(job, writer)
+            if len(parts) == 2 and method == "GET":
+                return self._send_json(writer, 200, job.summary())
+            if len(parts) == 2 and method == "DELETE":
+                if not self.manager.cancel(job):
+                    raise _HttpError(409, f"Job already {job.status}")
+                return self._send_json(writer, 202, {"job_id": job.job_id, "status": "cancelling"})
+            raise _HttpError(405, "Method not allowed")
+
+        raise _HttpError(404, "Not found")
+
+    def _submit(self, body: bytes, writer: asyncio.StreamWriter) -> None:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise _HttpError(400, "Body must be JSON")
+        code = payload.get("code") if isinstance(payload, dict) else None
+        if not isinstance(code, str) or not code.strip():
+            raise _HttpError(400, 'Body needs a non-empty "code" string')
+        deadline = payload.get("deadline")
+        if deadline is not None and (not isinstance(deadline, (int, float)) or deadline <= 0):
+            raise _HttpError(400, '"deadline" must be a positive number of seconds')
+
+        job = self.manager.submit(code, deadline)
+        if job is None:
+            retry_after = self.manager.retry_after()
+            return self._send_json(
+                writer, 429, {"error": "Queue full, retry later", "retry_after": retry_after},
+                headers={"Retry-After": str(retry_after)},
+            )
+        self._send_json(
+            writer, 202, {"job_id": job.job_id, "status": job.status},
+            headers={"Location": f"/jobs/{job.job_id}"},
+        )
+
+    async def _stream(self, job: ServiceJob, writer: asyncio.StreamWriter) -> None:
+        """
+        Server-sent events: everything published so far, then live events
+        until the job reaches a terminal state.
+        """
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        subscriber: asyncio.Queue = asyncio.Queue()
+        backlog = list(job.events)
+        job.subscribers.add(subscriber)
+        try:
+            for event in backlog:
+                if await self._send_event(writer, event):
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                    await writer.drain()
+                    continue
+                if await self._send_event(writer, event):
+                    return
+        finally:
+            job.subscribers.discard(subscriber)
+
+    @staticmethod
+    async def _send_event(writer: asyncio.StreamWriter, event: Dict[str, Any]) -> bool:
+        # Returns True once the stream's final event has been sent
+        writer.write(f"event: {event['type']}\ndata: {to_json(event)}\n\n".encode())
+        await writer.drain()
+        return event["type"] in ("result",) + TERMINAL_STATES
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise _HttpError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise _HttpError(400, "Invalid Content-Length")
+        if length < 0:
+            raise _HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise _HttpError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path, body
+
+    def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Any,
+                   headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(writer, status, to_json(payload).encode(), "application/json", headers)
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str,
+              headers: Optional[Dict[str, str]] = None) -> None:
+        lines = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def serve(coordinator: Coordinator, host: str = "127.0.0.1", port: int = 8080,
+                workers: int = 4, queue_size: int = 64,
+                default_deadline: Optional[float] = 300.0,
+                ready: Optional[asyncio.Event] = None) -> None:
+    manager = JobManager(coordinator, workers, queue_size, default_deadline)
+    manager.start()
+    server = await asyncio.start_server(DebugService(manager).handle, host, port)
+    print(f"Debugger service on http://{host}:{port} "
+          f"({workers} workers, queue {queue_size})")
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await manager.stop()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the debugger as an HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="jobs processed concurrently")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="jobs waiting beyond this get 429")
+    parser.add_argument("--deadline", type=float, default=300.0,
+                        help="default per-job deadline in seconds (0 = none)")
+    parser.add_argument("--max-retries", type=int, default=2)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    coordinator = Coordinator(
+        max_retries=args.max_retries, max_concurrency=args.workers, cache=cache_from_env()
+    )
+    # The shared loop, so Gemini's async transport is bound to the same loop
+    run_sync(serve(
+        coordinator, args.host, args.port, args.workers, args.queue_size,
+        args.deadline or None,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import ast
+import builtins
+import collections
+import hashlib
+import io
+import itertools
+import random
+import re
+import tokenize
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+SHINGLE_SIZE = 3
+# Mersenne prime for the MinHash permutations (a * x + b) mod P
+_PRIME = (1 << 61) - 1
+_BUILTINS = frozenset(dir(builtins))
+# Nodes whose identifier a near-duplicate may rename (not imports: a different
+# module is a different program)
+_RENAMEABLE = (
+    ast.Name, ast.arg, ast.keyword, ast.Attribute,
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+)
+
+
+def error_signature(report: Optional[Dict[str, Any]]) -> str:
+    """
+    Preflight outcome with names, literals and numbers masked, so the same
+    bug in renamed code has the same signature ("ok" if the code runs).
+    """
+    if not report:
+        return ""
+    if report.get("syntax_error"):
+        return "SyntaxError"
+    execution = report.get("execution") or {}
+    if execution.get("success"):
+        return "ok"
+    message = execution.get("error") or ""
+    message = re.sub(r"'[^']*'|\"[^\"]*\"", "'_'", message)
+    message = re.sub(r"\d+(\.\d+)?", "N", message)
+    return f"{execution.get('error_type')}: {message}"
+
+
+def _labels(tree: ast.AST) -> List[str]:
+    # Pre-order node labels. User-defined names are dropped (renaming one, or
+    # adding a variable, must not shift everything after it) and literals keep
+    # only their type; builtins and attribute names stay, they carry meaning.
+    labels = []
+
+    def visit(node: ast.AST) -> None:
+        label = type(node).__name__
+        if isinstance(node, ast.Constant):
+            label += f":{type(node.value).__name__}"
+        elif isinstance(node, ast.Attribute):
+            label += f":{node.attr}"
+        elif isinstance(node, ast.Name) and node.id in _BUILTINS:
+            label += f":{node.id}"
+        labels.append(label)
+        for child in ast.iter_child_nodes(node):
+            visit(child)
+
+    visit(tree)
+    return labels
+
+
+def shingles(code: str) -> Optional[FrozenSet[int]]:
+    """
+    Hashed k-grams of the normalized AST, or None if the code doesn't parse.
+    """
+    try:
+        labels = _labels(ast.parse(code))
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+    grams = {
+        " ".join(labels[i:i + SHINGLE_SIZE])
+        for i in range(max(1, len(labels) - SHINGLE_SIZE + 1))
+    }
+    return frozenset(_hash64(gram) for gram in grams)
+
+
+def _hash64(text: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class MinHasher:
+    """
+    num_perm-component MinHash signatures: the share of equal components of
+    two signatures estimates the Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)
+        ]
+
+    def signature(self, items: FrozenSet[int]) -> Tuple[int, ...]:
+        return tuple(
+            min((a * item + b) % _PRIME for item in items) for a, b in self.permutations
+        )
+
+
+class FixEntry:
+    __slots__ = ("original", "fixed", "error", "analysis", "shingles", "signature")
+
+    def __init__(self, original: str, fixed: str, error: str, analysis: str,
+                 shingle_set: FrozenSet[int], signature: Tuple[int, ...]):
+        self.original = original
+        self.fixed = fixed
+        self.error = error
+        self.analysis = analysis
+        self.shingles = shingle_set
+        self.signature = signature
+
+
+class SimilarFix:
+    """
+    Nearest stored bug/fix pair for a lookup, with its Jaccard similarity.
+    """
+
+    def __init__(self, entry: FixEntry, similarity: float, same_error: bool):
+        self.entry = entry
+        self.similarity = similarity
+        self.same_error = same_error
+
+    def as_example(self, max_chars: int = 3000) -> str:
+        return (
+            f"A similar bug was fixed before (similarity {self.similarity:.2f}). "
+            "For reference, its buggy and fixed versions:\n"
+            f"BUGGY:\n{self.entry.original[:max_chars]}\n\n"
+            f"FIXED:\n{self.entry.fixed[:max_chars]}\n"
+        )
+
+
+class FixIndex:
+    """
+    Bug/fix pairs of completed jobs, searchable by near-duplicate code: MinHash
+    over normalized-AST shingles with LSH banding, so a lookup only compares
+    against entries that share a band. Bounded; least recently used go first.
+
+    MinHash costs num_perm multiplications per shingle in pure Python, so
+    code longer than max_code_chars is neither stored nor looked up, and a
+    lookup in an empty index returns before hashing anything.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, max_entries: int = 5000,
+                 seed: int = 1, max_code_chars: int = 20_000):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.max_code_chars = max_code_chars
+        self._entries: "collections.OrderedDict[Tuple[int, ...], FixEntry]" = (
+            collections.OrderedDict()
+        )
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], set] = collections.defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, original: str, fixed: str, error: str, analysis: str = "") -> bool:
+        """
+        Store a verified fix. Returns False if `original` doesn't parse or
+        is over max_code_chars.
+        """
+        if len(original) > self.max_code_chars:
+            return False
+        shingle_set = shingles(original)
+        if not shingle_set:
+            return False
+        signature = self.hasher.signature(shingle_set)
+        if signature in self._entries:
+            self._remove(signature)
+        self._entries[signature] = FixEntry(
+            original, fixed, error, analysis, shingle_set, signature
+        )
+        for band in self._bands(signature):
+            self._buckets[band].add(signature)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+        return True
+
+    def nearest(self, code: str, error: str, min_similarity: float = 0.5) -> Optional[SimilarFix]:
+        """
+        Most similar stored bug (same error signature wins ties), if any
+        reaches min_similarity.
+        """
+        if not self._entries or len(code) > self.max_code_chars:
+            return None
+        shingle_set = shingles(code)
+        if not shingle_set:
+            return None
+        candidates = set()
+        for band in self._bands(self.hasher.signature(shingle_set)):
+            candidates.update(self._buckets.get(band, ()))
+
+        best = None
+        best_key = (min_similarity, False)
+        for key in candidates:
+            entry = self._entries[key]
+            similarity = len(shingle_set & entry.shingles) / len(shingle_set | entry.shingles)
+            rank = (similarity, entry.error == error)
+            if rank >= best_key:
+                best, best_key = entry, rank
+        if best is None:
+            return None
+        self._entries.move_to_end(best.signature)
+        return SimilarFix(best, best_key[0], best_key[1])
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def _remove(self, signature: Tuple[int, ...]) -> None:
+        self._entries.pop(signature)
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(signature)
+                if not bucket:
+                    del self._buckets[band]
+
+
+def adapt_fix(original: str, fixed: str, target: str) -> Optional[str]:
+    """
+    Carry a fix over to a near-duplicate. Only when `target` has the same AST
+    as `original` up to renamed identifiers and changed literals; those are
+    then renamed/replaced in `fixed` the same way. None if it doesn't apply.
+    """
+    try:
+        pairs = itertools.zip_longest(ast.walk(ast.parse(original)), ast.walk(ast.parse(target)))
+        names: Dict[str, str] = {}
+        literals: Dict[Tuple[str, str], Any] = {}
+        for old, new in pairs:
+            if old is None or new is None or type(old) is not type(new):
+                return None
+            for field in old._fields:
+                old_value, new_value = getattr(old, field, None), getattr(new, field, None)
+                if isinstance(old_value, list):
+                    if len(old_value) != len(new_value):
+                        return None
+                    continue
+                if isinstance(old_value, ast.AST) or old_value == new_value:
+                    continue
+                if isinstance(old, _RENAMEABLE) and isinstance(old_value, str) \
+                        and isinstance(new_value, str):
+                    mapping, key = names, old_value
+                elif isinstance(old, ast.Constant) and field == "value" \
+                        and type(old_value) is type(new_value):
+                    mapping, key = literals, (type(old_value).__name__, repr(old_value))
+                else:
+                    return None
+                if mapping.setdefault(key, new_value) != new_value:
+                    return None
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+    if len(set(names.values())) != len(names):
+        return None
+    if not names and not literals:
+        return fixed
+    return _rewrite(fixed, names, literals)
+
+
+def _rewrite(code: str, names: Dict[str, str],
+             literals: Dict[Tuple[str, str], Any]) -> Optional[str]:
+    lines = code.splitlines(keepends=True)
+    edits = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            (row, start), (end_row, end) = token.start, token.end
+            if row != end_row:
+                continue
+            if token.type == tokenize.NAME and token.string in names:
+                edits.append((row, start, end, names[token.string]))
+            elif token.type in (tokenize.NUMBER, tokenize.STRING):
+                try:
+                    value = ast.literal_eval(token.string)
+                except (SyntaxError, ValueError):
+                    continue
+                key = (type(value).__name__, repr(value))
+                if key in literals:
+                    edits.append((row, start, end, repr(literals[key])))
+    except (tokenize.TokenError, IndentationError):
+        return None
+
+    # Right to left, so earlier columns on the same line stay valid
+    for row, start, end, text in sorted(edits, reverse=True):
+        line = lines[row - 1]
+        lines[row - 1] = line[:start] + text + line[end:]
+    return "".join(lines)
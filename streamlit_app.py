@@ -1,7 +1,14 @@
 import os
 import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
 import streamlit as st
 from coordinator import Coordinator
+from event_loop import run_sync
+from examples import EXAMPLES
+from response_cache import cache_from_env
+from service import JobManager
 
 st.set_page_config(
     page_title="AI Code Debugger",
@@ -19,41 +26,84 @@ st.markdown(
     "4. Validate the result\n"
 )
 
-# Check API key
-if "GEMINI_API_KEY" not in os.environ:
+# Check API key (not needed for the offline fake/replay backends)
+if os.getenv("LLM_BACKEND", "gemini").lower() in ("gemini", "record") and "GEMINI_API_KEY" not in os.environ:
     st.error("GEMINI_API_KEY not found in environment. Check your .env or environment variables.")
     st.stop()
 
+# Shared worker pool: jobs queued by every session run on the background loop
+WORKERS = int(os.getenv("STREAMLIT_WORKERS", "4"))
+QUEUE_SIZE = int(os.getenv("STREAMLIT_QUEUE_SIZE", "32"))
+JOB_DEADLINE = float(os.getenv("STREAMLIT_JOB_DEADLINE", "300"))
+# Seconds between progress refreshes of a running job
+POLL_SECONDS = 0.5
+HISTORY_PAGE_SIZE = 20
+
+
+@st.cache_resource
+def get_coordinator() -> Coordinator:
+    # One Coordinator (agents, model client, cache) for all sessions and reruns
+    return Coordinator(max_retries=2, max_concurrency=WORKERS, cache=cache_from_env())
+
+
+async def _on_loop(fn: Callable[..., Any], *args: Any) -> Any:
+    # JobManager and its jobs belong to the shared loop; touch them only there
+    return fn(*args)
+
+
+@st.cache_resource
+def get_manager() -> JobManager:
+    # Process-wide queue + workers, shared by every session
+    manager = run_sync(_on_loop(
+        JobManager, get_coordinator(), WORKERS, QUEUE_SIZE, JOB_DEADLINE or None
+    ))
+    run_sync(_on_loop(manager.start))
+    return manager
+
+
+def submit_job(code: str) -> Optional[str]:
+    job = run_sync(_on_loop(get_manager().submit, code))
+    return None if job is None else job.job_id
+
+
+def cancel_job(job_id: str) -> None:
+    manager = get_manager()
+
+    def cancel() -> None:
+        job = manager.jobs.get(job_id)
+        if job is not None:
+            manager.cancel(job)
+
+    run_sync(_on_loop(cancel))
+
+
+def job_snapshot(job_id: str) -> Optional[Dict[str, Any]]:
+    # Status, events so far and result, copied on the loop so they are consistent
+    manager = get_manager()
+
+    def snapshot() -> Optional[Dict[str, Any]]:
+        job = manager.jobs.get(job_id)
+        if job is None:
+            return None
+        return {"status": job.status, "events": list(job.events),
+                "result": job.result, "error": job.error, "code": job.code}
+
+    return run_sync(_on_loop(snapshot))
+
+
 # Sidebar examples
 with st.sidebar:
     st.header("Examples")
     example_choice = st.selectbox(
         "Choose example:",
-        ["Custom", "Syntax Error", "Logic Error", "Runtime Error"],
+        ["Custom", *EXAMPLES],
     )
 
-    examples = {
-        "Syntax Error": """def greet(name)
-    print("Hello", name)
-
-greet("Santhosh")""",
-        "Logic Error": """def double(x):
-    return x + x + 1  # incorrect
-
-print(double(5))  # should be 10""",
-        "Runtime Error": """def safe_divide(a, b):
-    return a / b
-
-nums = [10, 5, 0]
-for n in nums:
-    print(safe_divide(10, n))""",
-    }
-
 # Main input area
 st.subheader("💻 Buggy Python Code")
 
 if example_choice != "Custom":
-    default_code = examples[example_choice]
+    default_code = EXAMPLES[example_choice]
 else:
     default_code = """# Paste your buggy Python code here
 def your_function():
@@ -66,119 +116,189 @@ code_input = st.text_area(
     height=240,
 )
 
-col1, col2 = st.columns([1, 1])
-with col1:
-    run_btn = st.button("🚀 Debug Code", type="primary", use_container_width=True)
-with col2:
-    if st.button("🔄 Reset", use_container_width=True):
-        st.rerun()
+def render_progress(events: List[Dict[str, Any]], status: str) -> None:
+    # Fold the job's events so far into the live view
+    phase, analysis_text, fix_texts, execution = None, "", {}, None
+    for event in events:
+        kind = event["type"]
+        if kind == "phase_start":
+            phase = event["phase"]
+        elif kind == "analysis_chunk":
+            analysis_text += event["text"]
+        elif kind == "fix_chunk":
+            fix_texts[event["attempt"]] = fix_texts.get(event["attempt"], "") + event["text"]
+        elif kind == "execution":
+            execution = event
 
-if run_btn:
-    if not code_input.strip():
-        st.warning("Please paste some Python code first.")
+    if status == "queued":
+        label = "Waiting for a free worker..."
     else:
-        coordinator = Coordinator(max_retries=2)
+        label = f"Running: {phase}..." if phase else "Running multi-agent debugging..."
+    with st.status(label, expanded=True):
+        st.markdown("**🔍 Analysis (live)**")
+        st.markdown(analysis_text or "_waiting..._")
+        st.markdown("**✨ Fix (live)**")
+        if fix_texts:
+            st.code(list(fix_texts.values())[-1], language="python")
+        if execution is not None:
+            run = execution["result"]
+            if run["success"]:
+                st.success(f"Attempt {execution['attempt']}: ran successfully.")
+            else:
+                st.warning(f"Attempt {execution['attempt']}: {run.get('error')}")
 
-        with st.status("Running multi-agent debugging...", expanded=False) as status:
-            result = coordinator.debug_code(code_input)
 
-            if result["success"]:
-                status.update(
-                    label="✅ Debugging Complete - Code Fixed!",
-                    state="complete",
-                )
-            else:
-                status.update(
-                    label="❌ Debugging Failed",
-                    state="error",
-                )
+def render_result(code: str, result: Dict[str, Any]) -> None:
+    # Summary section
+    st.subheader("📊 Summary")
 
-        # Summary section
-        st.subheader("📊 Summary")
+    if result["success"]:
+        st.success(f"Code fixed successfully in **{result['attempts']}** attempt(s).")
+    elif result.get("error"):
+        st.error(
+            f"The model could not be reached: {result['error']}. "
+            "This is a quota/network problem, not a problem with your code; try again shortly."
+        )
+    else:
+        st.error(
+            f"Could not fully fix the code after **{result['attempts']}** attempt(s). "
+            "You may need to review the last suggested fix manually."
+        )
+        if result.get("stop_reason"):
+            st.caption(f"Stopped: {result['stop_reason']}")
 
-        if result["success"]:
-            st.success(f"Code fixed successfully in **{result['attempts']}** attempt(s).")
-        else:
-            st.error(
-                f"Could not fully fix the code after **{result['attempts']}** attempt(s). "
-                "You may need to review the last suggested fix manually."
+    # Vertical: Original then Fixed
+    st.subheader("🐛 Original Code (Buggy)")
+    st.code(code, language="python")
+
+    st.subheader("✨ Fixed Code")
+    st.code(result.get("fixed_code", "# No fixed code generated"), language="python")
+
+    # Bug analysis
+    with st.expander("🔍 Bug Analysis", expanded=False):
+        st.markdown(result.get("analysis", "No analysis available."))
+
+    # Validation report (human-readable)
+    with st.expander("🧪 Validation Report", expanded=False):
+        raw_validation = result.get("validation", "")
+        try:
+            cleaned = (
+                raw_validation.replace("```json", "")
+                .replace("```", "")
+                .strip()
             )
+            data = json.loads(cleaned)
+            status_txt = data.get("validation", "UNKNOWN")
+            reason = data.get("reason", "")
+            remaining = data.get("remaining_issues", [])
+            confidence = data.get("confidence", "Unknown")
 
-        # Vertical: Original then Fixed
-        st.subheader("🐛 Original Code (Buggy)")
-        st.code(code_input, language="python")
-
-        st.subheader("✨ Fixed Code")
-        st.code(result.get("fixed_code", "# No fixed code generated"), language="python")
-
-        # Bug analysis
-        with st.expander("🔍 Bug Analysis", expanded=False):
-            st.markdown(result.get("analysis", "No analysis available."))
-
-        # Validation report (human-readable)
-        with st.expander("🧪 Validation Report", expanded=False):
-            raw_validation = result.get("validation", "")
-            try:
-                cleaned = (
-                    raw_validation.replace("```json", "")
-                    .replace("```", "")
-                    .strip()
-                )
-                data = json.loads(cleaned)
-                status_txt = data.get("validation", "UNKNOWN")
-                reason = data.get("reason", "")
-                remaining = data.get("remaining_issues", [])
-                confidence = data.get("confidence", "Unknown")
-
-                st.write(f"**Validation:** {status_txt}  _(confidence: {confidence})_")
-                if reason:
-                    st.write(f"**Reason:** {reason}")
-                if remaining:
-                    st.write("**Remaining Issues:**")
-                    for issue in remaining:
-                        st.write(f"- {issue}")
-                else:
-                    st.write("No remaining issues reported.")
-
-            except Exception:
-                if raw_validation:
-                    st.write("Raw validation response:")
-                    st.code(raw_validation)
-                else:
-                    st.info("No validation details available.")
-
-        # Execution output
-        exec_result = result.get("execution_result", {})
-        with st.expander("⚙️ Execution Output", expanded=False):
-            if exec_result.get("success"):
-                st.write("**Status:** Success")
+            st.write(f"**Validation:** {status_txt}  _(confidence: {confidence})_")
+            if reason:
+                st.write(f"**Reason:** {reason}")
+            if remaining:
+                st.write("**Remaining Issues:**")
+                for issue in remaining:
+                    st.write(f"- {issue}")
             else:
-                st.write("**Status:** Failed")
+                st.write("No remaining issues reported.")
 
-            st.write("**Output:**")
-            out = exec_result.get("output", "")
-            st.code(out if out else "(no output)")
+        except Exception:
+            if raw_validation:
+                st.write("Raw validation response:")
+                st.code(raw_validation)
+            else:
+                st.info("No validation details available.")
 
-            if exec_result.get("error"):
-                st.write("**Error:**")
-                st.error(exec_result.get("error"))
+    # Execution output
+    exec_result = result.get("execution_result", {})
+    with st.expander("⚙️ Execution Output", expanded=False):
+        if exec_result.get("success"):
+            st.write("**Status:** Success")
+        else:
+            st.write("**Status:** Failed")
 
-            if exec_result.get("error_type"):
-                st.write("**Error Type:**")
-                st.code(exec_result.get("error_type"))
+        st.write("**Output:**")
+        out = exec_result.get("output", "")
+        st.code(out if out else "(no output)")
 
-        # Agent history (structured)
-        history = result.get("history", [])
-        with st.expander("🗂️ Agent History (Debug View)", expanded=False):
-            if not history:
-                st.info("No history recorded.")
-            else:
-                for entry in history:
-                    st.markdown(f"### {entry['agent']} — {entry['phase']}")
-                    st.write(f"**Status:** {entry['status']}")
-                    st.write(f"**Summary:** {entry['summary']}")
-                    if entry.get("extra"):
-                        st.write("**Details:**")
-                        st.json(entry["extra"])
-                    st.write(f"_Timestamp: {entry['timestamp']}_")
-                    st.markdown("---")
+        if exec_result.get("error"):
+            st.write("**Error:**")
+            st.error(exec_result.get("error"))
+
+        if exec_result.get("error_type"):
+            st.write("**Error Type:**")
+            st.code(exec_result.get("error_type"))
+
+    render_history(result.get("history", []))
+
+
+def render_history(history) -> None:
+    # Paged: long histories render one page of entries per run
+    with st.expander("🗂️ Agent History (Debug View)", expanded=False):
+        if not history:
+            st.info("No history recorded.")
+            return
+        pages = (len(history) + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+        page = 1
+        if pages > 1:
+            page = int(st.number_input(
+                f"Page (of {pages}, {len(history)} entries)",
+                min_value=1, max_value=pages, value=1, key="history_page",
+            ))
+        first = (page - 1) * HISTORY_PAGE_SIZE
+        for entry in history[first:first + HISTORY_PAGE_SIZE]:
+            st.markdown(f"### {entry['agent']} — {entry['phase']}")
+            st.write(f"**Status:** {entry['status']}")
+            st.write(f"**Summary:** {entry['summary']}")
+            if entry.get("extra"):
+                st.write("**Details:**")
+                st.json(entry["extra"], expanded=False)
+            st.write(f"_Timestamp: {entry['timestamp']}_")
+            st.markdown("---")
+
+
+job_id = st.session_state.get("job_id")
+
+col1, col2, col3 = st.columns([1, 1, 1])
+with col1:
+    run_btn = st.button("🚀 Debug Code", type="primary", use_container_width=True)
+with col2:
+    cancel_btn = st.button("⏹️ Cancel", use_container_width=True, disabled=job_id is None)
+with col3:
+    reset_btn = st.button("🔄 Reset", use_container_width=True)
+
+if (cancel_btn or reset_btn or run_btn) and job_id is not None:
+    # A session follows one job at a time; stop the one it is leaving
+    cancel_job(job_id)
+if reset_btn:
+    st.session_state.pop("job_id", None)
+    st.session_state.pop("history_page", None)
+    st.rerun()
+
+if run_btn:
+    if not code_input.strip():
+        st.warning("Please paste some Python code first.")
+    else:
+        job_id = submit_job(code_input)
+        if job_id is None:
+            st.warning("All workers are busy and the queue is full. Please try again shortly.")
+        st.session_state["job_id"] = job_id
+        st.session_state.pop("history_page", None)
+
+job_id = st.session_state.get("job_id")
+if job_id is not None:
+    snapshot = job_snapshot(job_id)
+    if snapshot is None:
+        st.info("This job is no longer available. Please run it again.")
+    elif snapshot["status"] in ("queued", "running"):
+        render_progress(snapshot["events"], snapshot["status"])
+        # The job runs on the shared pool; this run only redraws its progress
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+    elif snapshot["status"] == "done":
+        render_result(snapshot["code"], snapshot["result"])
+    elif snapshot["status"] == "cancelled":
+        st.info("Debugging was cancelled.")
+    else:
+        st.error(f"Debugging stopped ({snapshot['status']}): {snapshot['error']}")
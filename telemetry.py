@@ -0,0 +1,236 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Off by default: span() then returns a shared no-op object, so the
+# instrumented call sites cost one global lookup and a method call.
+_enabled = os.getenv("DEBUGGER_TELEMETRY", "") == "1"
+
+# Spans of the job running in the current task (None outside a traced job)
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("debugger_trace", default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span attributes that become metric labels (kept low-cardinality)
+LABEL_ATTRS = ("role", "phase", "outcome", "model")
+
+# Numeric span attributes that are summed into counters
+COUNTED_ATTRS = (
+    "prompt_chars", "response_chars", "prompt_tokens", "response_tokens", "total_tokens",
+)
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class MetricsRegistry:
+    """
+    In-process latency histograms and counters, keyed by metric name + labels.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # name -> labels -> [bucket counts..., sum, count]
+        self._histograms: Dict[str, Dict[Tuple, List[float]]] = {}
+        # name -> labels -> value
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+
+    def observe(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            row = series.get(key)
+            if row is None:
+                row = series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def inc(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe_span(self, name: str, duration: float, attrs: Dict[str, Any]) -> None:
+        labels = {k: attrs[k] for k in LABEL_ATTRS if attrs.get(k) is not None}
+        self.observe(f"debugger_{name}_seconds", duration, labels)
+
+        counter_labels = {k: v for k, v in labels.items() if k != "outcome"}
+        for attr in COUNTED_ATTRS:
+            value = attrs.get(attr)
+            if value:
+                metric = f"debugger_{name}_{attr}"
+                if not metric.endswith("_total"):
+                    metric += "_total"
+                self.inc(metric, value, counter_labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self) -> str:
+        """
+        Prometheus text exposition format (histograms + counters).
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, row in sorted(series.items()):
+                    for bound, count in zip(self.buckets, row):
+                        lines.append(f"{name}_bucket{_labels(key, le=bound)} {count:g}")
+                    lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {row[-1]:g}")
+                    lines.append(f"{name}_sum{_labels(key)} {row[-2]:.6f}")
+                    lines.append(f"{name}_count{_labels(key)} {row[-1]:g}")
+
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        # Write-then-rename so a scraper (node_exporter textfile) never sees half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+def _labels(key: Tuple, **extra: Any) -> str:
+    pairs = list(key) + [(k, str(v)) for k, v in extra.items()]
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Span:
+    """
+    Timed section. Use as a context manager, or start()/finish() when the
+    beginning and end live in different places (e.g. pipeline phases).
+    """
+
+    __slots__ = ("name", "attrs", "start_time")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start_time = 0.0
+
+    def start(self) -> "Span":
+        self.start_time = time.perf_counter()
+        return self
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def finish(self, **attrs: Any) -> None:
+        duration = time.perf_counter() - self.start_time
+        self.attrs.update(attrs)
+        self.attrs.setdefault("outcome", "ok")
+        REGISTRY.observe_span(self.name, duration, self.attrs)
+
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append({
+                "name": self.name,
+                "start": self.start_time,
+                "duration": duration,
+                **self.attrs,
+            })
+
+    def __enter__(self) -> "Span":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None and "outcome" not in self.attrs:
+            cancelled = issubclass(exc_type, asyncio.CancelledError)
+            self.attrs["outcome"] = "cancelled" if cancelled else "error"
+        self.finish()
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def start(self) -> "_NoopSpan":
+        return self
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def finish(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs: Any):
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def start_trace() -> Optional[List[Dict[str, Any]]]:
+    """
+    Begin collecting spans for the job running in the current task.
+    """
+    if not _enabled:
+        return None
+    trace: List[Dict[str, Any]] = []
+    _current_trace.set(trace)
+    return trace
+
+
+def summarize_trace(trace: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Per-job trace for the result dict: spans with start offsets relative to
+    the first span, plus token/char totals and time per span name.
+    """
+    origin = min((s["start"] for s in trace), default=0.0)
+    spans = [dict(s, start=round(s["start"] - origin, 6)) for s in trace]
+
+    totals: Dict[str, float] = {}
+    time_by_name: Dict[str, float] = {}
+    for s in trace:
+        time_by_name[s["name"]] = time_by_name.get(s["name"], 0.0) + s["duration"]
+        for attr in COUNTED_ATTRS:
+            if s.get(attr):
+                totals[attr] = totals.get(attr, 0) + s[attr]
+
+    return {"spans": spans, "totals": totals, "time_by_span": time_by_name}
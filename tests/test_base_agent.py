@@ -0,0 +1,33 @@
+import asyncio
+
+from base_agent import BaseAgent, start_job_memory
+from llm_backends import FakeBackend
+
+
+def test_concurrent_jobs_keep_separate_agent_memory():
+    prompts = []
+
+    def respond(prompt):
+        prompts.append(prompt)
+        return "answer to " + prompt.rsplit("TASK:\n", 1)[1]
+
+    agent = BaseAgent("Tester", "Answer.", backend=FakeBackend(respond))
+
+    async def job(name):
+        start_job_memory()
+        await agent.think_async(f"{name} first", use_cache=False)
+        await asyncio.sleep(0)
+        await agent.think_async(f"{name} second", use_cache=False)
+
+    async def main():
+        await asyncio.gather(job("alpha"), job("beta"))
+
+    asyncio.run(main())
+
+    second = {p.rsplit("TASK:\n", 1)[1]: p for p in prompts if p.endswith("second")}
+    assert "answer to alpha first" in second["alpha second"]
+    assert "beta" not in second["alpha second"].split("TASK:")[0]
+    assert "answer to beta first" in second["beta second"]
+    assert "alpha" not in second["beta second"].split("TASK:")[0]
+    # Outside a job the agent's own memory is untouched
+    assert not agent.memory
@@ -0,0 +1,40 @@
+import json
+
+import batch
+
+BUGGY = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+
+
+def test_items_come_from_directories_and_jsonl(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "b.py").write_text("b = 1\n")
+    (tmp_path / "a.py").write_text("a = 1\n")
+    (tmp_path / "notes.txt").write_text("skip me")
+    jsonl = tmp_path / "items.jsonl"
+    jsonl.write_text(json.dumps({"id": "x", "code": "x = 1"}) + "\n\n"
+                     + json.dumps({"code": "y = 1"}) + "\n")
+
+    assert [item_id for item_id, _ in batch.iter_items(str(tmp_path))] == ["a.py", "pkg/b.py"]
+    assert list(batch.iter_items(str(jsonl))) == [("x", "x = 1"), ("3", "y = 1")]
+
+
+def test_batch_run_streams_one_line_per_item_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setenv("LLM_CACHE", "off")
+    source = tmp_path / "snippets"
+    source.mkdir()
+    for i in range(4):
+        (source / f"s{i}.py").write_text(BUGGY.replace("add", f"add{i}"))
+    output = tmp_path / "results.jsonl"
+    argv = [str(source), "-o", str(output), "--workers", "2", "--llm-concurrency", "2",
+            "--checkpoint-db", str(tmp_path / "batch.db"), "--progress", "0"]
+
+    summary = batch.main(argv)
+
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(line["id"] for line in lines) == [f"s{i}.py" for i in range(4)]
+    assert summary["done"] == 4 and summary["errors"] == 0
+    assert all(line["history"][0]["agent"] == "Preflight" for line in lines)
+
+    rerun = batch.main(argv)
+    assert rerun["from_checkpoint"] == 4
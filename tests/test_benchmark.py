@@ -0,0 +1,40 @@
+import json
+
+import benchmark
+
+
+def test_percentiles_use_nearest_rank():
+    stats = benchmark.summarize([float(v) for v in range(1, 101)])
+
+    assert stats["count"] == 100 and stats["mean"] == 50.5
+    assert (stats["p50"], stats["p95"], stats["p99"], stats["max"]) == (50, 95, 99, 100)
+    assert benchmark.summarize([])["p99"] == 0.0
+
+
+def test_phase_durations_sum_phase_spans_only():
+    trace = {"spans": [
+        {"name": "phase", "phase": "Fix", "duration": 0.5},
+        {"name": "phase", "phase": "Fix", "duration": 0.25},
+        {"name": "phase", "phase": "Unknown", "duration": 9.0},
+        {"name": "llm_call", "phase": "Analysis", "duration": 9.0},
+    ]}
+
+    durations = benchmark.phase_durations(trace)
+    assert durations["Fix"] == 0.75 and durations["Analysis"] == 0.0
+    assert benchmark.phase_durations(None) == dict.fromkeys(benchmark.PHASES, 0.0)
+
+
+def test_offline_run_writes_a_report(tmp_path):
+    output = tmp_path / "bench.json"
+
+    report = benchmark.main([
+        "--jobs", "4", "--users", "2", "--latency", "0", "--exec-runs", "0",
+        "--fused", "compare", "--output", str(output),
+    ])
+
+    assert json.loads(output.read_text())["meta"]["jobs"] == 4
+    assert report["end_to_end"]["count"] + report["reused_jobs"] == 4
+    assert report["llm_calls"]["mean"] > 0
+    assert set(report["modes"]) == {"two_call", "fused"}
+    assert report["models"]["fake"]["calls"] > 0
+    assert "met" in report["cold_start"]
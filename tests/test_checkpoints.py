@@ -0,0 +1,47 @@
+from checkpoints import CheckpointStore
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from rate_limit import TransportError
+
+BUGGY = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+
+
+def test_store_discards_steps_of_a_changed_input(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.db"))
+    assert store.begin("job", "hash-1") is None
+    store.save("job", "analysis", "saved analysis")
+    assert store.load("job", "analysis") == "saved analysis"
+
+    assert store.begin("job", "hash-2") is None
+    assert store.load("job", "analysis") is None
+
+    store.finish("job", {"success": True})
+    assert store.begin("job", "hash-2") == {"success": True}
+    assert store.stats() == {"done": 1, "running": 0, "steps": 0}
+
+
+def recording(prompts, fixer_down=False):
+    def respond(prompt):
+        prompts.append(prompt)
+        if fixer_down and "Code Fixer" in prompt:
+            raise TransportError("quota", status=429)
+        return FakeBackend._canned_reply(prompt)
+    return FakeBackend(respond)
+
+
+def test_interrupted_job_resumes_after_its_completed_steps(tmp_path):
+    db = str(tmp_path / "checkpoints.db")
+    prompts = []
+    first = Coordinator(backend=recording(prompts, fixer_down=True), checkpoint_db=db,
+                        similar_fixes=False).debug_code(BUGGY)
+    assert first["error"] and any("Code Analyzer" in p for p in prompts)
+
+    prompts.clear()
+    resumed = Coordinator(backend=recording(prompts), checkpoint_db=db, similar_fixes=False)
+    events = list(resumed.debug_code_stream(BUGGY))
+
+    # The analysis comes from the store; only the interrupted fix step reruns
+    assert {"type": "checkpoint", "step": "analysis"} in events
+    assert not any("Code Analyzer" in p for p in prompts)
+    assert any("Code Fixer" in p for p in prompts)
+    assert events[-1]["result"]["analysis"].startswith("BUG ANALYSIS")
@@ -0,0 +1,81 @@
+from chunking import UnitMemo, failing_units, split_units, stitch
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+
+HELPERS = "".join(
+    f"def helper_{i}(x):\n    return x + {i}\n\n\n" for i in range(10)
+)
+SOURCE = (
+    "import math\n\n\n"
+    + HELPERS
+    + "def ratio(a, b):\n    return a / b\n\n\n"
+    + "print(helper_3(1), ratio(1, 0))\n"
+)
+FIXED_RATIO = "def ratio(a, b):\n    return a / b if b else math.inf"
+
+
+def test_units_traceback_lookup_and_stitching():
+    units = split_units(SOURCE)
+    assert [u.name for u in units][-1] == "ratio" and len(units) == 11
+    ratio = units[-1]
+
+    traceback = f"Traceback (most recent call last):\n  line {ratio.start + 1}, in ratio\n"
+    assert failing_units(units, traceback) == [ratio]
+
+    stitched = stitch(SOURCE, units, {"ratio": FIXED_RATIO})
+    assert FIXED_RATIO in stitched and stitched.count("def helper_") == 10
+    assert stitch(SOURCE, units, {}) == SOURCE
+
+
+def test_fingerprints_ignore_formatting_and_memo_learns_changed_units():
+    moved = split_units("\n\n# note\ndef ratio(a,  b):\n    return a / b\n")[0]
+    assert moved.fingerprint == split_units(SOURCE)[-1].fingerprint
+
+    memo = UnitMemo()
+    assert memo.learn(SOURCE, SOURCE.replace("def ratio(a, b):\n    return a / b",
+                                             FIXED_RATIO)) == 1
+    assert memo.fix_for(moved) == FIXED_RATIO
+
+
+def test_large_file_is_debugged_one_failing_unit_at_a_time():
+    prompts = []
+
+    def respond(prompt):
+        prompts.append(prompt)
+        if "Code Fixer" in prompt:
+            return FIXED_RATIO
+        return FakeBackend._canned_reply(prompt)
+
+    coordinator = Coordinator(backend=FakeBackend(respond), chunk_min_lines=20,
+                              similar_fixes=False)
+    result = coordinator.debug_code(SOURCE)
+
+    assert result["success"]
+    assert any(e["phase"] == "Analysis (ratio)" for e in result["history"])
+    assert result["fixed_code"].count("def helper_") == 10
+    assert FIXED_RATIO in result["fixed_code"]
+    # Only the failing unit's body went to the agents; the rest as signatures
+    assert prompts and not any("return x + 3" in p for p in prompts)
+
+
+def test_resubmitted_file_reuses_fixes_for_unchanged_definitions():
+    prompts = []
+
+    def respond(prompt):
+        prompts.append(prompt)
+        if "Code Fixer" in prompt:
+            return FIXED_RATIO
+        return FakeBackend._canned_reply(prompt)
+
+    coordinator = Coordinator(backend=FakeBackend(respond), chunk_min_lines=20,
+                              similar_fixes=False)
+    assert coordinator.debug_code(SOURCE)["success"]
+
+    prompts.clear()
+    edited = SOURCE.replace("return x + 0", "return x")
+    result = coordinator.debug_code(edited)
+
+    assert result["success"] and FIXED_RATIO in result["fixed_code"]
+    assert "def helper_0(x):\n    return x\n" in result["fixed_code"]
+    assert result["history"][1]["phase"] == "Reuse"
+    assert not any("Code Fixer" in p or "Code Analyzer" in p for p in prompts)
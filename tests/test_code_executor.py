@@ -0,0 +1,135 @@
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from code_executor import BoundedStream, OutputLimitExceeded, SandboxPool, ZygotePool, resource
+
+
+def test_bounded_stream_keeps_head_and_tail_and_enforces_the_limit():
+    stream = BoundedStream(keep=5, limit=30)
+    for i in range(10):
+        stream.write(f"{i}\n")
+
+    assert stream.getvalue() == "0\n1\n2\n... [10 characters truncated] ...\n\n8\n9\n"
+    with pytest.raises(OutputLimitExceeded):
+        stream.write("x" * 20)
+
+
+def test_pool_kills_runaway_snippets_and_keeps_serving():
+    pool = SandboxPool(size=1)
+    limits = dict(cpu_seconds=10, max_output_chars=100, output_limit=1000)
+    try:
+        hung = pool.run("import time\ntime.sleep(30)", timeout=0.5, **limits)
+        crashed = pool.run("import os\nos._exit(3)", timeout=10, **limits)
+        chatty = pool.run("while True:\n    print('spam')", timeout=10, **limits)
+        after = pool.run("print('next')", timeout=10, **limits)
+    finally:
+        pool.close()
+
+    assert hung["error_type"] == "Timeout"
+    assert crashed["error_type"] == "WorkerCrashed" and "exit code 3" in crashed["error"]
+    assert chatty["error_type"] == "OutputLimit" and len(chatty["output"]) < 300
+    assert after["success"] and after["output"] == "next"
+
+
+@pytest.mark.skipif(resource is None, reason="needs RLIMIT_CPU")
+def test_cpu_limit_kill_reports_cpu_limit():
+    pool = SandboxPool(size=1)
+    try:
+        result = pool.run("while True:\n    pass\n", timeout=30, cpu_seconds=1,
+                          max_output_chars=1000, output_limit=10000)
+    finally:
+        pool.close()
+
+    assert result["error_type"] == "Timeout"
+    assert "CPU time limit of 1s exceeded" in result["error"]
+
+
+@pytest.mark.parametrize("pool_class", [
+    SandboxPool,
+    pytest.param(ZygotePool, marks=pytest.mark.skipif(not hasattr(os, "fork"),
+                                                      reason="needs fork()")),
+])
+def test_cancelled_run_frees_its_slot(pool_class):
+    pool = pool_class(size=1)
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    try:
+        started = time.monotonic()
+        result = pool.run("while True:\n    pass\n", timeout=30, cpu_seconds=30,
+                          max_output_chars=1000, output_limit=10000, cancel=cancel)
+        assert time.monotonic() - started < 5
+        after = pool.run("print('next')", timeout=10, cpu_seconds=10,
+                         max_output_chars=1000, output_limit=10000)
+    finally:
+        pool.close()
+
+    assert result["error_type"] == "Cancelled"
+    assert after["success"] and after["output"] == "next"
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_zygote_runs_are_isolated_and_start_warm():
+    pool = ZygotePool(size=2, preload=["json"])
+    limits = dict(timeout=10, cpu_seconds=10, max_output_chars=1000, output_limit=10000)
+    try:
+        tamper = pool.run("import json, sys\njson.dumps = None\nsys.tampered = True\nX = 1",
+                          **limits)
+        check = pool.run(
+            "import sys\nwarm = 'json' in sys.modules\nimport json\n"
+            "print(warm, json.dumps([1]), hasattr(sys, 'tampered'), 'X' in globals())",
+            **limits,
+        )
+
+        # Runs overlap up to `size`
+        results = []
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                pool.run("import time\ntime.sleep(0.5)", **limits)))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        hung = pool.run("while True:\n    pass", timeout=0.3, cpu_seconds=10,
+                        max_output_chars=1000, output_limit=10000)
+    finally:
+        pool.close()
+
+    assert tamper["success"]
+    assert check["output"] == "True [1] False False"
+    assert all(r["success"] for r in results) and elapsed < 0.95
+    assert hung["error_type"] == "Timeout"
+
+
+@pytest.mark.parametrize("pool_class", [
+    SandboxPool,
+    pytest.param(ZygotePool, marks=pytest.mark.skipif(not hasattr(os, "fork"),
+                                                      reason="needs fork()")),
+])
+def test_pools_start_under_a_script_main(pool_class, tmp_path, monkeypatch):
+    # As under `streamlit run`: __main__ is the page script, which a spawned
+    # child would otherwise re-run before serving
+    page = tmp_path / "page.py"
+    page.write_text("raise SystemExit('page re-run in sandbox process')\n")
+    main = types.ModuleType("__main__")
+    main.__file__ = str(page)
+    monkeypatch.setitem(sys.modules, "__main__", main)
+
+    pool = pool_class(size=1)
+    try:
+        result = pool.run("print('ok')", timeout=10, cpu_seconds=10,
+                          max_output_chars=1000, output_limit=10000)
+    finally:
+        pool.close()
+
+    assert sys.modules["__main__"] is main
+    assert result["success"] and result["output"] == "ok"
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import time
+
+from code_executor import CodeExecutor
+from coordinator import Coordinator, DebugJob
+from fixer_agent import FIX_STRATEGIES
+from llm_backends import FakeBackend
+from memory import HistoryView, Memory, json_default
+from test_llm_backends import OldSdkModel, old_sdk_backend
+
+BUGGY = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+
+
+def test_result_history_is_a_view_serialized_at_the_json_boundary():
+    result = Coordinator(backend=FakeBackend()).debug_code(BUGGY)
+
+    history = result["history"]
+    assert isinstance(history, HistoryView)
+    assert history[0]["agent"] == "Preflight"
+    assert [e["phase"] for e in history[:2]] == ["Preflight", "Analysis"]
+    assert json.loads(json.dumps(result, default=json_default))["history"] == history.to_list()
+
+
+def test_job_budget_starts_after_queueing():
+    coordinator = Coordinator(backend=FakeBackend(latency=0.05), max_concurrency=1,
+                              similar_fixes=False, job_deadline=60)
+
+    started = time.perf_counter()
+    results = coordinator.debug_many([BUGGY, BUGGY.replace("add", "plus")])
+    total = time.perf_counter() - started
+
+    # Run one after the other: neither is charged for the other's run
+    assert all(r["budget"]["elapsed_seconds"] < total * 0.75 for r in results)
+
+
+def test_finished_checkpoint_result_has_budget(tmp_path):
+    db = str(tmp_path / "checkpoints.db")
+    Coordinator(backend=FakeBackend(), checkpoint_db=db).debug_code(BUGGY)
+
+    result = Coordinator(backend=FakeBackend(), checkpoint_db=db).debug_code(BUGGY)
+
+    assert result["from_checkpoint"]
+    assert result["budget"]["tokens_used"] == 0
+
+
+def test_same_coordinator_runs_on_several_event_loops():
+    # One slot, so jobs wait on the semaphore (which binds it to the loop)
+    coordinator = Coordinator(backend=FakeBackend(), max_concurrency=1, similar_fixes=False)
+
+    first = asyncio.run(coordinator.debug_many_async([BUGGY, BUGGY]))
+    second = asyncio.run(coordinator.debug_many_async([BUGGY, BUGGY]))
+    # ... and on the shared background loop afterwards
+    third = coordinator.debug_many([BUGGY, BUGGY])
+
+    analyses = {r["analysis"] for r in first + second + third}
+    assert len(analyses) == 1
+
+
+class SlowSecondCandidate(FakeBackend):
+    # Candidate 2 (the "smallest change" strategy) takes far longer than candidate 1
+    async def generate_async(self, prompt, temperature=None, json_output=False):
+        if FIX_STRATEGIES[1][1] in prompt:
+            await asyncio.sleep(2)
+        return await super().generate_async(prompt, temperature, json_output)
+
+
+def test_losing_candidates_are_recorded_before_the_winner_returns():
+    def respond(prompt):
+        if "Code Fixer" in prompt:
+            return "def add(a, b):\n    return a + b\n\nassert add(2, 3) == 5\n"
+        return FakeBackend._canned_reply(prompt)
+
+    coordinator = Coordinator(backend=SlowSecondCandidate(respond), speculative_candidates=2)
+    job = DebugJob(BUGGY, Memory(), CodeExecutor())
+
+    async def best():
+        winner = await coordinator._best_candidate(1, "", "", job)
+        # The history as _result would see it, right after the winner is known
+        return winner, job.memory.get_full_history().to_list()
+
+    started = time.perf_counter()
+    winner, history = asyncio.run(best())
+
+    assert winner["index"] == 0 and winner["exec_result"]["success"]
+    assert time.perf_counter() - started < 2
+    assert history[-1]["phase"] == "Candidate 1.2"
+    assert history[-1]["status"] == "Cancelled"
+
+
+def test_fused_mode_works_without_sdk_json_mode():
+    model = OldSdkModel(FakeBackend._canned_reply)
+    coordinator = Coordinator(backend=old_sdk_backend(model), fused=True, similar_fixes=False)
+
+    result = coordinator.debug_code(BUGGY)
+
+    analysis = next(e for e in result["history"] if e["phase"] == "Analysis")
+    assert analysis["status"] == "Fused"
+    assert result["analysis"].startswith("BUG ANALYSIS")
+
+
+def test_jobs_run_concurrently_up_to_max_concurrency():
+    codes = [BUGGY.replace("add", f"add{i}") for i in range(4)]
+
+    def run(max_concurrency):
+        coordinator = Coordinator(backend=FakeBackend(latency=0.1),
+                                  max_concurrency=max_concurrency, similar_fixes=False)
+        started = time.perf_counter()
+        results = coordinator.debug_many(codes)
+        return results, time.perf_counter() - started
+
+    parallel, parallel_time = run(4)
+    serial, serial_time = run(1)
+
+    # Results come back in input order
+    assert all(f"add{i}(" in r["fixed_code"] for i, r in enumerate(parallel))
+    assert [r["analysis"] for r in parallel] == [r["analysis"] for r in serial]
+    assert parallel_time < serial_time / 2
+
+
+def test_first_passing_candidate_wins_over_earlier_failing_ones():
+    fixed = "def add(a, b):\n    return a + b\n\nassert add(2, 3) == 5\n"
+
+    def respond(prompt):
+        if "Code Fixer" in prompt:
+            # Only the "smallest change" strategy gets it right
+            return fixed if FIX_STRATEGIES[1][1] in prompt else BUGGY
+        return FakeBackend._canned_reply(prompt)
+
+    coordinator = Coordinator(backend=FakeBackend(respond), speculative_candidates=3,
+                              similar_fixes=False, max_retries=0)
+    result = coordinator.debug_code(BUGGY)
+
+    assert result["success"] and result["attempts"] == 1
+    assert result["fixed_code"] == fixed.strip()
+
+
+def test_stream_yields_model_chunks_then_the_result():
+    coordinator = Coordinator(backend=FakeBackend(chunk_size=10), similar_fixes=False,
+                              max_retries=0)
+
+    events = list(coordinator.debug_code_stream(BUGGY))
+
+    kinds = [e["type"] for e in events]
+    assert kinds[-1] == "result" and kinds.count("result") == 1
+    assert kinds.index("phase_start") < kinds.index("analysis_chunk")
+    chunks = [e["text"] for e in events if e["type"] == "analysis_chunk"]
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == events[-1]["result"]["analysis"]
+    assert "fix_chunk" in kinds and "execution" in kinds
+
+
+def fused_run(debugger_reply):
+    prompts = []
+    fixed = "def add(a, b):\n    return a + b\n\nassert add(2, 3) == 5\n"
+
+    def respond(prompt):
+        prompts.append(prompt)
+        if "Code Debugger" in prompt:
+            return debugger_reply(fixed)
+        if "Code Fixer" in prompt:
+            return fixed
+        return FakeBackend._canned_reply(prompt)
+
+    result = Coordinator(backend=FakeBackend(respond), fused=True,
+                         similar_fixes=False).debug_code(BUGGY)
+    return result, prompts
+
+
+def test_fused_mode_analyzes_and_fixes_in_one_call():
+    result, prompts = fused_run(
+        lambda fixed: json.dumps({"analysis": "BUG ANALYSIS: minus", "fixed_code": fixed})
+    )
+
+    assert result["success"] and result["analysis"] == "BUG ANALYSIS: minus"
+    # Local checks validate, so the one fused call is the only model call
+    assert len(prompts) == 1
+
+
+def test_malformed_fused_answer_falls_back_to_two_calls():
+    result, prompts = fused_run(lambda fixed: "not json")
+
+    assert result["success"]
+    assert [p for p in prompts if "Code Analyzer" in p]
+    assert any(e["phase"] == "Analysis (fused)" and e["status"] == "Malformed"
+               for e in result["history"])
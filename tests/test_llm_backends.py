@@ -0,0 +1,115 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import llm_backends
+from llm_backends import FakeBackend, GeminiBackend, RecordReplayBackend, get_backend
+
+
+def gemini_reply(text):
+    part = SimpleNamespace(text=text)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+class OldSdkModel:
+    """
+    Stand-in for a GenerativeModel from an SDK without JSON mode.
+    """
+
+    def __init__(self, reply=lambda prompt: '{"ok": true}'):
+        self.reply = reply
+        self.configs = []
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.configs.append(generation_config)
+        if generation_config and "response_mime_type" in generation_config:
+            raise ValueError("Unknown field for GenerationConfig: response_mime_type")
+        return gemini_reply(self.reply(prompt))
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        return self.generate_content(prompt, generation_config, stream)
+
+
+def old_sdk_backend(model):
+    backend = GeminiBackend("gemini-test", api_key="test-key")
+    backend._model = model
+    return backend
+
+
+def test_json_mode_falls_back_when_sdk_rejects_it():
+    model = OldSdkModel()
+    backend = old_sdk_backend(model)
+
+    first = backend.generate("prompt", json_output=True)
+    second = asyncio.run(backend.generate_async("prompt", temperature=0.2, json_output=True))
+
+    assert first.text == second.text == '{"ok": true}'
+    assert not backend.json_mode
+    # Rejected once, then never asked for again
+    assert model.configs == [
+        {"response_mime_type": "application/json"}, None, {"temperature": 0.2},
+    ]
+
+
+def test_other_sdk_errors_are_not_retried():
+    class Broken(OldSdkModel):
+        def generate_content(self, prompt, generation_config=None, stream=False):
+            self.configs.append(generation_config)
+            raise ValueError("quota")
+
+    model = Broken()
+    backend = old_sdk_backend(model)
+    with pytest.raises(ValueError):
+        backend.generate("prompt", json_output=True)
+    assert len(model.configs) == 1
+    assert backend.json_mode
+
+
+def test_fake_backend_cycles_scripted_responses():
+    backend = FakeBackend(["first", "second"])
+
+    texts = [backend.generate("p").text for _ in range(3)]
+    assert texts == ["first", "second", "first"]
+    assert backend.calls == 3
+    assert backend.generate("12345678").usage["prompt_tokens"] == 2
+
+
+def test_record_then_replay_without_the_inner_backend(tmp_path):
+    recorder = RecordReplayBackend(str(tmp_path), FakeBackend(lambda p: p.upper()),
+                                   mode="record")
+    assert recorder.generate("hello").text == "HELLO"
+    assert asyncio.run(recorder.generate_async("json", json_output=True)).text == "JSON"
+
+    replay = RecordReplayBackend(str(tmp_path), mode="replay", model_name="fake")
+    assert replay.generate("hello").text == "HELLO"
+    assert replay.generate("json", json_output=True).text == "JSON"
+    # Settings are part of the key
+    with pytest.raises(LookupError):
+        replay.generate("json")
+
+
+def test_backends_are_shared_per_kind_and_model(monkeypatch):
+    monkeypatch.setattr(llm_backends, "_backends", {})
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+
+    assert get_backend("model-a") is get_backend("model-a")
+    assert get_backend("model-a") is not get_backend("model-b")
+
+
+def test_sdk_is_imported_on_first_call_only():
+    script = (
+        "import sys\n"
+        "from coordinator import Coordinator\n"
+        "from llm_backends import GeminiBackend\n"
+        "Coordinator()\n"
+        "GeminiBackend('gemini-test', api_key='key')\n"
+        "print('google.generativeai' in sys.modules)\n"
+    )
+    env = {"LLM_BACKEND": "fake", "PATH": ""}
+    proc = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                          env=env, cwd=str(Path(__file__).resolve().parents[1]), timeout=60)
+    assert proc.stdout.strip() == "False", proc.stderr
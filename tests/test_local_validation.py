@@ -0,0 +1,71 @@
+import asyncio
+
+from code_executor import CodeExecutor
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from local_validation import count_checks, gather_checks, validate_locally
+
+ORIGINAL = '''def double(x):
+    """
+    >>> double(3)
+    6
+    """
+    return x + x + 1
+
+
+def test_double():
+    assert double(0) == 0
+
+
+assert double(1) == 2
+print(double(2))  # expected: 4
+'''
+FIXED = ORIGINAL.replace("x + x + 1", "x + x")
+
+
+def test_checks_are_gathered_from_the_original():
+    checks = gather_checks(ORIGINAL)
+
+    assert [name for name, _ in checks["tests"]] == ["test_double"]
+    assert checks["asserts"][0][1] == "assert double(1) == 2"
+    assert checks["doctests"][0][0] == "double"
+    assert checks["expected_output"] == ["4"]
+    assert count_checks(checks) == 4
+    assert count_checks(gather_checks("print('hi')")) == 0
+
+
+def test_verdict_runs_the_checks_against_the_fix():
+    executor = CodeExecutor()
+
+    def verdict(fixed):
+        return asyncio.run(validate_locally(ORIGINAL, fixed, executor.execute(fixed), executor))
+
+    passing = verdict(FIXED)
+    assert passing["verdict"] == "pass" and passing["passed"] == 4
+
+    wrong = FIXED.replace("print(double(2))", "print(double(2) + 1)").replace(
+        "assert double(1) == 2\n", "")
+    failing = verdict(wrong)
+    assert failing["verdict"] == "fail"
+    assert failing["failures"] == ["expected output '4' not printed"]
+
+    assert verdict("print(double(2))")["verdict"] == "inconclusive"
+
+
+def test_local_checks_overrule_an_accepting_llm_validator():
+    prompts = []
+
+    def respond(prompt):
+        prompts.append(prompt)
+        if "Code Fixer" in prompt:
+            # Runs, but breaks the doctest and the test function
+            return ORIGINAL.replace("assert double(1) == 2\n", "")
+        return FakeBackend._canned_reply(prompt)
+
+    result = Coordinator(backend=FakeBackend(respond), similar_fixes=False,
+                         max_retries=0).debug_code(ORIGINAL)
+
+    assert not result["success"]
+    validation = next(e for e in result["history"] if e["phase"].startswith("Validation"))
+    assert validation["agent"] == "LocalValidator"
+    assert not any("Code Validator" in p for p in prompts)
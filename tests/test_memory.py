@@ -0,0 +1,44 @@
+import json
+
+from memory import JsonlSink, Memory
+
+
+def test_bounded_history_still_streams_every_event(tmp_path):
+    sink = JsonlSink(str(tmp_path / "history.jsonl"))
+    memory = Memory(max_events=2, sink=sink, job_id="job-1")
+    for i in range(5):
+        memory.add("Agent", f"Phase {i}", "Success", f"summary {i}", {"i": i})
+    sink.close()
+
+    history = memory.get_full_history()
+    assert [e["phase"] for e in history] == ["Phase 3", "Phase 4"]
+    assert history[-1].get("extra") == {"i": 4} and history[0:1][0]["status"] == "Success"
+
+    records = [json.loads(line) for line in (tmp_path / "history.jsonl").read_text().splitlines()]
+    assert len(records) == 5
+    assert records[0]["job"] == "job-1" and records[0]["summary"] == "summary 0"
+
+
+def test_view_outlives_clear():
+    memory = Memory()
+    memory.add("Agent", "Phase", "Success", "first")
+    view = memory.get_full_history()
+
+    memory.clear()
+    memory.add("Agent", "Phase", "Success", "second")
+
+    assert [e["summary"] for e in view] == ["first"]
+    assert view.to_list()[0]["timestamp"] == view[0].timestamp
+
+
+def test_view_pages_like_a_list():
+    memory = Memory()
+    for i in range(45):
+        memory.add("Agent", f"Phase {i}", "Success", f"summary {i}")
+    view = memory.get_full_history()
+
+    # streamlit_app.render_history shows one page per run
+    page = view[40:60]
+    assert [e["phase"] for e in page] == [f"Phase {i}" for i in range(40, 45)]
+    assert [e["phase"] for e in view[::20]] == ["Phase 0", "Phase 20", "Phase 40"]
+    assert view[-1]["summary"] == "summary 44" and len(view) == 45
@@ -0,0 +1,73 @@
+import json
+
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from model_routing import ModelRouter
+
+# Runs, has no asserts of its own: only the LLM validator can reject a fix
+PRINTS = "def add(a, b):\n    return a - b\n\nprint(add(2, 3))\n"
+CRASHES = "def add(a, b):\n    return a + c\n\nprint(add(2, 3))\n"
+
+
+def cascade_coordinator(fix):
+    def respond(prompt):
+        if "Code Validator" in prompt:
+            return json.dumps({"validation": "INVALID", "reason": "wrong output",
+                               "remaining_issues": [], "confidence": "High"})
+        if "Code Fixer" in prompt:
+            return fix
+        return FakeBackend._canned_reply(prompt)
+
+    router = ModelRouter(
+        role_models={"analyzer": "cheap", "fixer": "cheap", "validator": "cheap"},
+        cascade=["cheap", "strong"], hard_errors=(),
+        backend_factory=lambda model: FakeBackend(respond, model_name=model),
+    )
+    return Coordinator(router=router, max_retries=2, similar_fixes=False)
+
+
+def fix_models(result):
+    return [e["extra"]["model"] for e in result["history"]
+            if e["phase"].startswith("Fix Attempt") and "model" in e["extra"]]
+
+
+def test_validator_veto_does_not_escalate():
+    result = cascade_coordinator(PRINTS).debug_code(PRINTS)
+
+    assert not result["success"]
+    models = fix_models(result)
+    assert len(models) >= 2 and set(models) == {"cheap"}
+
+
+def test_execution_failure_escalates():
+    result = cascade_coordinator(CRASHES).debug_code(CRASHES)
+
+    assert not result["success"]
+    assert fix_models(result)[:2] == ["cheap", "strong"]
+
+
+def test_tiers_start_higher_for_large_inputs_and_hard_errors():
+    router = ModelRouter(role_models={"fixer": "a"}, cascade=["a", "b", "c"],
+                         large_input_lines=10,
+                         backend_factory=lambda model: FakeBackend(model_name=model))
+    small, large = "x = 1\n", "x = 1\n" * 10
+
+    assert router.fixer_model(0, small, "NameError: name '_' is not defined") == "a"
+    assert router.fixer_model(1, small, "NameError: ...") == "b"
+    assert router.fixer_model(0, large, "NameError: ...") == "b"
+    assert router.fixer_model(0, large, "ok") == "c"
+    assert router.fixer_model(5, small, None) == "c"
+
+
+def test_stats_track_calls_cost_and_fix_rate():
+    router = ModelRouter(role_models={"fixer": "gemini-2.5-pro"}, cascade=["gemini-2.5-pro"],
+                         backend_factory=lambda model: FakeBackend(["x" * 4000],
+                                                                   model_name=model))
+    router.backend("gemini-2.5-pro").generate("p" * 4000)
+    router.stats.record_attempt("gemini-2.5-pro", True)
+    router.stats.record_attempt("gemini-2.5-pro", False)
+
+    stats = router.stats.snapshot()["gemini-2.5-pro"]
+    assert stats["calls"] == 1 and stats["prompt_tokens"] == 1000
+    assert stats["cost_usd"] == round((1000 * 1.25 + 1000 * 10.0) / 1_000_000, 6)
+    assert stats["fix_success_rate"] == 0.5
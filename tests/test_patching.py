@@ -0,0 +1,49 @@
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from patching import apply_patch
+from prompt_budget import estimate_tokens, truncate_middle
+
+BUGGY = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+FIXED = BUGGY.replace("a - b", "a + b")
+
+
+def test_unified_diff_applies_despite_wrong_line_numbers():
+    patch = (
+        "```diff\n--- a\n+++ b\n@@ -7,2 +7,2 @@\n"
+        " def add(a, b):\n-    return a - b\n+    return a + b\n```"
+    )
+
+    assert apply_patch(BUGGY, patch) == FIXED
+    assert apply_patch(BUGGY, "@@ -1 +1 @@\n-def missing():\n+def other():\n") is None
+    assert apply_patch(BUGGY, "no patch here") is None
+
+
+def test_replace_blocks_apply_bottom_up():
+    patch = "@@ REPLACE 4-4\nassert add(2, 3) == 5, 'sum'\n@@ END\n" \
+            "@@ REPLACE 2-2\n    return a + b\n@@ END\n"
+
+    assert apply_patch(BUGGY, patch) == FIXED.replace("== 5", "== 5, 'sum'")
+    assert apply_patch(BUGGY, "@@ REPLACE 9-12\nx\n@@ END\n") is None
+
+
+def test_truncate_middle_keeps_both_ends():
+    text = "head " + "x" * 1000 + " tail"
+
+    trimmed = truncate_middle(text, 100)
+    assert len(trimmed) == 100
+    assert trimmed.startswith("head") and trimmed.endswith("tail")
+    assert estimate_tokens("12345") == 2
+
+
+def test_patch_mode_applies_the_fixer_diff_locally():
+    def respond(prompt):
+        if "Code Fixer" in prompt:
+            return "@@ REPLACE 2-2\n    return a + b\n@@ END"
+        return FakeBackend._canned_reply(prompt)
+
+    result = Coordinator(backend=FakeBackend(respond), fix_mode="patch",
+                         similar_fixes=False).debug_code(BUGGY)
+
+    assert result["success"] and result["fixed_code"] == FIXED.strip()
+    fix = next(e for e in result["history"] if e["phase"] == "Fix Attempt 1")
+    assert fix["status"] == "Patched"
@@ -0,0 +1,42 @@
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from preflight import check_syntax
+
+BROKEN = "def add(a, b)\n    return a + b\n\nprint(add(2, 3))\n"
+FAILING = "def ratio(a, b):\n    return a / b\n\nprint(ratio(1, 0))\n"
+
+
+def recording_backend(prompts):
+    def respond(prompt):
+        prompts.append(prompt)
+        return FakeBackend._canned_reply(prompt)
+    return FakeBackend(respond)
+
+
+def test_check_syntax_locates_the_error():
+    assert check_syntax("x = 1\n") is None
+
+    error = check_syntax(BROKEN)
+    assert error["line"] == 1 and error["error_type"] == "SyntaxError"
+    assert error["text"] == "def add(a, b)"
+
+
+def test_syntax_error_skips_the_analyzer_call():
+    prompts = []
+    result = Coordinator(backend=recording_backend(prompts), similar_fixes=False,
+                         max_retries=0).debug_code(BROKEN)
+
+    assert not any("Code Analyzer" in p for p in prompts)
+    preflight, analysis = result["history"][0], result["history"][1]
+    assert preflight["status"] == "SyntaxError"
+    assert analysis["status"] == "Local" and "Line 1" in result["analysis"]
+
+
+def test_runtime_traceback_reaches_the_model():
+    prompts = []
+    result = Coordinator(backend=recording_backend(prompts), similar_fixes=False,
+                         max_retries=0).debug_code(FAILING)
+
+    assert result["history"][0]["status"] == "Fails"
+    analyzer = next(p for p in prompts if "Code Analyzer" in p)
+    assert "PRE-FLIGHT DIAGNOSIS" in analyzer and "ZeroDivisionError" in analyzer
@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from llm_backends import FakeBackend, RateLimitedBackend
+from rate_limit import Backoff, RateLimiter, TokenBucket, TransportError, set_deadline
+
+
+class QuotaError(Exception):
+    def __init__(self, code, retry_after=None):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+class Flaky(FakeBackend):
+    # Raises the given errors first, then answers normally
+    def __init__(self, errors):
+        super().__init__(["ok"])
+        self.errors = list(errors)
+
+    async def generate_async(self, prompt, temperature=None, json_output=False):
+        if self.errors:
+            raise self.errors.pop(0)
+        return await super().generate_async(prompt, temperature, json_output)
+
+
+def limited(errors, max_attempts=5):
+    limiter = RateLimiter()
+    backend = RateLimitedBackend(Flaky(errors), limiter,
+                                 Backoff(base=0.001, max_attempts=max_attempts, seed=0))
+    return backend, limiter
+
+
+def test_quota_and_server_errors_are_retried_with_backoff():
+    backend, limiter = limited([QuotaError(429), QuotaError(503)])
+
+    assert asyncio.run(backend.generate_async("prompt")).text == "ok"
+    assert limiter.stats()["retries"] == 2 and limiter.stats()["failures"] == 0
+
+
+def test_exhausted_retries_raise_transport_error():
+    backend, limiter = limited([QuotaError(429)] * 3, max_attempts=3)
+
+    with pytest.raises(TransportError) as error:
+        asyncio.run(backend.generate_async("prompt"))
+    assert error.value.status == 429 and error.value.attempts == 3
+    assert limiter.failures == 1
+
+
+def test_client_errors_are_not_retried():
+    backend, limiter = limited([QuotaError(400)])
+
+    with pytest.raises(QuotaError):
+        asyncio.run(backend.generate_async("prompt"))
+    assert limiter.retries == 0
+
+
+def test_retry_after_is_honoured_up_to_the_cap():
+    backoff = Backoff(base=1.0, cap=10.0)
+
+    assert backoff.delay(0, QuotaError(429, retry_after=3)) == 3.0
+    assert backoff.delay(0, QuotaError(429, retry_after=60)) == 10.0
+    assert 0 <= backoff.delay(2) <= 4.0
+
+
+def test_buckets_queue_requests_over_the_rate():
+    bucket = TokenBucket(60, capacity=2)
+
+    assert bucket.reserve(1, now=bucket.updated) == 0.0
+    assert bucket.reserve(1, now=bucket.updated) == 0.0
+    assert bucket.reserve(1, now=bucket.updated) == pytest.approx(1.0)
+    assert bucket.reserve(1, now=bucket.updated) == pytest.approx(2.0)
+
+
+def test_wait_past_the_job_deadline_fails_fast():
+    limiter = RateLimiter(requests_per_minute=1)
+    limiter.acquire()
+
+    def within_deadline():
+        set_deadline(1.0)
+        limiter.acquire()
+
+    with pytest.raises(TransportError, match="Deadline exceeded"):
+        contextvars.copy_context().run(within_deadline)
+    assert limiter.stats()["acquired"] == 1
@@ -0,0 +1,76 @@
+import time
+
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from response_cache import ResponseCache, cache_from_env
+
+BUGGY = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+
+
+def test_resubmitted_code_is_served_from_cache():
+    backend = FakeBackend()
+    coordinator = Coordinator(backend=backend, cache=ResponseCache(), similar_fixes=False)
+
+    first = coordinator.debug_code(BUGGY)
+    calls, misses = backend.calls, coordinator.cache.misses
+    assert coordinator.cache.hits == 0
+
+    second = coordinator.debug_code(BUGGY)
+    # Agent memory differs between the runs; the cache key must not
+    assert coordinator.cache.hits == misses
+    assert coordinator.cache.misses == misses
+    assert second["analysis"] == first["analysis"]
+    # Only the uncached fixer retries reach the backend again
+    assert backend.calls - calls < calls
+
+
+def test_memory_tier_evicts_lru_and_disk_tier_survives_restarts(tmp_path):
+    db = str(tmp_path / "cache.db")
+    cache = ResponseCache(max_entries=2, db_path=db)
+    cache.put("model", "a", "answer a")
+    cache.put("model", "b", "answer b")
+    assert cache.get("model", "a") == "answer a"
+    cache.put("model", "c", "answer c")
+
+    assert cache.stats()["memory_entries"] == 2
+    # "b" was least recently used: gone from memory, still on disk
+    assert cache.get("model", "b") == "answer b" and cache.disk_hits == 1
+    assert cache.get("other-model", "a") is None
+
+    restarted = ResponseCache(db_path=db)
+    assert restarted.get("model", "c") == "answer c"
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    cache = ResponseCache(ttl_seconds=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.put("model", "a", "answer a")
+
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("model", "a") is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_disk_tier_is_trimmed_every_few_puts(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.db"), max_disk_entries=2, trim_every=4)
+
+    for i in range(3):
+        cache.put("model", f"prompt {i}", "answer")
+    assert cache.stats()["evictions"] == 0
+
+    cache.put("model", "prompt 3", "answer")
+    assert cache.stats()["evictions"] == 2
+
+
+def test_cache_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("LLM_CACHE", raising=False)
+    assert cache_from_env()._db is None
+
+    monkeypatch.setenv("LLM_CACHE", "off")
+    assert cache_from_env() is None
+
+    monkeypatch.setenv("LLM_CACHE", str(tmp_path / "cache.db"))
+    monkeypatch.setenv("LLM_CACHE_TTL", "0")
+    cache = cache_from_env()
+    assert cache._db is not None and cache.ttl_seconds is None
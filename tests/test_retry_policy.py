@@ -0,0 +1,49 @@
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from retry_policy import RETRY, STOP, SWITCH, JobBudget, RetryScheduler
+
+BUGGY = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+
+
+def decide(scheduler, attempt, code, failure, error_type=None):
+    scheduler.begin_attempt()
+    return scheduler.after_failure(attempt, code, failure, error_type, "context")
+
+
+def test_repeats_stop_and_looping_errors_switch_strategy():
+    scheduler = RetryScheduler(max_attempts=5)
+
+    first = decide(scheduler, 1, "x = 1", "Timeout: killed", "Timeout")
+    assert first.action == SWITCH and "infinite loops" in first.context
+    second = decide(scheduler, 2, "x = 2", "NameError: y", "NameError")
+    assert second.action == RETRY and "Timeout: killed" in second.context
+    # Same fix with different formatting
+    assert decide(scheduler, 3, "x  =  2  # again", "other", None).reason == \
+        "repeated identical fix"
+
+    scheduler = RetryScheduler(max_attempts=5)
+    decide(scheduler, 1, "x = 1", "NameError: y")
+    assert decide(scheduler, 2, "x = 2", "NameError: y").reason == "repeated identical failure"
+    assert decide(RetryScheduler(max_attempts=1), 1, "x = 1", "f").reason == "max retries reached"
+
+
+def test_stops_when_the_next_attempt_would_not_fit_the_token_budget():
+    budget = JobBudget(tokens=150)
+    scheduler = RetryScheduler(max_attempts=5, budget=budget)
+
+    scheduler.begin_attempt()
+    budget.charge(100)
+    decision = scheduler.after_failure(1, "x = 1", "f", None, "context")
+
+    assert decision.action == STOP and decision.reason.startswith("token budget")
+
+
+def test_job_reports_why_it_stopped_and_what_it_spent():
+    coordinator = Coordinator(backend=FakeBackend(), similar_fixes=False, max_retries=5)
+
+    result = coordinator.debug_code(BUGGY)
+
+    # The fake fixer echoes the code back: the second identical fix ends the job
+    assert not result["success"] and result["attempts"] == 2
+    assert result["stop_reason"] == "repeated identical fix"
+    assert result["budget"]["tokens_used"] > 0
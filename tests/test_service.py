@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from service import DebugService, JobManager
+
+BUGGY = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+
+
+def test_cancelling_a_queued_job_frees_its_slot():
+    async def scenario():
+        # Workers not started, so jobs stay queued
+        manager = JobManager(Coordinator(backend=FakeBackend()), workers=1, queue_size=1)
+        first = manager.submit(BUGGY)
+        assert manager.submit(BUGGY) is None
+
+        assert manager.cancel(first)
+        second = manager.submit(BUGGY)
+        assert second is not None
+        assert manager.health()["queued"] == 1
+
+        manager.start()
+        while not second.finished_state:
+            await asyncio.sleep(0.01)
+        await manager.stop()
+        return first, second, manager.health()
+
+    first, second, health = asyncio.run(scenario())
+    assert first.status == "cancelled" and first.started is None
+    assert second.status == "done"
+    assert health["queued"] == 0 and health["running"] == 0
+
+
+async def request(port, method, path, body=None, headers=""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(data)}\r\n"
+        f"{headers}\r\n".encode() + data
+    )
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.decode().partition("\r\n\r\n")
+    status = int(head.split()[1])
+    header_lines = dict(line.split(": ", 1) for line in head.split("\r\n")[1:])
+    return status, header_lines, payload
+
+
+async def with_service(scenario, start_workers=True, queue_size=4):
+    manager = JobManager(Coordinator(backend=FakeBackend(), similar_fixes=False),
+                         workers=1, queue_size=queue_size)
+    if start_workers:
+        manager.start()
+    server = await asyncio.start_server(DebugService(manager).handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return await scenario(port)
+    finally:
+        server.close()
+        await server.wait_closed()
+        await manager.stop()
+
+
+def test_submitted_job_streams_progress_as_server_sent_events():
+    async def scenario(port):
+        status, headers, payload = await request(port, "POST", "/jobs", {"code": BUGGY})
+        assert status == 202
+        job_id = json.loads(payload)["job_id"]
+        assert headers["Location"] == f"/jobs/{job_id}"
+
+        status, headers, stream = await request(port, "GET", f"/jobs/{job_id}/events")
+        assert status == 200 and headers["Content-Type"] == "text/event-stream"
+        _, _, summary = await request(port, "GET", f"/jobs/{job_id}")
+        return stream, json.loads(summary)
+
+    stream, summary = asyncio.run(with_service(scenario))
+
+    events = [block.split("\n")[0][len("event: "):] for block in stream.strip().split("\n\n")]
+    assert events[0] == "queued" and "started" in events and "phase_start" in events
+    assert events[-1] == "result"
+    assert summary["status"] == "done" and summary["result"]["history"][0]["agent"] == "Preflight"
+
+
+def test_full_queue_answers_429_with_retry_after():
+    async def scenario(port):
+        first = await request(port, "POST", "/jobs", {"code": BUGGY})
+        second = await request(port, "POST", "/jobs", {"code": BUGGY})
+        return first, second
+
+    first, second = asyncio.run(with_service(scenario, start_workers=False, queue_size=1))
+
+    assert first[0] == 202
+    status, headers, payload = second
+    assert status == 429 and headers["Retry-After"] == "1"
+    assert json.loads(payload)["retry_after"] == 1
+
+
+def test_bad_requests_are_rejected():
+    async def scenario(port):
+        return [
+            await request(port, "POST", "/jobs", {"code": ""}),
+            await request(port, "GET", "/jobs/missing"),
+            await request(port, "GET", "/jobs"),
+        ]
+
+    statuses = [r[0] for r in asyncio.run(with_service(scenario, start_workers=False))]
+    assert statuses == [400, 404, 405]
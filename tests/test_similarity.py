@@ -0,0 +1,58 @@
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+from similarity import FixIndex, adapt_fix, error_signature
+
+BUGGY = "def add(a, b):\n    return a - b\n\nprint(add(2, 3))\n"
+FIXED = "def add(a, b):\n    return a + b\n\nprint(add(2, 3))\n"
+RENAMED = "def plus(x, y):\n    return x - y\n\nprint(plus(2, 3))\n"
+
+
+def test_renamed_near_duplicate_reuses_the_stored_fix():
+    index = FixIndex()
+    assert index.add(BUGGY, FIXED, "AssertionError: ")
+
+    similar = index.nearest(RENAMED, "AssertionError: ")
+    assert similar is not None and similar.similarity == 1.0
+    adapted = adapt_fix(similar.entry.original, similar.entry.fixed, RENAMED)
+    assert "return x + y" in adapted
+
+
+def test_oversized_code_is_neither_stored_nor_looked_up():
+    index = FixIndex(max_code_chars=len(BUGGY) - 1)
+    assert not index.add(BUGGY, FIXED, "AssertionError: ")
+
+    index.max_code_chars = len(BUGGY)
+    assert index.add(BUGGY, FIXED, "AssertionError: ")
+    index.max_code_chars = len(RENAMED) - 1
+    assert index.nearest(RENAMED, "AssertionError: ") is None
+
+
+def test_error_signature_masks_names_and_numbers():
+    report = {"syntax_error": None, "execution": {
+        "success": False, "error_type": "KeyError", "error": "KeyError: 'user_42' at 3"}}
+
+    assert error_signature(report) == "KeyError: KeyError: '_' at N"
+    assert error_signature({"syntax_error": {"line": 1}}) == "SyntaxError"
+    assert error_signature({"syntax_error": None, "execution": {"success": True}}) == "ok"
+
+
+def test_near_duplicate_job_reuses_the_stored_fix_without_the_fixer():
+    buggy = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+    renamed = "def plus(x, y):\n    return x - y\n\nassert plus(2, 3) == 5\n"
+    prompts = []
+
+    def respond(prompt):
+        prompts.append(prompt)
+        if "Code Fixer" in prompt:
+            return buggy.replace("a - b", "a + b")
+        return FakeBackend._canned_reply(prompt)
+
+    coordinator = Coordinator(backend=FakeBackend(respond))
+    assert coordinator.debug_code(buggy)["success"]
+
+    prompts.clear()
+    result = coordinator.debug_code(renamed)
+
+    assert result["success"] and "return x + y" in result["fixed_code"]
+    assert result["history"][1]["phase"] == "Similar Fix"
+    assert prompts == []
@@ -0,0 +1,41 @@
+import pytest
+
+import telemetry
+from coordinator import Coordinator
+from llm_backends import FakeBackend
+
+BUGGY = "def add(a, b):\n    return a - b\n\nassert add(2, 3) == 5\n"
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    monkeypatch.setattr(telemetry, "_enabled", False)
+    monkeypatch.setattr(telemetry, "REGISTRY", telemetry.MetricsRegistry(buckets=(0.1, 1.0)))
+    return telemetry.REGISTRY
+
+
+def test_registry_renders_prometheus_histograms_and_counters(tracing):
+    tracing.observe_span("llm", 0.5, {"role": 'Fix"er', "outcome": "ok", "total_tokens": 7})
+    tracing.observe_span("llm", 2.0, {"role": 'Fix"er', "outcome": "ok", "total_tokens": 3})
+
+    text = tracing.render_prometheus()
+    assert 'debugger_llm_seconds_bucket{outcome="ok",role="Fix\\"er",le="0.1"} 0' in text
+    assert 'debugger_llm_seconds_bucket{outcome="ok",role="Fix\\"er",le="1.0"} 1' in text
+    assert 'debugger_llm_seconds_count{outcome="ok",role="Fix\\"er"} 2' in text
+    assert 'debugger_llm_total_tokens_total{role="Fix\\"er"} 10' in text
+
+
+def test_spans_are_free_until_enabled(tracing):
+    assert telemetry.span("llm") is telemetry._NOOP
+    assert telemetry.start_trace() is None
+
+
+def test_traced_job_reports_phases_and_tokens(tracing):
+    result = Coordinator(backend=FakeBackend(), tracing=True,
+                         similar_fixes=False).debug_code(BUGGY)
+
+    trace = result["trace"]
+    phases = {s["phase"] for s in trace["spans"] if s["name"] == "phase"}
+    assert {"Preflight", "Analysis", "Fix", "Execution"} <= phases
+    assert trace["totals"]["total_tokens"] > 0
+    assert "debugger_llm_seconds" in tracing.render_prometheus()
@@ -1,9 +1,15 @@
+from typing import Optional
+
 from base_agent import BaseAgent
-import json
+from llm_backends import LLMBackend
+from prompt_budget import format_execution_result
 
 
 class ValidatorAgent(BaseAgent):
-    def __init__(self):
+    # Verdicts are parsed, so request structured JSON instead of free-form text
+    json_output = True
+
+    def __init__(self, backend: Optional[LLMBackend] = None):
         system_prompt = (
             "You validate Python code fixes.\n"
             "Respond ONLY with valid JSON:\n\n"
@@ -14,37 +20,35 @@ class ValidatorAgent(BaseAgent):
             "  \"confidence\": \"High/Medium/Low\"\n"
             "}\n"
         )
-        super().__init__("Expert Code Validator", system_prompt)
+        super().__init__("Expert Code Validator", system_prompt, backend)
 
-    def validate(self, original_code: str, fixed_code: str, execution_result: dict) -> str:
-        payload = (
+    def validate(self, original_code: str, fixed_code: str, execution_result: dict,
+                 use_cache: bool = True) -> str:
+        return self.think(
+            self._validate_payload(original_code, fixed_code, execution_result),
+            use_cache=use_cache,
+        )
+
+    async def validate_async(self, original_code: str, fixed_code: str, execution_result: dict,
+                             use_cache: bool = True) -> str:
+        return await self.think_async(
+            self._validate_payload(original_code, fixed_code, execution_result),
+            use_cache=use_cache,
+        )
+
+    def _validate_payload(self, original_code: str, fixed_code: str, execution_result: dict) -> str:
+        execution = format_execution_result(execution_result)
+        execution = self._fit(execution, original_code, fixed_code)
+        return (
             "Assess whether this code is fixed correctly.\n"
             "Return ONLY JSON.\n\n"
             f"Original Code:\n{original_code}\n\n"
             f"Fixed Code:\n{fixed_code}\n\n"
-            f"Execution Result:\n{execution_result}\n"
+            f"Execution Result:\n{execution}\n"
         )
-        return self.think(payload)
 
     def is_valid(self, validation_response: str) -> bool:
-        cleaned = (
-            validation_response.replace("```json", "")
-            .replace("```", "")
-            .strip()
-        )
-        try:
-            data = json.loads(cleaned)
-            return data.get("validation", "").upper() == "VALID"
-        except Exception:
+        data = self.parse_json(validation_response)
+        if not isinstance(data, dict):
             return False
-
-    def parse_json(self, validation_response: str):
-        cleaned = (
-            validation_response.replace("```json", "")
-            .replace("```", "")
-            .strip()
-        )
-        try:
-            return json.loads(cleaned)
-        except Exception:
-            return None
+        return str(data.get("validation", "")).upper() == "VALID"